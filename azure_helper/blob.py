@@ -6,18 +6,22 @@ This scripts provides wrapper over Azure storage
 import logging
 import traceback
 
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceNotModifiedError
 from smart_open import open
 
 try:
-    from alpha_library.gcp_helper.client import StorageClient
     from alpha_library.azure_helper.client import AzureStorageClient
-    from alpha_library.boto3_helper.client import Client
+    from alpha_library.helper.transfer_engine import TransferEngine, S3Provider, GSProvider, AzureProvider
+    from alpha_library.helper.range_reader import RangeReader, check_range
+    from alpha_library.helper.transfer_pipe import TransferPipe
 
 except ModuleNotFoundError:
     logging.info("Module called internally")
-    from gcp_helper.client import StorageClient
     from azure_helper.client import AzureStorageClient
-    from boto3_helper.client import Client
+    from helper.transfer_engine import TransferEngine, S3Provider, GSProvider, AzureProvider
+    from helper.range_reader import RangeReader, check_range
+    from helper.transfer_pipe import TransferPipe
 
 
 # Display
@@ -74,6 +78,67 @@ class DisplayAzureObject(object):
             if kwargs.get("throw_exception"):
                 raise error
 
+    def object_content_if_changed(self, **kwargs) -> tuple:
+        """
+        This method downloads a azure blob unless its ETag still matches etag (conditional GET)
+        :return: (content in bytes or None when not modified, ETag)
+        """
+        try:
+            blob_client = AzureStorageClient(account_url=self.account_url,
+                                             azure_details=self.azure_details).return_blob_service_client(). \
+                get_blob_client(container=kwargs['container_details']['container_name'], blob=kwargs['object_path'])
+            conditions = {"etag": kwargs["etag"], "match_condition": MatchConditions.IfModified} \
+                if kwargs.get("etag") else {}
+            try:
+                downloader = blob_client.download_blob(**conditions)
+            except ResourceNotModifiedError:
+                return None, kwargs["etag"]
+            return downloader.readall(), downloader.properties.etag
+
+        except BaseException as error:
+            logging.error(f"Uncaught exception in azure/blob.py : {traceback.format_exc()}")
+            if kwargs.get("throw_exception"):
+                raise error
+
+    def __range_fetcher(self, **kwargs):
+        blob_client = AzureStorageClient(account_url=self.account_url,
+                                         azure_details=self.azure_details).return_blob_service_client(). \
+            get_blob_client(container=kwargs['container_details']['container_name'], blob=kwargs['object_path'])
+
+        def fetch(offset, length):
+            check_range(offset, length)
+            if offset < 0:
+                # Blob service takes no suffix range, size is looked up first
+                offset = max(0, blob_client.get_blob_properties().size + offset)
+            return blob_client.download_blob(offset=offset, length=length).readall()
+
+        return fetch
+
+    def read_range(self, **kwargs) -> bytes:
+        """
+        This method reads length bytes at offset of a azure blob with one ranged GET
+        Negative offset reads last -offset bytes (without length), length None reads till end
+        """
+        try:
+            return self.__range_fetcher(**kwargs)(kwargs["offset"], kwargs.get("length"))
+
+        except BaseException as error:
+            logging.error(f"Uncaught exception in azure/blob.py : {traceback.format_exc()}")
+            if kwargs.get("throw_exception"):
+                raise error
+
+    def read_ranges(self, **kwargs) -> list:
+        """
+        This method reads many ranges [(offset, length), ...] of a azure blob, nearby ranges are coalesced
+        """
+        try:
+            return RangeReader.from_kwargs(**kwargs).read_ranges(self.__range_fetcher(**kwargs), kwargs["ranges"])
+
+        except BaseException as error:
+            logging.error(f"Uncaught exception in azure/blob.py : {traceback.format_exc()}")
+            if kwargs.get("throw_exception"):
+                raise error
+
 
 # Access Azure Storage
 class AzureObjectList(object):
@@ -231,8 +296,7 @@ class CopyObjectFromURLtoAzure(object):
             with open(kwargs["url"], "rb", transport_params=source_transport_params) as f_read:
                 with open(object_destination_address, "wb",
                           transport_params=destination_transport_params) as f_write:
-                    for data_line in CopyObjectFromURLtoAzure.read_in_chunks(f_read, chunk_size):
-                        f_write.write(data_line)
+                    TransferPipe.stream(f_read, f_write, **kwargs)
 
         except BaseException as error:
             logging.error(f"Uncaught exception in azure/blob.py : {traceback.format_exc()}")
@@ -257,54 +321,16 @@ class CopyObjectFromAzureToAzure(object):
 
         logging.debug(f"Instance variables for CopyObjectFromAzureToAzure : {self.__dict__}")
 
-    @staticmethod
-    def read_in_chunks(file_object, chunk_size):
-        """
-        Lazy function (generator) to read a file piece by piece.
-        Default chunk size: 1k.
-        xref: https://dataroz.com/stream-large-files-between-gs-and-gcs-python/
-        """
-        while True:
-            data = file_object.read(chunk_size)
-            if not data:
-                break
-            yield data
-
     def copy_from_source_to_destination_storage(self, **kwargs):
         """
         This method downloads file from one azure to another azure
         """
-
-        try:
-            chunk_size = kwargs["chunk_size"] if kwargs.get("chunk_size") else CopyObjectFromAzureToAzure.chunk_size
-            object_original_address = f"azure://{kwargs['source_container_details']['container_name']}/" \
-                                      f"{kwargs['object_original_path']}"
-            object_destination_address = f"azure://{kwargs['destination_container_details']['container_name']}/" \
-                                         f"{kwargs['object_destination_path']}"
-
-            source_transport_params = {
-                "client": AzureStorageClient(account_url=self.source_account_url,
-                                             azure_details=self.source_azure_details).return_blob_service_client()
-            }
-
-            destination_transport_params = {
-
-                "client": AzureStorageClient(account_url=self.destination_account_url,
-                                             azure_details=self.destination_azure_details).return_blob_service_client(),
-                "min_part_size": chunk_size
-            }
-
-            with open(object_original_address, "rb",
-                      transport_params=source_transport_params) as f_read:
-                with open(object_destination_address, "wb",
-                          transport_params=destination_transport_params) as f_write:
-                    for data_line in CopyObjectFromAzureToAzure.read_in_chunks(f_read, chunk_size):
-                        f_write.write(data_line)
-
-        except BaseException as error:
-            logging.error(f"Uncaught exception in azure/blob.py : {traceback.format_exc()}")
-            if kwargs.get("throw_exception"):
-                raise error
+        return TransferEngine().copy(
+            AzureProvider(cred_details=self.source_azure_details, account_url=self.source_account_url),
+            kwargs["source_container_details"], kwargs["object_original_path"],
+            AzureProvider(cred_details=self.destination_azure_details,
+                          account_url=self.destination_account_url),
+            kwargs["destination_container_details"], kwargs["object_destination_path"], **kwargs)
 
 
 class CopyObjectFromAzureToS3(object):
@@ -323,58 +349,21 @@ class CopyObjectFromAzureToS3(object):
 
         logging.debug(f"Instance variables for CopyObjectFromAzureToS3 : {self.__dict__}")
 
-    @staticmethod
-    def read_in_chunks(file_object, chunk_size):
-        """
-        Lazy function (generator) to read a file piece by piece.
-        Default chunk size: 1k.
-        xref: https://dataroz.com/stream-large-files-between-gs-and-gcs-python/
-        """
-        while True:
-            data = file_object.read(chunk_size)
-            if not data:
-                break
-            yield data
-
     def copy_from_source_to_destination_storage(self, **kwargs):
         """
         This method downloads file from one azure to another s3
         """
-
-        try:
-            chunk_size = kwargs["chunk_size"] if kwargs.get("chunk_size") else CopyObjectFromAzureToS3.chunk_size
-            object_original_address = f"azure://{kwargs['source_container_details']['container_name']}/" \
-                                      f"{kwargs['object_original_path']}"
-            object_destination_address = f"s3://{kwargs['destination_s3_details']['bucket_name']}/" \
-                                         f"{kwargs['object_destination_path']}"
-
-            source_transport_params = {
-                "client": AzureStorageClient(account_url=self.account_url,
-                                             azure_details=self.source_azure_details).return_blob_service_client()
-            }
-
-            destination_transport_params = {
-                "client": Client(aws_details=self.destination_aws_details).return_client(
-                    "s3", endpoint_url=kwargs.get("destination_endpoint_url")),
-                "min_part_size": chunk_size
-            }
-
-            with open(object_original_address, "rb",
-                      transport_params=source_transport_params) as f_read:
-                with open(object_destination_address, "wb",
-                          transport_params=destination_transport_params) as f_write:
-                    for data_line in CopyObjectFromAzureToS3.read_in_chunks(f_read, chunk_size):
-                        f_write.write(data_line)
-
-        except BaseException as error:
-            logging.error(f"Uncaught exception in azure/blob.py : {traceback.format_exc()}")
-            if kwargs.get("throw_exception"):
-                raise error
+        return TransferEngine().copy(
+            AzureProvider(cred_details=self.source_azure_details, account_url=self.account_url),
+            kwargs["source_container_details"], kwargs["object_original_path"],
+            S3Provider(cred_details=self.destination_aws_details,
+                       endpoint_url=kwargs.get("destination_endpoint_url")),
+            kwargs["destination_s3_details"], kwargs["object_destination_path"], **kwargs)
 
 
 class CopyObjectFromAzureToGS(object):
     """
-    This class provide interface to copy object from azure to s3
+    This class provide interface to copy object from azure to gs
     """
     chunk_size = 256 * 1024 ** 2
 
@@ -382,58 +371,21 @@ class CopyObjectFromAzureToGS(object):
         # Required variable to drive this Class, expected to be provided from parent Object
         self.account_url = None
         self.source_azure_details = None
-        self.destination_aws_details = None
+        self.destination_sa_json_data = None
 
         self.__dict__.update(kwargs)
 
-        logging.debug(f"Instance variables for CopyObjectFromAzureToS3 : {self.__dict__}")
-
-    @staticmethod
-    def read_in_chunks(file_object, chunk_size):
-        """
-        Lazy function (generator) to read a file piece by piece.
-        Default chunk size: 1k.
-        xref: https://dataroz.com/stream-large-files-between-gs-and-gcs-python/
-        """
-        while True:
-            data = file_object.read(chunk_size)
-            if not data:
-                break
-            yield data
+        logging.debug(f"Instance variables for CopyObjectFromAzureToGS : {self.__dict__}")
 
     def copy_from_source_to_destination_storage(self, **kwargs):
         """
         This method downloads file from one azure to another s3
         """
-
-        try:
-            chunk_size = kwargs["chunk_size"] if kwargs.get("chunk_size") else CopyObjectFromAzureToS3.chunk_size
-            object_original_address = f"azure://{kwargs['source_container_details']['container_name']}/" \
-                                      f"{kwargs['object_original_path']}"
-            object_destination_address = f"gs://{kwargs['destination_gs_details']['bucket_name']}/" \
-                                         f"{kwargs['object_destination_path']}"
-
-            source_transport_params = {
-                "client": AzureStorageClient(account_url=self.account_url,
-                                             azure_details=self.source_azure_details).return_blob_service_client()
-            }
-
-            destination_transport_params = {
-                "client": StorageClient(aws_details=self.destination_aws_details).return_client(),
-                "min_part_size": chunk_size
-            }
-
-            with open(object_original_address, "rb",
-                      transport_params=source_transport_params) as f_read:
-                with open(object_destination_address, "wb",
-                          transport_params=destination_transport_params) as f_write:
-                    for data_line in CopyObjectFromAzureToS3.read_in_chunks(f_read, chunk_size):
-                        f_write.write(data_line)
-
-        except BaseException as error:
-            logging.error(f"Uncaught exception in azure/blob.py : {traceback.format_exc()}")
-            if kwargs.get("throw_exception"):
-                raise error
+        return TransferEngine().copy(
+            AzureProvider(cred_details=self.source_azure_details, account_url=self.account_url),
+            kwargs["source_container_details"], kwargs["object_original_path"],
+            GSProvider(cred_details=self.destination_sa_json_data),
+            kwargs["destination_gs_details"], kwargs["object_destination_path"], **kwargs)
 
 
 # Azure FS
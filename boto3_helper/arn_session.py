@@ -5,31 +5,170 @@ This scripts creates boto3 session based Assumed Role Credentials
 """
 import boto3
 import datetime
+import logging
+import threading
+import traceback
 from botocore import credentials, session
+from dateutil.parser import isoparse
 from dateutil.tz import tzlocal
 
 
+class AssumedRoleCredentialRegistry(object):
+    """
+        This Class hands out one shared refreshable credential object per assumed role in the process
+        Credentials are keyed on (role_arn, external_id, base access key) and refreshed early in background,
+        so concurrent callers never issue their own STS AssumeRole call
+    """
+
+    # botocore refreshes lazily 15 minutes (advisory) and 10 minutes (mandatory) before expiry
+    early_refresh = 15 * 60
+    # Seconds before the advisory window at which background refresh fires
+    background_lead = 60
+
+    def __init__(self, **kwargs):
+        self.early_refresh = AssumedRoleCredentialRegistry.early_refresh
+        self.background_lead = AssumedRoleCredentialRegistry.background_lead
+        self.background_refresh = True
+        self.__dict__.update(kwargs)
+
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+
+        self.__lock = threading.Lock()
+        self.__credentials = dict()
+        self.__timers = dict()
+
+    def get_credentials(self, role_arn, base_session, external_id=None):
+        """
+        This method returns shared refreshable credentials for the role
+        :param role_arn: URI for role, example : "arn:aws:iam::123456789:role/role-crossaccount-xyz"
+        :param base_session: Base botocore Session used to call STS
+        :param external_id: external_id
+        :return: DeferredRefreshableCredentials shared by every caller of the same role
+        """
+        source_credentials = base_session.get_credentials()
+        key = (role_arn, external_id, source_credentials.access_key if source_credentials else None)
+
+        with self.__lock:
+            creds = self.__credentials.get(key)
+            if creds:
+                self.hits += 1
+                return creds
+            self.misses += 1
+
+            fetcher = credentials.AssumeRoleCredentialFetcher(
+                client_creator=base_session.create_client,
+                source_credentials=source_credentials,
+                role_arn=role_arn,
+                extra_args={'ExternalId': external_id} if external_id else None
+            )
+            creds = credentials.DeferredRefreshableCredentials(
+                method="assume-role",
+                refresh_using=lambda: self.__fetch(key, fetcher),
+                time_fetcher=lambda: datetime.datetime.now(tzlocal())
+            )
+            # Advisory refresh must stay ahead of mandatory refresh
+            if self.early_refresh > creds._mandatory_refresh_timeout:
+                creds._advisory_refresh_timeout = self.early_refresh
+            self.__credentials[key] = creds
+        return creds
+
+    def __fetch(self, key, fetcher) -> dict:
+        """
+        This method fetches credentials from STS and schedules the next background refresh
+        """
+        try:
+            metadata = fetcher.fetch_credentials()
+        except BaseException:
+            with self.__lock:
+                self.refresh_failures += 1
+            raise
+
+        with self.__lock:
+            self.refreshes += 1
+        logging.debug(f"Fetched assumed role credentials for {key[0]}, expiring at {metadata.get('expiry_time')}")
+
+        if self.background_refresh and metadata.get("expiry_time"):
+            self.__schedule_refresh(key, metadata["expiry_time"])
+        return metadata
+
+    def __schedule_refresh(self, key, expiry_time):
+        """
+        This method schedules a forced refresh background_lead seconds before the advisory window, so that request
+        threads never enter the window (and never wait on STS) while background refresh succeeds
+        Credentials which are issued already inside the window (short sessions) are refreshed lazily by botocore
+        :param key: Registry key of the credentials
+        :param expiry_time: Expiry time of current credentials
+        """
+        if isinstance(expiry_time, str):
+            expiry_time = isoparse(expiry_time)
+        delay = (expiry_time - datetime.datetime.now(tzlocal())).total_seconds() - self.early_refresh - \
+            self.background_lead
+        if delay <= 0:
+            logging.debug(f"Assumed role credentials for {key[0]} expire within advisory window, refreshed lazily")
+            return
+        timer = threading.Timer(delay, self.__refresh_in_background, args=(key,))
+        timer.daemon = True
+
+        with self.__lock:
+            previous = self.__timers.pop(key, None)
+            if previous:
+                previous.cancel()
+            self.__timers[key] = timer
+        timer.start()
+
+    def __refresh_in_background(self, key):
+        """
+        This method forces refresh of the shared credentials, they are not in advisory window yet so botocore would
+        not refresh them, a failure keeps current credentials (refreshed lazily in advisory window)
+        """
+        with self.__lock:
+            creds = self.__credentials.get(key)
+        if creds:
+            try:
+                with creds._refresh_lock:
+                    creds._protected_refresh(is_mandatory=False)
+            except BaseException:
+                logging.error(f"Background refresh of assumed role credentials failed : {traceback.format_exc()}")
+
+    def clear(self):
+        """
+        This method forgets every shared credential object and cancels pending refreshes
+        """
+        with self.__lock:
+            for timer in self.__timers.values():
+                timer.cancel()
+            self.__timers.clear()
+            self.__credentials.clear()
+
+    def stats(self) -> dict:
+        """
+        This method returns hit/miss/refresh counters of the registry
+        """
+        with self.__lock:
+            return {"roles": len(self.__credentials), "hits": self.hits, "misses": self.misses,
+                    "refreshes": self.refreshes, "refresh_failures": self.refresh_failures}
+
+
+# Process wide registry used by Client, Session, Resource and amazon_signing through assumed_role_session
+credential_registry = AssumedRoleCredentialRegistry()
+
+
 def assumed_role_session(role_arn, base_session, region_name="us-east-1", external_id=None):
     """
     This method is ripped of from below url to get AWS session using AssumeRoleProvider
     xref: https://stackoverflow.com/questions/44171849/aws-boto3-assumerole-example-which-includes-role-usage\
+    Credentials are shared across the process through credential_registry
     :param region_name: region name for service (default : us-east-1)
     :param role_arn: URI for role, example : "arn:aws:iam::123456789:role/role-crossaccount-xyz"
     :param base_session: Base Session for which ARP has been provided
     :param external_id: external_id
     :return: Boto3 session with ARP
     """
-    fetcher = credentials.AssumeRoleCredentialFetcher(
-        client_creator=base_session.create_client,
-        source_credentials=base_session.get_credentials(),
-        role_arn=role_arn,
-        extra_args={'ExternalId': external_id} if external_id else None
-    )
-    creds = credentials.DeferredRefreshableCredentials(
-        method="assume-role",
-        refresh_using=fetcher.fetch_credentials,
-        time_fetcher=lambda: datetime.datetime.now(tzlocal())
-    )
+    creds = credential_registry.get_credentials(role_arn=role_arn, base_session=base_session,
+                                                external_id=external_id)
     botocore_session = session.Session()
     botocore_session._credentials = creds
     return boto3.Session(botocore_session=botocore_session, region_name=region_name)
@@ -10,9 +10,11 @@ from botocore.config import Config
 
 try:
     from alpha_library.boto3_helper.arn_session import assumed_role_session
+    from alpha_library.boto3_helper.client_cache import cache_key, client_cache
 except ModuleNotFoundError:
     logging.info("Module called internally")
     from boto3_helper.arn_session import assumed_role_session
+    from boto3_helper.client_cache import cache_key, client_cache
 
 
 class Client(object):
@@ -22,11 +24,25 @@ class Client(object):
 
     def __init__(self, **kwargs):
         self.aws_details = None
+        # Clients are reused across the process unless explicitly disabled
+        self.use_cache = True
         self.__dict__.update(kwargs)
 
         logging.debug(f"Instance variables for Client : {self.__dict__}")
 
     def return_client(self, service_name, **kwargs):
+        """
+        This method returns AWS client from process wide cache, creating it if required
+        Cache is keyed on hash of credentials, service name, region, endpoint_url and Config
+        :param service_name: Service Name for client
+        """
+        if not self.use_cache:
+            return self.create_client(service_name, **kwargs)
+
+        key = cache_key(self.aws_details, service_name, kwargs)
+        return client_cache.get_or_create(key, lambda: self.create_client(service_name, **kwargs))
+
+    def create_client(self, service_name, **kwargs):
         """
         This method creates AWS clients
         :param service_name: Service Name for client
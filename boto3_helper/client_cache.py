@@ -0,0 +1,106 @@
+#!/usr/bin/python3
+# coding= utf-8
+"""
+This scripts provides a process wide cache for AWS clients and resources
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+def cache_key(*parts) -> str:
+    """
+    This method creates a stable hash out of the provided parts, so credentials never sit in plain text as cache key
+    :param parts: Credentials, service name, region, endpoint_url, Config etc.
+    :return: sha256 hex digest of the parts
+    """
+
+    def default(value):
+        # botocore Config does not implement __eq__/__hash__, hashing only the options provided by user
+        if hasattr(value, "_user_provided_options"):
+            return {"Config": value._user_provided_options}
+        return repr(value)
+
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=default).encode()).hexdigest()
+
+
+class ClientCache(object):
+    """
+        This Class handles thread safe LRU/TTL cache of boto3 clients
+    """
+
+    def __init__(self, max_size=64, ttl=3600):
+        """
+        :param max_size: Maximum number of clients to keep (default : 64)
+        :param ttl: Time in seconds after which a client is re-created (default : 3600)
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.__lock = threading.RLock()
+        self.__entries = OrderedDict()
+
+    def get_or_create(self, key, creator):
+        """
+        This method returns the cached object for the key, creating it with creator if missing or expired
+        :param key: Cache key, see cache_key
+        :param creator: Callable returning the object to cache
+        :return: Cached object
+        """
+        now = time.monotonic()
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry and (not self.ttl or now - entry[1] < self.ttl):
+                self.__entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        # Created outside the lock so a slow STS/endpoint call does not block other services
+        value = creator()
+        if value is None:
+            return value
+
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry and (not self.ttl or now - entry[1] < self.ttl):
+                # Some other thread was faster, reusing its object
+                return entry[0]
+            self.__entries[key] = (value, now)
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.max_size:
+                self.__entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        """
+        This method evicts every cached object
+        """
+        with self.__lock:
+            self.__entries.clear()
+
+    def stats(self) -> dict:
+        """
+        This method returns usage statistics of the cache
+        """
+        with self.__lock:
+            return {"size": len(self.__entries), "max_size": self.max_size, "ttl": self.ttl,
+                    "hits": self.hits, "misses": self.misses}
+
+
+# Process wide cache of clients, boto3 clients are thread safe while resources are not
+client_cache = ClientCache()
+# Resources are cached per thread, cache of a thread goes away with the thread
+resource_caches = threading.local()
+
+
+def thread_resource_cache() -> ClientCache:
+    """
+    This method returns resource cache of the calling thread
+    """
+    if not hasattr(resource_caches, "cache"):
+        resource_caches.cache = ClientCache()
+    return resource_caches.cache
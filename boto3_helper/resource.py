@@ -9,9 +9,11 @@ import traceback
 
 try:
     from alpha_library.boto3_helper.arn_session import assumed_role_session
+    from alpha_library.boto3_helper.client_cache import cache_key, thread_resource_cache
 except ModuleNotFoundError:
     logging.info("Module called internally")
     from boto3_helper.arn_session import assumed_role_session
+    from boto3_helper.client_cache import cache_key, thread_resource_cache
 
 
 class Resource(object):
@@ -21,11 +23,24 @@ class Resource(object):
 
     def __init__(self, **kwargs):
         self.aws_details = None
+        # Resources are reused within a thread unless explicitly disabled
+        self.use_cache = True
         self.__dict__.update(kwargs)
 
         logging.debug(f"Instance variables for Resource : {self.__dict__}")
 
     def return_resource(self, service_name, **kwargs):
+        """
+        This method returns AWS resource from cache, creating it if required
+        boto3 resources are not thread safe, hence every thread has a cache of its own
+        """
+        if not self.use_cache:
+            return self.create_resource(service_name, **kwargs)
+
+        key = cache_key(self.aws_details, service_name, kwargs)
+        return thread_resource_cache().get_or_create(key, lambda: self.create_resource(service_name, **kwargs))
+
+    def create_resource(self, service_name, **kwargs):
         """
         This method creates AWS resource
         """
@@ -6,7 +6,13 @@ Good idea for multiple file download based on a prefix from S3 bucket
 TODO : https://github.com/RaRe-Technologies/smart_open#iterating-over-an-s3-buckets-contents
 """
 import logging
+import os
+import queue
+import random
+import threading
+import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 
 import requests
 import s3fs
@@ -15,13 +21,17 @@ from smart_open import open
 
 try:
     from alpha_library.boto3_helper.client import Client
-    from alpha_library.gcp_helper.client import StorageClient
-    from alpha_library.azure_helper.client import AzureStorageClient
+    from alpha_library.boto3_helper.s3_transfer import S3MultipartUpload, S3RangedDownload
+    from alpha_library.helper.transfer_engine import TransferEngine, S3Provider, GSProvider, AzureProvider
+    from alpha_library.helper.range_reader import RangeReader, range_header
+    from alpha_library.helper.transfer_pipe import TransferPipe
 except ModuleNotFoundError:
     logging.info("Module called internally")
     from boto3_helper.client import Client
-    from gcp_helper.client import StorageClient
-    from azure_helper.client import AzureStorageClient
+    from boto3_helper.s3_transfer import S3MultipartUpload, S3RangedDownload
+    from helper.transfer_engine import TransferEngine, S3Provider, GSProvider, AzureProvider
+    from helper.range_reader import RangeReader, range_header
+    from helper.transfer_pipe import TransferPipe
 
 
 # Display
@@ -96,28 +106,124 @@ class DisplayS3Object(object):
             if kwargs.get("throw_exception"):
                 raise error
 
+    def object_content_if_changed(self, **kwargs) -> tuple:
+        """
+        This method downloads a S3 object unless its ETag still matches etag (conditional GET)
+        :return: (content in bytes or None when not modified, ETag)
+        """
+        try:
+            params = {"Bucket": kwargs['s3_details']['bucket_name'], "Key": kwargs['object_path']}
+            if kwargs.get("etag"):
+                params["IfNoneMatch"] = kwargs["etag"]
+            response = Client(aws_details=self.aws_details).return_client(
+                "s3", endpoint_url=kwargs.get("endpoint_url")).get_object(**params)
+            return response["Body"].read(), response.get("ETag")
+        except ClientError as error:
+            if error.response['Error']['Code'] in ('304', 'NotModified'):
+                return None, kwargs["etag"]
+            logging.error(f"Source credentials error: [{error}]")
+            if kwargs.get("throw_exception"):
+                raise error
+        except EndpointConnectionError as error:
+            logging.error(f"Endpoint connection error: [{error}]")
+            if kwargs.get("throw_exception"):
+                raise error
+        except BaseException as error:
+            logging.error(f"Uncaught exception in s3.py : {traceback.format_exc()}")
+            if kwargs.get("throw_exception"):
+                raise error
+
+    def __range_fetcher(self, **kwargs):
+        client = Client(aws_details=self.aws_details).return_client("s3", endpoint_url=kwargs.get("endpoint_url"))
+        bucket, key = kwargs['s3_details']['bucket_name'], kwargs['object_path']
+
+        def fetch(offset, length):
+            return client.get_object(Bucket=bucket, Key=key, Range=range_header(offset, length))["Body"].read()
+
+        return fetch
+
+    def read_range(self, **kwargs) -> bytes:
+        """
+        This method reads length bytes at offset of a S3 object with one ranged GET
+        Negative offset reads last -offset bytes (e.g. offset=-65536 for a parquet footer) and takes no length,
+        length None reads till end
+        """
+        try:
+            return self.__range_fetcher(**kwargs)(kwargs["offset"], kwargs.get("length"))
+        except ClientError as error:
+            logging.error(f"Source credentials error: [{error}]")
+            if kwargs.get("throw_exception"):
+                raise error
+        except EndpointConnectionError as error:
+            logging.error(f"Endpoint connection error: [{error}]")
+            if kwargs.get("throw_exception"):
+                raise error
+        except BaseException as error:
+            logging.error(f"Uncaught exception in s3.py : {traceback.format_exc()}")
+            if kwargs.get("throw_exception"):
+                raise error
+
+    def read_ranges(self, **kwargs) -> list:
+        """
+        This method reads many ranges [(offset, length), ...] of a S3 object
+        Nearby ranges are coalesced and fetched concurrently (max_gap, max_request_size, max_workers)
+        """
+        try:
+            return RangeReader.from_kwargs(**kwargs).read_ranges(self.__range_fetcher(**kwargs), kwargs["ranges"])
+        except ClientError as error:
+            logging.error(f"Source credentials error: [{error}]")
+            if kwargs.get("throw_exception"):
+                raise error
+        except EndpointConnectionError as error:
+            logging.error(f"Endpoint connection error: [{error}]")
+            if kwargs.get("throw_exception"):
+                raise error
+        except BaseException as error:
+            logging.error(f"Uncaught exception in s3.py : {traceback.format_exc()}")
+            if kwargs.get("throw_exception"):
+                raise error
+
     def get_latest_file_from_path(self, **kwargs):
         """
             Get Latest file from s3 folder path based on extension
+            Objects are streamed while listing (listed in parallel shards with parallel_listing)
+            With listing_index (helper.listing_index.ListingIndex), index is refreshed incrementally
+            and latest file is answered from it
         """
         try:
-            object_list = S3ObjectList(aws_details=self.aws_details).check_contents_of_s3(
-                s3_details=kwargs['s3_details'],
-                folder_to_check=kwargs['s3_details']['folder_path'])
-            if object_list and "extensions" in kwargs:
-                object_list = dict(filter(
-                    lambda item: item[1].get('Key').endswith(tuple(kwargs["extensions"])),
-                    object_list.items())
-                )
-            if not object_list:
+            if kwargs.get("listing_index"):
+                kwargs["listing_index"].refresh("s3", self.aws_details, kwargs['s3_details'],
+                                                kwargs['s3_details']['folder_path'],
+                                                mode=kwargs.get("index_refresh_mode", "incremental"))
+                latest_file = kwargs["listing_index"].latest_file("s3", kwargs['s3_details']['bucket_name'],
+                                                                  kwargs['s3_details']['folder_path'],
+                                                                  extensions=kwargs.get("extensions"))
+                if not latest_file:
+                    logging.error("No file found in input folder %s", kwargs['s3_details']['folder_path'])
+                    return None
+                return self.object_content(s3_details=kwargs['s3_details'], object_path=latest_file['Key'])
+
+            object_list = S3ObjectList(aws_details=self.aws_details)
+            list_params = {key: kwargs[key] for key in ("shard_boundaries", "shard_delimiter", "listing_workers")
+                           if key in kwargs}
+            objects = object_list.iter_objects_parallel if kwargs.get("parallel_listing") else \
+                object_list.iter_objects
+
+            latest_file = None
+            for item in objects(s3_details=kwargs['s3_details'], folder_to_check=kwargs['s3_details']['folder_path'],
+                                **list_params):
+                if "extensions" in kwargs and not item.get('Key').endswith(tuple(kwargs["extensions"])):
+                    continue
+                if latest_file is None or item.get('LastModified') > latest_file.get('LastModified'):
+                    latest_file = item
+
+            if not latest_file:
                 logging.error(
                     "No file found in input folder %s", kwargs['s3_details']['folder_path'])
                 return None
-            latest_file = max(object_list.items(), key=lambda item: item[1].get('LastModified'))
-            latest_file = latest_file[0]
             return self.object_content(
                 s3_details=kwargs['s3_details'],
-                object_path=latest_file
+                object_path=latest_file['Key']
             )
         except ClientError as error:
             logging.error(f"Source credentials error: [{error}]")
@@ -139,6 +245,12 @@ class S3ObjectList(object):
     """
         This class creates dict of s3 objects with some basic filter
     """
+    listing_workers = 16
+    # Batched existence check : up to head_threshold keys use head_object, above that the common prefix is listed
+    # as long as one listing page replaces at least list_page_cost head_object calls
+    head_threshold = 100
+    head_workers = 10
+    list_page_cost = 10
 
     def __init__(self, **kwargs):
 
@@ -174,40 +286,199 @@ class S3ObjectList(object):
                         return False
                 return True
             else:
-                logging.debug("No S3 object Filter")
+                # No S3 object Filter
                 return True
         else:
             return False
 
-    def __add_details_to_object_dict(self, list_objects_response: dict, last_modified=None):
+    def __return_s3_client(self, **kwargs):
         """
-        This method recursively add data into object Dictionary
-        :param list_objects_response: list_objects_response from boto3 s3 client
+        This method returns s3 client (from process wide cache) for the instance aws_details
         """
+        if "aws_session_token" in self.aws_details:
+            return Client(aws_details=self.aws_details). \
+                return_client(service_name="s3",
+                              endpoint_url=kwargs.get("endpoint_url"),
+                              aws_session_token=self.aws_details.get("aws_session_token"))
+        return Client(aws_details=self.aws_details). \
+            return_client(service_name="s3",
+                          endpoint_url=kwargs.get("endpoint_url"))
 
-        if list_objects_response["ResponseMetadata"]["HTTPStatusCode"] == 200:
-            if "Contents" in list_objects_response.keys():
-                for item in list_objects_response["Contents"]:
-                    if self.__object_filter(item):
-                        if last_modified and item["LastModified"] < last_modified:
-                            continue
-                        else:
-                            object_name = item["Key"]
-                            logging.debug(f"Object available in s3 in folder {self.folder_to_check} : {object_name}")
-                            self.object_dict.update({object_name: item})
+    def iter_objects(self, **kwargs):
+        """
+        Generator which walks list_objects_v2 pages iteratively and yields s3 items passing the filter
+        Only one page (1000 keys) is held at a time, so memory stays constant whatever the size of prefix is
+        :param kwargs: s3_details, folder_to_check, s3_object_filter, delimiter, last_modified, start_after, end_at
+        :return: Generator of s3 items (Key, LastModified, ETag, Size, StorageClass)
+        """
+        self.s3_instance = self.__return_s3_client(**kwargs)
+
+        self.folder_to_check = kwargs["folder_to_check"] if "folder_to_check" in kwargs else ""
+        self.s3_object_filter = kwargs["s3_object_filter"] if "s3_object_filter" in kwargs else None
+        self.delimiter = kwargs["delimiter"] if "delimiter" in kwargs else ""
+        self.s3_details = kwargs["s3_details"]
+        last_modified = kwargs.get("last_modified")
+        # Listing stops after this key (inclusive), used for sharded listing
+        end_at = kwargs.get("end_at")
+
+        # Required parameter to call list_objects_v2
+        list_objects_params = {"Bucket": self.s3_details["bucket_name"],
+                               "Prefix": self.folder_to_check,
+                               "Delimiter": self.delimiter}
+        if kwargs.get("start_after"):
+            list_objects_params["StartAfter"] = kwargs["start_after"]
+
+        try:
+            while True:
+                list_objects_response = self.s3_instance.list_objects_v2(**list_objects_params)
+                if list_objects_response["ResponseMetadata"]["HTTPStatusCode"] != 200:
+                    logging.error(f"Response from list_objects_v2 : {list_objects_response['ResponseMetadata']}")
+                    break
+
+                for item in list_objects_response.get("Contents", []):
+                    if end_at and item["Key"] > end_at:
+                        return
+                    if self.__object_filter(item) and not (last_modified and item["LastModified"] < last_modified):
+                        yield item
 
                 # This check if the response received was truncated or not
-                # If truncated then recursively call and update dictionary
-                if list_objects_response["IsTruncated"]:
-                    self.__add_details_to_object_dict(
-                        self.s3_instance.list_objects_v2(
-                            Bucket=self.s3_details["bucket_name"],
-                            Prefix=self.folder_to_check,
-                            Delimiter=self.delimiter,
-                            ContinuationToken=list_objects_response["NextContinuationToken"]), last_modified)
-        else:
-            logging.error(
-                f"Response from list_objects_v2 : {list_objects_response['ResponseMetadata']}")
+                if not list_objects_response["IsTruncated"]:
+                    break
+                list_objects_params["ContinuationToken"] = list_objects_response["NextContinuationToken"]
+
+        except GeneratorExit:
+            # Consumer stopped iterating early
+            raise
+        except ClientError as error:
+            logging.error(f"Source credentials error: [{error}]")
+            if kwargs.get("throw_exception"):
+                raise error
+        except EndpointConnectionError as error:
+            logging.error(f"Endpoint connection error: [{error}]")
+            if kwargs.get("throw_exception"):
+                raise error
+        except BaseException as error:
+            logging.error(f"Uncaught exception in s3.py : {traceback.format_exc()}")
+            if kwargs.get("throw_exception"):
+                raise error
+
+    def discover_shards(self, **kwargs) -> list:
+        """
+        This method discovers shards for parallel listing
+        Shards are either derived from shard_boundaries (sorted keys used with StartAfter) or from the
+        common prefixes found under folder_to_check using shard_delimiter
+        :return: List of shards, every shard is a dict of kwargs for iter_objects
+        """
+        folder_to_check = kwargs["folder_to_check"] if "folder_to_check" in kwargs else ""
+
+        if kwargs.get("shard_boundaries"):
+            boundaries = sorted(kwargs["shard_boundaries"])
+            lower_bounds = [None] + boundaries
+            upper_bounds = boundaries + [None]
+            return [{"folder_to_check": folder_to_check, "start_after": lower, "end_at": upper}
+                    for lower, upper in zip(lower_bounds, upper_bounds)]
+
+        # Objects sitting directly under folder_to_check are listed by a shard of their own using delimiter
+        shards = [{"folder_to_check": folder_to_check, "delimiter": kwargs.get("shard_delimiter", "/")}]
+        list_objects_params = {"Bucket": kwargs["s3_details"]["bucket_name"],
+                               "Prefix": folder_to_check,
+                               "Delimiter": kwargs.get("shard_delimiter", "/")}
+        s3_instance = self.__return_s3_client(**kwargs)
+        while True:
+            list_objects_response = s3_instance.list_objects_v2(**list_objects_params)
+            shards.extend({"folder_to_check": common_prefix["Prefix"]}
+                          for common_prefix in list_objects_response.get("CommonPrefixes", []))
+            if not list_objects_response["IsTruncated"]:
+                break
+            list_objects_params["ContinuationToken"] = list_objects_response["NextContinuationToken"]
+
+        logging.info(f"Discovered {len(shards)} shards in folder {folder_to_check}")
+        return shards
+
+    def iter_objects_parallel(self, **kwargs):
+        """
+        Generator which lists shards of the prefix concurrently and merges them into one stream
+        Objects are yielded as soon as any shard returns them, hence order of keys is not guaranteed
+        :param kwargs: Same as iter_objects, additionally
+            shard_boundaries : Sorted keys splitting the prefix, used with StartAfter (optional)
+            shard_delimiter : Delimiter used to discover common prefixes as shards (default : /)
+            listing_workers : Number of shards listed concurrently (default : 16)
+            delimiter : Listing with delimiter stays in a single level, hence it is listed by iter_objects
+        :return: Generator of s3 items
+        """
+        if kwargs.get("delimiter"):
+            yield from self.iter_objects(**kwargs)
+            return
+
+        shard_kwargs = {key: value for key, value in kwargs.items()
+                        if key not in ("folder_to_check", "delimiter", "start_after", "end_at")}
+        listing_workers = kwargs.get("listing_workers", S3ObjectList.listing_workers)
+
+        # Bounded queue of pages keeps memory constant when consumer is slower than listing
+        pages = queue.Queue(maxsize=listing_workers * 2)
+        stop = threading.Event()
+        shard_done = object()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    pages.put(item, timeout=1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def list_shard(shard):
+            page = []
+            try:
+                for item in S3ObjectList(aws_details=self.aws_details).iter_objects(**shard_kwargs, **shard):
+                    page.append(item)
+                    if len(page) == 1000:
+                        if not put(page):
+                            return
+                        page = []
+                if page:
+                    put(page)
+            except BaseException as error:
+                put(error)
+            finally:
+                put(shard_done)
+
+        executor = ThreadPoolExecutor(max_workers=listing_workers)
+        try:
+            shards = self.discover_shards(**kwargs)
+            for shard in shards:
+                executor.submit(list_shard, shard)
+
+            pending_shards = len(shards)
+            while pending_shards:
+                page = pages.get()
+                if page is shard_done:
+                    pending_shards -= 1
+                elif isinstance(page, BaseException):
+                    raise page
+                else:
+                    yield from page
+
+        except GeneratorExit:
+            # Consumer stopped iterating early
+            raise
+        except ClientError as error:
+            logging.error(f"Source credentials error: [{error}]")
+            if kwargs.get("throw_exception"):
+                raise error
+        except EndpointConnectionError as error:
+            logging.error(f"Endpoint connection error: [{error}]")
+            if kwargs.get("throw_exception"):
+                raise error
+        except BaseException as error:
+            logging.error(f"Uncaught exception in s3.py : {traceback.format_exc()}")
+            if kwargs.get("throw_exception"):
+                raise error
+        finally:
+            stop.set()
+            # Shards which did not start yet are dropped, running ones stop at their next page
+            executor.shutdown(wait=False, cancel_futures=True)
 
     def check_file_existence(self, key, **kwargs):
         """
@@ -218,15 +489,7 @@ class S3ObjectList(object):
         :params required
         key: str
         """
-        if "aws_session_token" in self.aws_details:
-            self.s3_instance = Client(aws_details=self.aws_details). \
-                return_client(service_name="s3",
-                              endpoint_url=kwargs.get("endpoint_url"),
-                              aws_session_token=self.aws_details.get("aws_session_token"))
-        else:
-            self.s3_instance = Client(aws_details=self.aws_details). \
-                return_client(service_name="s3",
-                              endpoint_url=kwargs.get("endpoint_url"))
+        self.s3_instance = self.__return_s3_client(**kwargs)
         self.s3_details = kwargs["s3_details"]
         try:
             self.s3_instance.head_object(
@@ -248,46 +511,83 @@ class S3ObjectList(object):
                 raise error
         return False
 
-    def check_contents_of_s3(self, **kwargs) -> dict:
+    def __head_keys(self, keys, **kwargs) -> dict:
         """
-        Driving method which will get contents of all the objects in s3
-        :return: Returns object dict containing details about s3
+        This method checks existence of keys with concurrent head_object calls on the pooled client
+        :return: Dict of key -> metadata (Key, Size, ETag, LastModified) or False
         """
-        return self.check_contents_of_storage(**kwargs)
+        bucket_name = kwargs["s3_details"]["bucket_name"]
 
-    def check_contents_of_storage(self, **kwargs) -> dict:
+        def head(key):
+            try:
+                response = self.s3_instance.head_object(Bucket=bucket_name, Key=key)
+                return key, {"Key": key, "Size": response.get("ContentLength"), "ETag": response.get("ETag"),
+                             "LastModified": response.get("LastModified")}
+            except ClientError as error:
+                if error.response['Error']['Code'] not in ('404', 'NoSuchKey', 'NotFound'):
+                    logging.error(f"Client error for {key}: [{error}]")
+                    if kwargs.get("throw_exception"):
+                        raise error
+                return key, False
+
+        # botocore pools max_pool_connections (10 by default) connections per client
+        with ThreadPoolExecutor(max_workers=kwargs.get("head_workers", self.head_workers)) as executor:
+            return dict(executor.map(head, keys))
+
+    def __list_keys(self, keys, **kwargs):
         """
-        Driving method which will get contents of all the objects in s3
-        :return: Returns object dict containing details about s3
+        This method checks existence of sorted keys by listing their common prefix once, listing is abandoned
+        when the prefix turns out to be sparse (listing costs more pages than the head calls it saves)
+        :return: Tuple of (dict of key -> metadata or False, keys left undecided)
         """
-        if "aws_session_token" in self.aws_details:
-            self.s3_instance = Client(aws_details=self.aws_details). \
-                return_client(service_name="s3",
-                              endpoint_url=kwargs.get("endpoint_url"),
-                              aws_session_token=self.aws_details.get("aws_session_token"))
-        else:
-            self.s3_instance = Client(aws_details=self.aws_details). \
-                return_client(service_name="s3",
-                              endpoint_url=kwargs.get("endpoint_url"))
-
-        self.folder_to_check = kwargs["folder_to_check"] if "folder_to_check" in kwargs else ""
-        self.s3_object_filter = kwargs["s3_object_filter"] if "s3_object_filter" in kwargs else None
-        self.delimiter = kwargs["delimiter"] if "delimiter" in kwargs else ""
+        prefix = os.path.commonprefix(keys)
+        list_objects_params = {"Bucket": kwargs["s3_details"]["bucket_name"], "Prefix": prefix}
+        if len(keys[0]) > len(prefix):
+            # Skipping the part of prefix sorting before the first key
+            list_objects_params["StartAfter"] = keys[0][:-1]
+        # Keys sorting after the listed position stay undecided until listing reaches them
+        allowed_pages = max(1, len(keys) // kwargs.get("list_page_cost", self.list_page_cost))
+
+        wanted, found, pages, last_listed = set(keys), dict(), 0, None
+        while True:
+            response = self.s3_instance.list_objects_v2(**list_objects_params)
+            pages += 1
+            for item in response.get("Contents", []):
+                last_listed = item["Key"]
+                if item["Key"] in wanted:
+                    found[item["Key"]] = {"Key": item["Key"], "Size": item["Size"], "ETag": item["ETag"],
+                                          "LastModified": item["LastModified"]}
+            if not response.get("IsTruncated") or (last_listed and last_listed >= keys[-1]):
+                return {key: found.get(key, False) for key in keys}, []
+            if pages >= allowed_pages:
+                logging.info(f"Prefix {prefix} too sparse for listing after {pages} pages, switching to head_object")
+                decided = {key: found.get(key, False) for key in keys if last_listed and key <= last_listed}
+                return decided, [key for key in keys if key not in decided]
+            list_objects_params["ContinuationToken"] = response["NextContinuationToken"]
+
+    def check_files_existence(self, keys, **kwargs) -> dict:
+        """
+        This method checks existence of many keys in one go
+        Few keys are checked with concurrent head_object, many keys are checked by listing their common
+        prefix once and joining the listing against the keys (falls back to head_object for a sparse prefix)
+        :param keys: Iterable of keys (pathFromRoot/file_name.extension)
+        :param kwargs: s3_details, head_threshold, head_workers, list_page_cost, strategy (auto|head|list)
+        :return: Dict of key -> metadata (Key, Size, ETag, LastModified) if key exists else False
+        """
+        self.s3_instance = self.__return_s3_client(**kwargs)
         self.s3_details = kwargs["s3_details"]
+        keys = sorted(set(keys))
+        strategy = kwargs.get("strategy", "auto")
+        if strategy == "auto":
+            strategy = "head" if len(keys) <= kwargs.get("head_threshold", self.head_threshold) else "list"
 
+        result = dict()
         try:
-            # Required parameter to call list_objects_v2
-            self.__add_details_to_object_dict(
-                self.s3_instance.list_objects_v2(Bucket=self.s3_details["bucket_name"],
-                                                 Prefix=self.folder_to_check,
-                                                 Delimiter=self.delimiter), kwargs.get("last_modified"))
-
-            logging.debug(f"Objects matching filter criteria : {self.object_dict}")
-
-            logging.info(f"Total No of Objects in S3 in folder {self.folder_to_check} : {len(self.object_dict)}")
-
+            if strategy == "list" and keys:
+                result, keys = self.__list_keys(keys, **kwargs)
+            result.update(self.__head_keys(keys, **kwargs))
         except ClientError as error:
-            logging.error(f"Source credentials error: [{error}]")
+            logging.error(f"Client error: [{error}]")
             if kwargs.get("throw_exception"):
                 raise error
         except EndpointConnectionError as error:
@@ -299,6 +599,31 @@ class S3ObjectList(object):
             if kwargs.get("throw_exception"):
                 raise error
 
+        logging.info(f"{sum(1 for value in result.values() if value)} of {len(result)} keys exist in the "
+                     f"bucket {self.s3_details['bucket_name']}")
+        return result
+
+    def check_contents_of_s3(self, **kwargs) -> dict:
+        """
+        Driving method which will get contents of all the objects in s3
+        :return: Returns object dict containing details about s3
+        """
+        return self.check_contents_of_storage(**kwargs)
+
+    def check_contents_of_storage(self, **kwargs) -> dict:
+        """
+        Driving method which will get contents of all the objects in s3
+        Thin wrapper over iter_objects (iter_objects_parallel with parallel_listing),
+        prefer the generators for prefixes with large number of objects
+        :return: Returns object dict containing details about s3
+        """
+        objects = self.iter_objects_parallel(**kwargs) if kwargs.get("parallel_listing") else \
+            self.iter_objects(**kwargs)
+        for item in objects:
+            self.object_dict[item["Key"]] = item
+
+        logging.info(f"Total No of Objects in S3 in folder {self.folder_to_check} : {len(self.object_dict)}")
+
         return self.object_dict
 
 
@@ -320,12 +645,18 @@ class CopyObjectFromLocalToS3(object):
     def copy_to_destination_storage(self, **kwargs):
         """
         This method uploads file from local machine to s3
+        Data is expected in bytes (data), a local file path (source_file_path) or a file object (file_object),
+        the later two are uploaded with parallel multipart upload having bounded memory
+        additional arguments : part_size, max_workers, max_buffer_size, checkpoint_path, extra_args
         """
 
         object_destination_address = f"s3://{kwargs['destination_s3_details']['bucket_name']}/" \
                                      f"{kwargs['object_destination_path']}"
 
         try:
+            if kwargs.get("source_file_path") or kwargs.get("file_object"):
+                return self.upload_to_destination_storage(**kwargs)
+
             destination_transport_params = {
                 "client": Client(aws_details=self.destination_aws_details).return_client(
                     "s3", endpoint_url=kwargs.get("destination_endpoint_url")),
@@ -351,6 +682,26 @@ class CopyObjectFromLocalToS3(object):
             if kwargs.get("throw_exception"):
                 raise error
 
+    def upload_to_destination_storage(self, **kwargs) -> dict:
+        """
+        This method uploads local file path or file object to s3 using S3MultipartUpload
+        :return: Summary of upload
+        """
+        upload_params = {key: kwargs[key] for key in ("part_size", "max_workers", "max_buffer_size",
+                                                      "checkpoint_path", "extra_args") if kwargs.get(key)}
+        uploader = S3MultipartUpload(
+            client=Client(aws_details=self.destination_aws_details).return_client(
+                "s3", endpoint_url=kwargs.get("destination_endpoint_url")),
+            **upload_params)
+
+        if kwargs.get("source_file_path"):
+            return uploader.upload_file(file_path=kwargs["source_file_path"],
+                                        bucket=kwargs['destination_s3_details']['bucket_name'],
+                                        key=kwargs['object_destination_path'])
+        return uploader.upload_stream(file_object=kwargs["file_object"],
+                                      bucket=kwargs['destination_s3_details']['bucket_name'],
+                                      key=kwargs['object_destination_path'])
+
     def copy_to_destination_storage_str(self, **kwargs):
         """
         This method uploads file from local machine to s3
@@ -407,8 +758,20 @@ class CopyObjectFromS3ToLocal(object):
     def download_content(self, **kwargs):
         """
         This method downloads file from s3 to local machine
+        With parallel_download, object is fetched with concurrent ranged GETs into a preallocated file
+        additional arguments : parallel_download, part_size, max_workers, verify_checksum
         """
         try:
+            if kwargs.get("parallel_download"):
+                download_params = {key: kwargs[key] for key in ("part_size", "max_workers", "verify_checksum")
+                                   if kwargs.get(key) is not None}
+                return S3RangedDownload(
+                    client=Client(aws_details=self.aws_details).return_client(
+                        "s3", endpoint_url=kwargs.get("endpoint_url")),
+                    **download_params).download(bucket=kwargs['s3_details']['bucket_name'],
+                                                key=kwargs['object_path'],
+                                                file_path=kwargs["local_file_path"])
+
             object_address = f"s3://{kwargs['s3_details']['bucket_name']}/" \
                              f"{kwargs['object_path']}"
 
@@ -482,8 +845,7 @@ class CopyObjectFromURLtoS3(object):
                         'ContentType'] = f_read.response.headers['content-type']
                 with open(object_destination_address, "wb",
                           transport_params=destination_transport_params) as f_write:
-                    for data_line in CopyObjectFromURLtoS3.read_in_chunks(f_read, chunk_size):
-                        f_write.write(data_line)
+                    TransferPipe.stream(f_read, f_write, **kwargs)
 
         try:
 
@@ -537,62 +899,20 @@ class CopyObjectFromS3ToS3(object):
 
         logging.debug(f"Instance variables for CopyObjectFromS3ToS3 : {self.__dict__}")
 
-    @staticmethod
-    def read_in_chunks(file_object, chunk_size):
-        """
-        Lazy function (generator) to read a file piece by piece.
-        Default chunk size: 1k.
-        xref: https://dataroz.com/stream-large-files-between-s3-and-gcs-python/
-        """
-        while True:
-            data = file_object.read(chunk_size)
-            if not data:
-                break
-            yield data
-
     def copy_from_source_to_destination_storage(self, **kwargs):
         """
-        This method downloads file from one s3 to another s3
+        This method copies file from one s3 to another s3
+        Server side copy (CopyObject/UploadPartCopy) is used when both sides share endpoint and credentials,
+        otherwise data is streamed through local machine
+        additional arguments : server_side_copy (default True), part_size, max_workers
         """
-
-        try:
-            chunk_size = kwargs["chunk_size"] if kwargs.get("chunk_size") else CopyObjectFromS3ToS3.chunk_size
-            object_original_address = f"s3://{kwargs['source_s3_details']['bucket_name']}/" \
-                                      f"{kwargs['object_original_path']}"
-            object_destination_address = f"s3://{kwargs['destination_s3_details']['bucket_name']}/" \
-                                         f"{kwargs['object_destination_path']}"
-
-            source_transport_params = {
-                "client": Client(aws_details=self.source_aws_details).return_client(
-                    "s3", endpoint_url=kwargs.get("source_endpoint_url")),
-            }
-
-            destination_transport_params = {
-                "client": Client(aws_details=self.destination_aws_details).return_client(
-                    "s3", endpoint_url=kwargs.get("destination_endpoint_url")),
-                "min_part_size": chunk_size
-            }
-
-            with open(object_original_address, "rb",
-                      transport_params=source_transport_params) as f_read:
-                if f_read._raw_reader._content_length <= CopyObjectFromS3ToS3.max_size_for_single_upload:
-                    destination_transport_params["multipart_upload"] = False
-                with open(object_destination_address, "wb",
-                          transport_params=destination_transport_params) as f_write:
-                    for data_line in CopyObjectFromS3ToS3.read_in_chunks(f_read, chunk_size):
-                        f_write.write(data_line)
-        except ClientError as error:
-            logging.error(f"Source credentials error: [{error}]")
-            if kwargs.get("throw_exception"):
-                raise error
-        except EndpointConnectionError as error:
-            logging.error(f"Endpoint connection error: [{error}]")
-            if kwargs.get("throw_exception"):
-                raise error
-        except BaseException as error:
-            logging.error(f"Uncaught exception in s3.py : {traceback.format_exc()}")
-            if kwargs.get("throw_exception"):
-                raise error
+        return TransferEngine().copy(
+            S3Provider(cred_details=self.source_aws_details, endpoint_url=kwargs.get("source_endpoint_url")),
+            kwargs["source_s3_details"], kwargs["object_original_path"],
+            S3Provider(cred_details=self.destination_aws_details,
+                       endpoint_url=kwargs.get("destination_endpoint_url"),
+                       max_size_for_single_upload=CopyObjectFromS3ToS3.max_size_for_single_upload),
+            kwargs["destination_s3_details"], kwargs["object_destination_path"], **kwargs)
 
 
 class CopyObjectFromS3ToGS(object):
@@ -610,59 +930,15 @@ class CopyObjectFromS3ToGS(object):
 
         logging.debug(f"Instance variables for CopyObjectFromS3ToGS : {self.__dict__}")
 
-    @staticmethod
-    def read_in_chunks(file_object, chunk_size):
-        """
-        Lazy function (generator) to read a file piece by piece.
-        Default chunk size: 1k.
-        xref: https://dataroz.com/stream-large-files-between-s3-and-gcs-python/
-        """
-        while True:
-            data = file_object.read(chunk_size)
-            if not data:
-                break
-            yield data
-
     def copy_from_source_to_destination_storage(self, **kwargs):
         """
         This method downloads file from one s3 to another s3
         """
-
-        try:
-            chunk_size = kwargs["chunk_size"] if kwargs.get("chunk_size") else CopyObjectFromS3ToGS.chunk_size
-            object_original_address = f"s3://{kwargs['source_s3_details']['bucket_name']}/" \
-                                      f"{kwargs['object_original_path']}"
-            object_destination_address = f"gs://{kwargs['destination_gs_details']['bucket_name']}/" \
-                                         f"{kwargs['object_destination_path']}"
-
-            source_transport_params = {
-                "client": Client(aws_details=self.source_aws_details).return_client(
-                    "s3", endpoint_url=kwargs.get("source_endpoint_url")),
-            }
-
-            destination_transport_params = {
-                "client": StorageClient(sa_json_data=self.destination_sa_json_data).return_client(),
-                "min_part_size": chunk_size
-            }
-
-            with open(object_original_address, "rb",
-                      transport_params=source_transport_params) as f_read:
-                with open(object_destination_address, "wb",
-                          transport_params=destination_transport_params) as f_write:
-                    for data_line in CopyObjectFromS3ToGS.read_in_chunks(f_read, chunk_size):
-                        f_write.write(data_line)
-        except ClientError as error:
-            logging.error(f"Source credentials error: [{error}]")
-            if kwargs.get("throw_exception"):
-                raise error
-        except EndpointConnectionError as error:
-            logging.error(f"Endpoint connection error: [{error}]")
-            if kwargs.get("throw_exception"):
-                raise error
-        except BaseException as error:
-            logging.error(f"Uncaught exception in s3.py : {traceback.format_exc()}")
-            if kwargs.get("throw_exception"):
-                raise error
+        return TransferEngine().copy(
+            S3Provider(cred_details=self.source_aws_details, endpoint_url=kwargs.get("source_endpoint_url")),
+            kwargs["source_s3_details"], kwargs["object_original_path"],
+            GSProvider(cred_details=self.destination_sa_json_data),
+            kwargs["destination_gs_details"], kwargs["object_destination_path"], **kwargs)
 
 
 class CopyObjectFromS3ToAzure(object):
@@ -681,62 +957,15 @@ class CopyObjectFromS3ToAzure(object):
 
         logging.debug(f"Instance variables for CopyObjectFromS3ToAzure : {self.__dict__}")
 
-    @staticmethod
-    def read_in_chunks(file_object, chunk_size):
-        """
-        Lazy function (generator) to read a file piece by piece.
-        Default chunk size: 1k.
-        xref: https://dataroz.com/stream-large-files-between-gs-and-gcs-python/
-        """
-        while True:
-            data = file_object.read(chunk_size)
-            if not data:
-                break
-            yield data
-
     def copy_from_source_to_destination_storage(self, **kwargs):
         """
         This method downloads file from one s3 to another azure
         """
-
-        try:
-            chunk_size = kwargs["chunk_size"] if kwargs.get("chunk_size") else CopyObjectFromS3ToAzure.chunk_size
-
-            object_original_address = f"s3://{kwargs['source_aws_details']['bucket_name']}/" \
-                                      f"{kwargs['object_original_path']}"
-            object_destination_address = f"azure://{kwargs['destination_container_details']['container_name']}/" \
-                                         f"{kwargs['object_destination_path']}"
-
-            source_transport_params = {
-                "client": Client(aws_details=self.source_aws_details).return_client(
-                    "s3", endpoint_url=kwargs.get("source_endpoint_url")),
-                "min_part_size": chunk_size
-            }
-
-            destination_transport_params = {
-                "client": AzureStorageClient(account_url=self.account_url,
-                                             azure_details=self.destination_azure_details).return_blob_service_client()
-            }
-
-            with open(object_original_address, "rb",
-                      transport_params=source_transport_params) as f_read:
-                with open(object_destination_address, "wb",
-                          transport_params=destination_transport_params) as f_write:
-                    for data_line in CopyObjectFromS3ToAzure.read_in_chunks(f_read, chunk_size):
-                        f_write.write(data_line)
-
-        except ClientError as error:
-            logging.error(f"Source credentials error: [{error}]")
-            if kwargs.get("throw_exception"):
-                raise error
-        except EndpointConnectionError as error:
-            logging.error(f"Endpoint connection error: [{error}]")
-            if kwargs.get("throw_exception"):
-                raise error
-        except BaseException as error:
-            logging.error(f"Uncaught exception in s3.py : {traceback.format_exc()}")
-            if kwargs.get("throw_exception"):
-                raise error
+        return TransferEngine().copy(
+            S3Provider(cred_details=self.source_aws_details, endpoint_url=kwargs.get("source_endpoint_url")),
+            kwargs["source_s3_details"], kwargs["object_original_path"],
+            AzureProvider(cred_details=self.destination_azure_details, account_url=self.account_url),
+            kwargs["destination_container_details"], kwargs["object_destination_path"], **kwargs)
 
 
 # S3 FS
@@ -801,10 +1030,21 @@ class DeleteS3Object(object):
         This class provide wrapper to delete S3 objects
     """
 
+    # DeleteObjects accepts at most 1000 keys per request
+    batch_size = 1000
+    max_workers = 8
+    max_retries = 5
+    base_backoff = 0.2
+    max_backoff = 20
+    retryable_error_codes = ("SlowDown", "InternalError", "ServiceUnavailable", "RequestTimeout", "Throttling")
+
     def __init__(self, **kwargs):
 
         # Required variable to drive this Class, expected to be provided from parent Object
         self.aws_details = None
+        self.batch_size = DeleteS3Object.batch_size
+        self.max_workers = DeleteS3Object.max_workers
+        self.max_retries = DeleteS3Object.max_retries
         self.__dict__.update(kwargs)
 
         logging.debug(f"Instance variables for S3DeleteObject : {self.__dict__}")
@@ -848,4 +1088,127 @@ class DeleteS3Object(object):
         else:
             logging.error("No S3 details provided !")
 
+    def __iter_keys(self, s3_client_instance, **kwargs):
+        """
+        Generator over every key under prefix, empty objects (folder markers) included
+        """
+        list_objects_params = {"Bucket": kwargs["s3_details"]["bucket_name"], "Prefix": kwargs["prefix"]}
+        while True:
+            list_objects_response = s3_client_instance.list_objects_v2(**list_objects_params)
+            for item in list_objects_response.get("Contents", []):
+                yield item["Key"]
+            if not list_objects_response.get("IsTruncated"):
+                break
+            list_objects_params["ContinuationToken"] = list_objects_response["NextContinuationToken"]
+
+    def __delete_batch(self, s3_client_instance, bucket_name, keys, max_retries) -> dict:
+        """
+        This method deletes one batch with DeleteObjects, keys failing with retryable errors are retried with
+        exponential backoff (full jitter)
+        :return: Dict of deleted count, failed items and number of retries of the batch
+        """
+        result = {"deleted": 0, "failed": [], "retries": 0}
+        for attempt in range(max_retries + 1):
+            if attempt:
+                result["retries"] += 1
+                time.sleep(random.uniform(0, min(self.max_backoff, self.base_backoff * 2 ** attempt)))
+            try:
+                response = s3_client_instance.delete_objects(
+                    Bucket=bucket_name, Delete={"Objects": [{"Key": key} for key in keys], "Quiet": True})
+            except ClientError as error:
+                if error.response["Error"]["Code"] not in self.retryable_error_codes or attempt == max_retries:
+                    result["failed"].extend({"Key": key, "Code": error.response["Error"]["Code"],
+                                             "Message": str(error)} for key in keys)
+                    return result
+                continue
+
+            # Quiet mode, only failed keys are returned
+            errors = response.get("Errors", [])
+            result["deleted"] += len(keys) - len(errors)
+            retryable = [error for error in errors if error.get("Code") in self.retryable_error_codes]
+            result["failed"].extend(error for error in errors if error.get("Code") not in self.retryable_error_codes)
+            if not retryable:
+                return result
+            if attempt == max_retries:
+                result["failed"].extend(retryable)
+                return result
+            keys = [error["Key"] for error in retryable]
+        return result
+
+    def delete_objects_from_storage(self, **kwargs) -> dict:
+        """
+        Driving method which deletes many S3 objects with DeleteObjects (up to 1000 keys per request),
+        batches are sent concurrently while keys are still being read/listed
+        :param kwargs: s3_details, keys (iterable of keys) or prefix, batch_size, max_workers, max_retries
+        :return: Summary dict (requested, deleted, failed, batches, retries, seconds)
+        """
+        start = time.monotonic()
+        summary = {"requested": 0, "deleted": 0, "failed": [], "batches": 0, "retries": 0}
+        if "s3_details" not in kwargs:
+            logging.error("No S3 details provided !")
+            return summary
+
+        max_retries = kwargs.get("max_retries", self.max_retries)
+        batch_size = min(kwargs.get("batch_size", self.batch_size), DeleteS3Object.batch_size)
+        max_workers = kwargs.get("max_workers", self.max_workers)
+        bucket_name = kwargs["s3_details"]["bucket_name"]
+
+        def collect(done_futures):
+            for done_future in done_futures:
+                result = done_future.result()
+                summary["deleted"] += result["deleted"]
+                summary["failed"].extend(result["failed"])
+                summary["retries"] += result["retries"]
+
+        try:
+            s3_client_instance = Client(aws_details=self.aws_details). \
+                return_client(service_name="s3", endpoint_url=kwargs.get("endpoint_url"))
+            if "keys" in kwargs:
+                keys = iter(kwargs["keys"])
+            elif kwargs.get("prefix"):
+                keys = self.__iter_keys(s3_client_instance, **kwargs)
+            else:
+                # Empty prefix would wipe out the whole bucket
+                logging.error("Neither keys nor prefix provided to delete !")
+                return summary
+
+            futures = set()
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                batch = []
+                for key in keys:
+                    batch.append(key)
+                    summary["requested"] += 1
+                    if len(batch) < batch_size:
+                        continue
+                    # Keeping in-flight batches bounded so that keys are not read far ahead of deletion
+                    if len(futures) >= max_workers * 2:
+                        done, futures = wait(futures, return_when=FIRST_COMPLETED)
+                        collect(done)
+                    futures.add(executor.submit(self.__delete_batch, s3_client_instance, bucket_name, batch,
+                                                max_retries))
+                    summary["batches"] += 1
+                    batch = []
+                if batch:
+                    futures.add(executor.submit(self.__delete_batch, s3_client_instance, bucket_name, batch,
+                                                max_retries))
+                    summary["batches"] += 1
+                collect(wait(futures).done)
+        except ClientError as error:
+            logging.error(f"Source credentials error: [{error}]")
+            if kwargs.get("throw_exception"):
+                raise error
+        except EndpointConnectionError as error:
+            logging.error(f"Endpoint connection error: [{error}]")
+            if kwargs.get("throw_exception"):
+                raise error
+        except BaseException as error:
+            logging.error(f"Uncaught exception in s3.py : {traceback.format_exc()}")
+            if kwargs.get("throw_exception"):
+                raise error
+
+        summary["seconds"] = round(time.monotonic() - start, 3)
+        logging.info(f"Deleted {summary['deleted']} of {summary['requested']} objects from {bucket_name} in "
+                     f"{summary['batches']} batches ({len(summary['failed'])} failed, {summary['retries']} retries)")
+        return summary
+
 
@@ -0,0 +1,479 @@
+#!/usr/bin/python3
+# coding=utf-8
+"""
+This scripts provides transfer engines over AWS S3 client (server side copy, multipart upload, ranged download)
+"""
+import hashlib
+import json
+import logging
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ClientError
+
+try:
+    from alpha_library.helper.hash_calculator import S3ETag
+except ModuleNotFoundError:
+    logging.info("Module called internally")
+    from helper.hash_calculator import S3ETag
+
+# Keys of aws_details which identify the credentials (region and bucket are not part of identity)
+credential_keys = ("access_key", "secret_key", "aws_session_token", "assigned_role_arn", "external_id",
+                   "profile_name")
+
+
+def same_credentials(source_aws_details, destination_aws_details) -> bool:
+    """
+    This method checks whether two aws_details resolve to same credentials
+    :param source_aws_details: aws_details of source
+    :param destination_aws_details: aws_details of destination
+    :return: True if both sides use same credentials
+    """
+    source_aws_details = source_aws_details or {}
+    destination_aws_details = destination_aws_details or {}
+    return all(source_aws_details.get(key) == destination_aws_details.get(key) for key in credential_keys)
+
+
+class S3ServerSideCopy(object):
+    """
+    This class copies object inside S3 without moving data through local machine
+    CopyObject is used for small objects and parallel UploadPartCopy for large objects
+    """
+    part_size = 256 * 1024 ** 2
+    max_size_for_single_copy = 256 * 1024 ** 2
+    max_workers = 10
+
+    # S3 Limits
+    min_part_size = 5 * 1024 ** 2
+    max_parts = 10000
+
+    def __init__(self, **kwargs):
+        # Required variable to drive this Class, expected to be provided from parent Object
+        self.client = None
+        self.part_size = S3ServerSideCopy.part_size
+        self.max_size_for_single_copy = S3ServerSideCopy.max_size_for_single_copy
+        self.max_workers = S3ServerSideCopy.max_workers
+        self.__dict__.update(kwargs)
+
+        logging.debug(f"Instance variables for S3ServerSideCopy : {self.__dict__}")
+
+    def copy(self, source_bucket, source_key, destination_bucket, destination_key) -> dict:
+        """
+        This method copies object from source to destination using S3 server side copy
+        :param source_bucket: Source bucket name
+        :param source_key: Source object path
+        :param destination_bucket: Destination bucket name
+        :param destination_key: Destination object path
+        :return: Summary of copy (size, parts, seconds)
+        """
+        start = time.monotonic()
+        head = self.client.head_object(Bucket=source_bucket, Key=source_key)
+        size = head["ContentLength"]
+        copy_source = {"Bucket": source_bucket, "Key": source_key}
+
+        if size <= self.max_size_for_single_copy:
+            self.client.copy_object(CopySource=copy_source, Bucket=destination_bucket, Key=destination_key)
+            parts = 1
+        else:
+            parts = self.__multipart_copy(copy_source, head, destination_bucket, destination_key)
+
+        summary = {"size": size, "parts": parts, "seconds": time.monotonic() - start}
+        logging.info(f"Server side copy of s3://{source_bucket}/{source_key} to "
+                     f"s3://{destination_bucket}/{destination_key} : {summary}")
+        return summary
+
+    def __multipart_copy(self, copy_source, head, destination_bucket, destination_key) -> int:
+        """
+        This method splits object into ranges and copies them concurrently with UploadPartCopy
+        :return: Number of parts copied
+        """
+        size = head["ContentLength"]
+        part_size = max(self.part_size, S3ServerSideCopy.min_part_size,
+                        math.ceil(size / S3ServerSideCopy.max_parts))
+        ranges = [(part_number, offset, min(offset + part_size, size) - 1)
+                  for part_number, offset in enumerate(range(0, size, part_size), start=1)]
+
+        # Keeping content type and user metadata of source, as CopyObject does
+        extra_args = {"Metadata": head.get("Metadata", {})}
+        if head.get("ContentType"):
+            extra_args["ContentType"] = head["ContentType"]
+        upload_id = self.client.create_multipart_upload(Bucket=destination_bucket, Key=destination_key,
+                                                        **extra_args)["UploadId"]
+
+        def copy_part(part):
+            part_number, first_byte, last_byte = part
+            response = self.client.upload_part_copy(Bucket=destination_bucket, Key=destination_key,
+                                                    UploadId=upload_id, PartNumber=part_number,
+                                                    CopySource=copy_source,
+                                                    CopySourceRange=f"bytes={first_byte}-{last_byte}",
+                                                    # Fails the part if source changed in between
+                                                    CopySourceIfMatch=head["ETag"])
+            return {"PartNumber": part_number, "ETag": response["CopyPartResult"]["ETag"]}
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                completed_parts = list(executor.map(copy_part, ranges))
+            self.client.complete_multipart_upload(Bucket=destination_bucket, Key=destination_key,
+                                                  UploadId=upload_id,
+                                                  MultipartUpload={"Parts": completed_parts})
+        except BaseException:
+            self.client.abort_multipart_upload(Bucket=destination_bucket, Key=destination_key, UploadId=upload_id)
+            raise
+        return len(ranges)
+
+
+class S3MultipartUpload(object):
+    """
+    This class uploads file path or file object to S3 with parallel multipart upload
+    Parts are read lazily (os.pread for files) and in flight data is bounded by max_buffer_size,
+    completed parts can be persisted to checkpoint_path to resume an interrupted upload
+    """
+    part_size = 64 * 1024 ** 2
+    max_workers = 8
+    max_buffer_size = 512 * 1024 ** 2
+
+    # S3 Limits
+    min_part_size = 5 * 1024 ** 2
+    max_parts = 10000
+
+    def __init__(self, **kwargs):
+        # Required variable to drive this Class, expected to be provided from parent Object
+        self.client = None
+        self.part_size = S3MultipartUpload.part_size
+        self.max_workers = S3MultipartUpload.max_workers
+        self.max_buffer_size = S3MultipartUpload.max_buffer_size
+        self.checkpoint_path = None
+        # Extra arguments for put_object/create_multipart_upload (ContentType, Metadata etc.)
+        self.extra_args = dict()
+        self.__dict__.update(kwargs)
+
+        self.__lock = threading.Lock()
+
+        logging.debug(f"Instance variables for S3MultipartUpload : {self.__dict__}")
+
+    def upload_file(self, file_path, bucket, key) -> dict:
+        """
+        This method uploads local file to S3, parts are read concurrently with os.pread
+        :param file_path: Local file path
+        :param bucket: Destination bucket name
+        :param key: Destination object path
+        :return: Summary of upload (size, parts, resumed_parts, seconds)
+        """
+        size = os.path.getsize(file_path)
+        part_size = self.__part_size(size)
+
+        with open(file_path, "rb") as file_object:
+            fd = file_object.fileno()
+
+            def read_part(offset, length):
+                return S3MultipartUpload.pread(fd, length, offset)
+
+            if size <= part_size:
+                return self.__single_upload(read_part(0, size), bucket, key)
+
+            parts = [(part_number, offset, min(part_size, size - offset))
+                     for part_number, offset in enumerate(range(0, size, part_size), start=1)]
+            return self.__multipart_upload(parts, read_part, size, part_size, bucket, key)
+
+    def upload_stream(self, file_object, bucket, key) -> dict:
+        """
+        This method uploads file object (anything with read) to S3, parts are read sequentially and uploaded
+        concurrently
+        :param file_object: Readable file object
+        :param bucket: Destination bucket name
+        :param key: Destination object path
+        :return: Summary of upload (size, parts, resumed_parts, seconds)
+        """
+        part_size = self.__part_size(0)
+        first_part = file_object.read(part_size)
+        if len(first_part) < part_size:
+            return self.__single_upload(first_part, bucket, key)
+
+        pending = {"data": first_part, "offset": 0}
+
+        def parts():
+            # Yields parts while keeping a single part of read-ahead to know where the stream ends
+            part_number = 1
+            while pending["data"]:
+                offset, length = pending["offset"], len(pending["data"])
+                yield part_number, offset, length
+                part_number += 1
+
+        def read_part(offset, length):
+            data = pending["data"]
+            pending["data"] = file_object.read(part_size)
+            pending["offset"] = offset + length
+            return data
+
+        return self.__multipart_upload(parts(), read_part, None, part_size, bucket, key, sequential=True)
+
+    @staticmethod
+    def pread(fd, length, offset) -> bytes:
+        """
+        This method reads exactly length bytes at offset without moving file pointer
+        """
+        chunks = []
+        while length > 0:
+            data = os.pread(fd, length, offset)
+            if not data:
+                break
+            chunks.append(data)
+            length -= len(data)
+            offset += len(data)
+        return chunks[0] if len(chunks) == 1 else b"".join(chunks)
+
+    def __part_size(self, size) -> int:
+        """
+        This method returns part size respecting S3 limits
+        """
+        return max(self.part_size, S3MultipartUpload.min_part_size, math.ceil(size / S3MultipartUpload.max_parts))
+
+    def __single_upload(self, data, bucket, key) -> dict:
+        """
+        This method uploads small data with single put_object
+        """
+        start = time.monotonic()
+        self.client.put_object(Bucket=bucket, Key=key, Body=data, **self.extra_args)
+        return {"size": len(data), "parts": 1, "resumed_parts": 0, "seconds": time.monotonic() - start}
+
+    def __load_checkpoint(self, bucket, key, size, part_size):
+        """
+        This method loads upload_id and completed parts from checkpoint, confirming them with list_parts
+        :return: upload_id (None if nothing to resume) and dict of part_number -> ETag
+        """
+        if not (self.checkpoint_path and os.path.exists(self.checkpoint_path)):
+            return None, dict()
+
+        with open(self.checkpoint_path) as checkpoint_file:
+            checkpoint = json.load(checkpoint_file)
+        if [checkpoint.get("bucket"), checkpoint.get("key"), checkpoint.get("size"), checkpoint.get("part_size")] != \
+                [bucket, key, size, part_size]:
+            logging.info(f"Checkpoint {self.checkpoint_path} belongs to another upload, starting afresh")
+            return None, dict()
+
+        completed_parts = dict()
+        try:
+            paginator = self.client.get_paginator("list_parts")
+            for page in paginator.paginate(Bucket=bucket, Key=key, UploadId=checkpoint["upload_id"]):
+                for part in page.get("Parts", []):
+                    completed_parts[part["PartNumber"]] = part["ETag"]
+        except ClientError as error:
+            if error.response["Error"]["Code"] == "NoSuchUpload":
+                logging.info(f"Upload {checkpoint['upload_id']} does not exist anymore, starting afresh")
+                return None, dict()
+            raise
+
+        # Only parts known to both checkpoint and S3 are trusted
+        completed_parts = {int(part_number): etag for part_number, etag in checkpoint["parts"].items()
+                           if completed_parts.get(int(part_number)) == etag}
+        logging.info(f"Resuming upload {checkpoint['upload_id']} with {len(completed_parts)} completed parts")
+        return checkpoint["upload_id"], completed_parts
+
+    def __save_checkpoint(self, bucket, key, size, part_size, upload_id, completed_parts):
+        """
+        This method persists completed parts atomically, expected to be called with lock held
+        """
+        if not self.checkpoint_path:
+            return
+        temporary_path = f"{self.checkpoint_path}.tmp"
+        with open(temporary_path, "w") as checkpoint_file:
+            json.dump({"bucket": bucket, "key": key, "size": size, "part_size": part_size,
+                       "upload_id": upload_id, "parts": completed_parts}, checkpoint_file)
+        os.replace(temporary_path, self.checkpoint_path)
+
+    def __multipart_upload(self, parts, read_part, size, part_size, bucket, key, sequential=False) -> dict:
+        """
+        This method uploads parts concurrently, at most max_buffer_size bytes are held in memory at a time
+        :param parts: Iterable of (part_number, offset, length)
+        :param read_part: Callable(offset, length) returning the bytes of the part
+        :param sequential: Whether read_part has to be called in order (streams)
+        """
+        start = time.monotonic()
+        upload_id, completed_parts = self.__load_checkpoint(bucket, key, size, part_size)
+        resumed_parts = len(completed_parts)
+        if not upload_id:
+            upload_id = self.client.create_multipart_upload(Bucket=bucket, Key=key, **self.extra_args)["UploadId"]
+            self.__save_checkpoint(bucket, key, size, part_size, upload_id, completed_parts)
+
+        in_flight_parts = max(1, self.max_buffer_size // part_size)
+        buffer_slots = threading.BoundedSemaphore(in_flight_parts)
+
+        def upload_part(part_number, data):
+            try:
+                response = self.client.upload_part(Bucket=bucket, Key=key, UploadId=upload_id,
+                                                   PartNumber=part_number, Body=data)
+                with self.__lock:
+                    completed_parts[part_number] = response["ETag"]
+                    self.__save_checkpoint(bucket, key, size, part_size, upload_id, completed_parts)
+            finally:
+                buffer_slots.release()
+
+        def read_and_upload_part(part_number, offset, length):
+            upload_part(part_number, read_part(offset, length))
+
+        uploaded_size, part_count = 0, 0
+        try:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, in_flight_parts)) as executor:
+                futures = []
+                for part_number, offset, length in parts:
+                    part_count += 1
+                    uploaded_size += length
+                    if part_number in completed_parts:
+                        if sequential:
+                            # Stream has to move forward even for parts which are already uploaded
+                            read_part(offset, length)
+                        continue
+                    # Waiting for buffer budget before reading next part
+                    buffer_slots.acquire()
+                    if sequential:
+                        futures.append(executor.submit(upload_part, part_number, read_part(offset, length)))
+                    else:
+                        futures.append(executor.submit(read_and_upload_part, part_number, offset, length))
+                    # Failing fast instead of reading rest of the data
+                    for future in [future for future in futures if future.done()]:
+                        future.result()
+                for future in futures:
+                    future.result()
+
+            self.client.complete_multipart_upload(
+                Bucket=bucket, Key=key, UploadId=upload_id,
+                MultipartUpload={"Parts": [{"PartNumber": part_number, "ETag": completed_parts[part_number]}
+                                           for part_number in sorted(completed_parts)]})
+        except BaseException:
+            if self.checkpoint_path:
+                logging.error(f"Upload {upload_id} interrupted, can be resumed using {self.checkpoint_path}")
+            else:
+                self.client.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+            raise
+
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+        summary = {"size": uploaded_size, "parts": part_count, "resumed_parts": resumed_parts,
+                   "seconds": time.monotonic() - start}
+        logging.info(f"Multipart upload to s3://{bucket}/{key} : {summary}")
+        return summary
+
+
+class S3RangedDownload(object):
+    """
+    This class downloads S3 object with concurrent ranged GETs written directly at their offset (os.pwrite)
+    into a preallocated local file
+    """
+    part_size = 32 * 1024 ** 2
+    max_workers = 8
+    # Size of reads from response body, every read is written straight to its offset
+    io_chunk_size = 1024 ** 2
+
+    def __init__(self, **kwargs):
+        # Required variable to drive this Class, expected to be provided from parent Object
+        self.client = None
+        self.part_size = S3RangedDownload.part_size
+        self.max_workers = S3RangedDownload.max_workers
+        self.io_chunk_size = S3RangedDownload.io_chunk_size
+        # ETag of downloaded file is recalculated and compared with ETag of object, see verify_etag
+        self.verify_checksum = True
+        self.__dict__.update(kwargs)
+
+        logging.debug(f"Instance variables for S3RangedDownload : {self.__dict__}")
+
+    @staticmethod
+    def preallocate(fd, size):
+        """
+        This method reserves size bytes for the file, falling back to ftruncate where fallocate is unsupported
+        """
+        try:
+            os.posix_fallocate(fd, 0, size)
+        except (AttributeError, OSError):
+            os.ftruncate(fd, size)
+
+    @staticmethod
+    def pwrite(fd, data, offset):
+        """
+        This method writes whole data at offset without moving file pointer
+        """
+        view = memoryview(data)
+        while view:
+            written = os.pwrite(fd, view, offset)
+            view = view[written:]
+            offset += written
+
+    def verify_etag(self, fd, bucket, key, head, file_path):
+        """
+        This method recalculates ETag of downloaded file and compares it with ETag of object
+        Multipart ETag is recalculated at part size of the upload (size of its first part, every part but the last
+        has it), ETag of SSE-KMS / SSE-C objects is not a checksum so only size is verified for them
+        """
+        etag, size = head["ETag"].strip('"'), head["ContentLength"]
+        if (head.get("ServerSideEncryption") or "").startswith("aws:kms") or head.get("SSECustomerAlgorithm"):
+            logging.info(f"ETag of s3://{bucket}/{key} is not a checksum (SSE-KMS / SSE-C), only size verified")
+            return
+        if "-" in etag:
+            part_size = self.client.head_object(Bucket=bucket, Key=key, PartNumber=1,
+                                                IfMatch=head["ETag"])["ContentLength"]
+            hasher = S3ETag(part_size=part_size, multipart=True)
+        else:
+            hasher = hashlib.md5()
+        for offset in range(0, size, self.io_chunk_size):
+            hasher.update(os.pread(fd, self.io_chunk_size, offset))
+        if hasher.hexdigest() != etag:
+            raise IOError(f"Checksum mismatch for {file_path} : expected {etag}, got {hasher.hexdigest()}")
+
+    def download(self, bucket, key, file_path) -> dict:
+        """
+        This method downloads object into file_path
+        :param bucket: Source bucket name
+        :param key: Source object path
+        :param file_path: Local file path
+        :return: Stats of download (size, etag, seconds, mib_per_second, parts)
+        """
+        start = time.monotonic()
+        head = self.client.head_object(Bucket=bucket, Key=key)
+        size, etag = head["ContentLength"], head["ETag"]
+        ranges = [(part_number, offset, min(offset + self.part_size, size) - 1)
+                  for part_number, offset in enumerate(range(0, size, self.part_size), start=1)]
+
+        def fetch_part(part):
+            part_number, first_byte, last_byte = part
+            part_start = time.monotonic()
+            # IfMatch makes every range fail if object is overwritten while downloading
+            body = self.client.get_object(Bucket=bucket, Key=key, Range=f"bytes={first_byte}-{last_byte}",
+                                          IfMatch=etag)["Body"]
+            offset = first_byte
+            for chunk in iter(lambda: body.read(self.io_chunk_size), b""):
+                S3RangedDownload.pwrite(fd, chunk, offset)
+                offset += len(chunk)
+            if offset != last_byte + 1:
+                raise IOError(f"Incomplete range {first_byte}-{last_byte} of s3://{bucket}/{key}, got {offset} bytes")
+
+            seconds = time.monotonic() - part_start
+            length = last_byte - first_byte + 1
+            return {"part_number": part_number, "offset": first_byte, "length": length, "seconds": seconds,
+                    "mib_per_second": length / 1024 ** 2 / seconds if seconds else None}
+
+        fd = os.open(file_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o666)
+        try:
+            if size:
+                S3RangedDownload.preallocate(fd, size)
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                parts = list(executor.map(fetch_part, ranges))
+
+            if os.fstat(fd).st_size != size:
+                raise IOError(f"Size mismatch for {file_path} : expected {size}, got {os.fstat(fd).st_size}")
+            if self.verify_checksum:
+                self.verify_etag(fd, bucket, key, head, file_path)
+        except BaseException:
+            os.close(fd)
+            os.remove(file_path)
+            raise
+        os.close(fd)
+
+        seconds = time.monotonic() - start
+        stats = {"size": size, "etag": etag, "seconds": seconds,
+                 "mib_per_second": size / 1024 ** 2 / seconds if seconds else None, "parts": parts}
+        logging.info(f"Ranged download of s3://{bucket}/{key} : size {size}, {len(parts)} parts, "
+                     f"{seconds:.2f} seconds")
+        return stats
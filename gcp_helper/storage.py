@@ -5,22 +5,27 @@ This scripts provides wrapper over GCP storage
 xref : https://medium.com/@erdoganyesil/read-file-from-google-cloud-storage-with-python-cf1b913bd134
 """
 import logging
+import os
+import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 
 import gcsfs
-from google.api_core.exceptions import NotFound
+from google.api_core.exceptions import NotFound, NotModified
 from smart_open import open
 
 try:
     from alpha_library.gcp_helper.client import StorageClient
-    from alpha_library.azure_helper.client import AzureStorageClient
-    from alpha_library.boto3_helper.client import Client
+    from alpha_library.helper.transfer_engine import TransferEngine, S3Provider, GSProvider, AzureProvider
+    from alpha_library.helper.range_reader import RangeReader, check_range
+    from alpha_library.helper.transfer_pipe import TransferPipe
 
 except ModuleNotFoundError:
     logging.info("Module called internally")
     from gcp_helper.client import StorageClient
-    from azure_helper.client import AzureStorageClient
-    from boto3_helper.client import Client
+    from helper.transfer_engine import TransferEngine, S3Provider, GSProvider, AzureProvider
+    from helper.range_reader import RangeReader, check_range
+    from helper.transfer_pipe import TransferPipe
 
 
 # Display
@@ -70,12 +75,72 @@ class DisplayGSObject(object):
             if kwargs.get("throw_exception"):
                 raise error
 
+    def object_content_if_changed(self, **kwargs) -> tuple:
+        """
+        This method downloads a GS object unless its ETag still matches etag (conditional GET)
+        :return: (content in bytes or None when not modified, ETag)
+        """
+        try:
+            blob = StorageClient(sa_json_data=self.sa_json_data).return_client().bucket(
+                kwargs['gs_details']['bucket_name']).blob(kwargs['object_path'])
+            try:
+                data = blob.download_as_bytes(if_etag_not_match=kwargs.get("etag"))
+            except NotModified:
+                return None, kwargs["etag"]
+            return data, blob.etag
+
+        except BaseException as error:
+            logging.error(f"Uncaught exception in gcs/storage.py : {traceback.format_exc()}")
+            if kwargs.get("throw_exception"):
+                raise error
+
+    def __range_fetcher(self, **kwargs):
+        blob = StorageClient(sa_json_data=self.sa_json_data).return_client().bucket(
+            kwargs['gs_details']['bucket_name']).blob(kwargs['object_path'])
+
+        def fetch(offset, length):
+            check_range(offset, length)
+            # Negative start is sent as suffix range
+            return blob.download_as_bytes(start=offset, end=offset + length - 1 if length is not None else None)
+
+        return fetch
+
+    def read_range(self, **kwargs) -> bytes:
+        """
+        This method reads length bytes at offset of a GS object with one ranged GET
+        Negative offset reads last -offset bytes (without length), length None reads till end
+        """
+        try:
+            return self.__range_fetcher(**kwargs)(kwargs["offset"], kwargs.get("length"))
+
+        except BaseException as error:
+            logging.error(f"Uncaught exception in gcs/storage.py : {traceback.format_exc()}")
+            if kwargs.get("throw_exception"):
+                raise error
+
+    def read_ranges(self, **kwargs) -> list:
+        """
+        This method reads many ranges [(offset, length), ...] of a GS object, nearby ranges are coalesced
+        """
+        try:
+            return RangeReader.from_kwargs(**kwargs).read_ranges(self.__range_fetcher(**kwargs), kwargs["ranges"])
+
+        except BaseException as error:
+            logging.error(f"Uncaught exception in gcs/storage.py : {traceback.format_exc()}")
+            if kwargs.get("throw_exception"):
+                raise error
+
 
 # Access GS
 class GSObjectList(object):
     """
         This class creates dict of gs objects with some basic filter
     """
+    # Batched existence check : up to head_threshold keys use get_blob, above that the key range is listed
+    # as long as one listing page (1000 blobs) replaces at least list_page_cost get_blob calls
+    head_threshold = 100
+    head_workers = 10
+    list_page_cost = 10
 
     def __init__(self, **kwargs):
         # Required variables to drive this Object
@@ -98,15 +163,44 @@ class GSObjectList(object):
         def dict_creation(func):
             def wrapper(self, **kwargs):
                 blobs = func(self, **kwargs)
-                return {blob.name: {"Key": blob.name,
-                                    "LastModified": blob.updated,
-                                    "ETag": blob.etag,
-                                    "Size": blob.size,
-                                    "StorageClass": blob.storage_class,
-                                    "Blob": blob} for blob in blobs}
+                return {blob.name: GSObjectList.blob_details(blob) for blob in blobs}
 
             return wrapper
 
+    @staticmethod
+    def blob_details(blob) -> dict:
+        """
+        This method converts blob into s3 like item
+        """
+        return {"Key": blob.name,
+                "LastModified": blob.updated,
+                "ETag": blob.etag,
+                "Size": blob.size,
+                "StorageClass": blob.storage_class,
+                "Blob": blob}
+
+    def iter_objects(self, **kwargs):
+        """
+        Generator over blobs of the prefix (non empty), list_blobs fetches pages lazily so memory stays constant
+        :param kwargs: gs_details, folder_to_check, start_after (listing starts after this key)
+        :return: Generator of s3 like items (Key, LastModified, ETag, Size, StorageClass, Blob)
+        """
+        try:
+            storage_client = StorageClient(sa_json_data=self.sa_json_data).return_client()
+            blobs = storage_client.list_blobs(bucket_or_name=kwargs["gs_details"]["bucket_name"],
+                                              prefix=kwargs.get("folder_to_check"),
+                                              start_offset=kwargs.get("start_after"))
+            for blob in blobs:
+                # start_offset is inclusive unlike StartAfter of s3
+                if blob.size > 0 and blob.name != kwargs.get("start_after"):
+                    yield GSObjectList.blob_details(blob)
+        except GeneratorExit:
+            raise
+        except BaseException as error:
+            logging.error(f"Uncaught exception in gcs/storage.py : {traceback.format_exc()}")
+            if kwargs.get("throw_exception"):
+                raise error
+
     @Decorator.dict_creation
     @Decorator.filter_items
     def check_contents_of_storage(self, **kwargs):
@@ -148,6 +242,73 @@ class GSObjectList(object):
                 raise error
         return False
 
+    @staticmethod
+    def __head_keys(bucket, keys, **kwargs) -> dict:
+        """
+        This method checks existence of keys with concurrent get_blob calls
+        :return: Dict of key -> s3 like item or False
+        """
+        def head(key):
+            blob = bucket.get_blob(key)
+            return key, GSObjectList.blob_details(blob) if blob else False
+
+        with ThreadPoolExecutor(max_workers=kwargs.get("head_workers", GSObjectList.head_workers)) as executor:
+            return dict(executor.map(head, keys))
+
+    @staticmethod
+    def __list_keys(storage_client, keys, **kwargs):
+        """
+        This method checks existence of sorted keys by listing the key range once, listing is abandoned
+        when the range turns out to be sparse (listing costs more pages than the get_blob calls it saves)
+        :return: Tuple of (dict of key -> s3 like item or False, keys left undecided)
+        """
+        # end_offset is exclusive
+        blobs = storage_client.list_blobs(bucket_or_name=kwargs["gs_details"]["bucket_name"],
+                                          prefix=os.path.commonprefix(keys),
+                                          start_offset=keys[0], end_offset=keys[-1] + "\x00")
+        allowed_blobs = max(1, len(keys) // kwargs.get("list_page_cost", GSObjectList.list_page_cost)) * 1000
+
+        wanted, found, last_listed = set(keys), dict(), None
+        for listed, blob in enumerate(blobs, start=1):
+            last_listed = blob.name
+            if blob.name in wanted:
+                found[blob.name] = GSObjectList.blob_details(blob)
+            if listed >= allowed_blobs:
+                logging.info(f"Key range too sparse for listing after {listed} blobs, switching to get_blob")
+                decided = {key: found.get(key, False) for key in keys if key <= last_listed}
+                return decided, [key for key in keys if key not in decided]
+        return {key: found.get(key, False) for key in keys}, []
+
+    def check_files_existence(self, keys, **kwargs) -> dict:
+        """
+        This method checks existence of many keys in one go
+        Few keys are checked with concurrent get_blob, many keys are checked by listing their key range once
+        and joining the listing against the keys (falls back to get_blob for a sparse range)
+        :param keys: Iterable of keys (pathFromRoot/file_name.extension)
+        :param kwargs: gs_details, head_threshold, head_workers, list_page_cost, strategy (auto|head|list)
+        :return: Dict of key -> s3 like item if key exists else False
+        """
+        keys = sorted(set(keys))
+        strategy = kwargs.get("strategy", "auto")
+        if strategy == "auto":
+            strategy = "head" if len(keys) <= kwargs.get("head_threshold", self.head_threshold) else "list"
+
+        result = dict()
+        try:
+            storage_client = StorageClient(sa_json_data=self.sa_json_data).return_client()
+            if strategy == "list" and keys:
+                result, keys = GSObjectList.__list_keys(storage_client, keys, **kwargs)
+            result.update(GSObjectList.__head_keys(storage_client.bucket(
+                bucket_name=kwargs["gs_details"]["bucket_name"]), keys, **kwargs))
+        except BaseException as error:
+            logging.error(f"Uncaught exception in gcs/storage.py : {traceback.format_exc()}")
+            if kwargs.get("throw_exception"):
+                raise error
+
+        logging.info(f"{sum(1 for value in result.values() if value)} of {len(result)} keys exist in the "
+                     f"bucket {kwargs['gs_details']['bucket_name']}")
+        return result
+
 
 # Copy
 class CopyObjectFromLocalToGS(object):
@@ -289,8 +450,7 @@ class CopyObjectFromURLtoGS(object):
             with open(kwargs["url"], "rb", transport_params=source_transport_params) as f_read:
                 with open(object_destination_address, "wb",
                           transport_params=destination_transport_params) as f_write:
-                    for data_line in CopyObjectFromURLtoGS.read_in_chunks(f_read, chunk_size):
-                        f_write.write(data_line)
+                    TransferPipe.stream(f_read, f_write, **kwargs)
 
         except BaseException as error:
             logging.error(f"Uncaught exception in gcs/storage.py : {traceback.format_exc()}")
@@ -313,51 +473,15 @@ class CopyObjectFromGSToGS(object):
 
         logging.debug(f"Instance variables for CopyObjectFromGSToGS : {self.__dict__}")
 
-    @staticmethod
-    def read_in_chunks(file_object, chunk_size):
-        """
-        Lazy function (generator) to read a file piece by piece.
-        Default chunk size: 1k.
-        xref: https://dataroz.com/stream-large-files-between-gs-and-gcs-python/
-        """
-        while True:
-            data = file_object.read(chunk_size)
-            if not data:
-                break
-            yield data
-
     def copy_from_source_to_destination_storage(self, **kwargs):
         """
         This method downloads file from one gs to another gs
         """
-
-        try:
-            chunk_size = kwargs["chunk_size"] if kwargs.get("chunk_size") else CopyObjectFromGSToGS.chunk_size
-            object_original_address = f"gs://{kwargs['source_gs_details']['bucket_name']}/" \
-                                      f"{kwargs['object_original_path']}"
-            object_destination_address = f"gs://{kwargs['destination_gs_details']['bucket_name']}/" \
-                                         f"{kwargs['object_destination_path']}"
-
-            source_transport_params = {
-                "client": StorageClient(sa_json_data=self.source_sa_json_data).return_client()
-            }
-
-            destination_transport_params = {
-                "client": StorageClient(sa_json_data=self.destination_sa_json_data).return_client(),
-                "min_part_size": chunk_size
-            }
-
-            with open(object_original_address, "rb",
-                      transport_params=source_transport_params) as f_read:
-                with open(object_destination_address, "wb",
-                          transport_params=destination_transport_params) as f_write:
-                    for data_line in CopyObjectFromGSToGS.read_in_chunks(f_read, chunk_size):
-                        f_write.write(data_line)
-
-        except BaseException as error:
-            logging.error(f"Uncaught exception in gcs/storage.py : {traceback.format_exc()}")
-            if kwargs.get("throw_exception"):
-                raise error
+        return TransferEngine().copy(
+            GSProvider(cred_details=self.source_sa_json_data),
+            kwargs["source_gs_details"], kwargs["object_original_path"],
+            GSProvider(cred_details=self.destination_sa_json_data),
+            kwargs["destination_gs_details"], kwargs["object_destination_path"], **kwargs)
 
 
 class CopyObjectFromGSToS3(object):
@@ -375,52 +499,16 @@ class CopyObjectFromGSToS3(object):
 
         logging.debug(f"Instance variables for CopyObjectFromGSToS3 : {self.__dict__}")
 
-    @staticmethod
-    def read_in_chunks(file_object, chunk_size):
-        """
-        Lazy function (generator) to read a file piece by piece.
-        Default chunk size: 1k.
-        xref: https://dataroz.com/stream-large-files-between-gs-and-gcs-python/
-        """
-        while True:
-            data = file_object.read(chunk_size)
-            if not data:
-                break
-            yield data
-
     def copy_from_source_to_destination_storage(self, **kwargs):
         """
         This method downloads file from one gs to another gs
         """
-
-        try:
-            chunk_size = kwargs["chunk_size"] if kwargs.get("chunk_size") else CopyObjectFromGSToS3.chunk_size
-            object_original_address = f"gs://{kwargs['source_gs_details']['bucket_name']}/" \
-                                      f"{kwargs['object_original_path']}"
-            object_destination_address = f"s3://{kwargs['destination_s3_details']['bucket_name']}/" \
-                                         f"{kwargs['object_destination_path']}"
-
-            source_transport_params = {
-                "client": StorageClient(sa_json_data=self.source_sa_json_data).return_client()
-            }
-
-            destination_transport_params = {
-                "client": Client(aws_details=self.destination_aws_details).return_client(
-                    "s3", endpoint_url=kwargs.get("destination_endpoint_url")),
-                "min_part_size": chunk_size
-            }
-
-            with open(object_original_address, "rb",
-                      transport_params=source_transport_params) as f_read:
-                with open(object_destination_address, "wb",
-                          transport_params=destination_transport_params) as f_write:
-                    for data_line in CopyObjectFromGSToS3.read_in_chunks(f_read, chunk_size):
-                        f_write.write(data_line)
-
-        except BaseException as error:
-            logging.error(f"Uncaught exception in gcs/storage.py : {traceback.format_exc()}")
-            if kwargs.get("throw_exception"):
-                raise error
+        return TransferEngine().copy(
+            GSProvider(cred_details=self.source_sa_json_data),
+            kwargs["source_gs_details"], kwargs["object_original_path"],
+            S3Provider(cred_details=self.destination_aws_details,
+                       endpoint_url=kwargs.get("destination_endpoint_url")),
+            kwargs["destination_s3_details"], kwargs["object_destination_path"], **kwargs)
 
 
 class CopyObjectFromGSToAzure(object):
@@ -439,51 +527,15 @@ class CopyObjectFromGSToAzure(object):
 
         logging.debug(f"Instance variables for CopyObjectFromGSToAzure : {self.__dict__}")
 
-    @staticmethod
-    def read_in_chunks(file_object, chunk_size):
-        """
-        Lazy function (generator) to read a file piece by piece.
-        Default chunk size: 1k.
-        xref: https://dataroz.com/stream-large-files-between-gs-and-gcs-python/
-        """
-        while True:
-            data = file_object.read(chunk_size)
-            if not data:
-                break
-            yield data
-
     def copy_from_source_to_destination_storage(self, **kwargs):
         """
         This method downloads file from one gs to another azure
         """
-
-        try:
-            chunk_size = kwargs["chunk_size"] if kwargs.get("chunk_size") else CopyObjectFromGSToAzure.chunk_size
-            object_original_address = f"gs://{kwargs['source_gs_details']['bucket_name']}/" \
-                                      f"{kwargs['object_original_path']}"
-            object_destination_address = f"azure://{kwargs['destination_container_details']['container_name']}/" \
-                                         f"{kwargs['object_destination_path']}"
-
-            source_transport_params = {
-                "client": StorageClient(sa_json_data=self.source_sa_json_data).return_client()
-            }
-
-            destination_transport_params = {
-                "client": AzureStorageClient(account_url=self.account_url,
-                                             azure_details=self.destination_azure_details).return_blob_service_client()
-            }
-
-            with open(object_original_address, "rb",
-                      transport_params=source_transport_params) as f_read:
-                with open(object_destination_address, "wb",
-                          transport_params=destination_transport_params) as f_write:
-                    for data_line in CopyObjectFromGSToAzure.read_in_chunks(f_read, chunk_size):
-                        f_write.write(data_line)
-
-        except BaseException as error:
-            logging.error(f"Uncaught exception in gcs/storage.py : {traceback.format_exc()}")
-            if kwargs.get("throw_exception"):
-                raise error
+        return TransferEngine().copy(
+            GSProvider(cred_details=self.source_sa_json_data),
+            kwargs["source_gs_details"], kwargs["object_original_path"],
+            AzureProvider(cred_details=self.destination_azure_details, account_url=self.account_url),
+            kwargs["destination_container_details"], kwargs["object_destination_path"], **kwargs)
 
 
 # GCS FS
@@ -525,9 +577,15 @@ class GSDeleteObject(object):
         This class provide wrapper to delete GS objects
     """
 
+    # JSON API batch request accepts at most 100 calls
+    batch_size = 100
+    max_workers = 8
+
     def __init__(self, **kwargs):
         # Required variable to drive this Class, expected to be provided from parent Object
         self.sa_json_data = None
+        self.batch_size = GSDeleteObject.batch_size
+        self.max_workers = GSDeleteObject.max_workers
         self.__dict__.update(kwargs)
 
         logging.debug(f"Instance variables for GSDeleteObject : {self.__dict__}")
@@ -548,3 +606,88 @@ class GSDeleteObject(object):
             if kwargs.get("throw_exception"):
                 raise error
 
+    @staticmethod
+    def delete_batch(storage_client, bucket_name, keys) -> dict:
+        """
+        This method deletes one batch of blobs with a single batch request, if the batch fails keys are deleted
+        one by one so that every key gets its own outcome (NotFound counts as deleted)
+        :return: Dict of deleted count and failed items of the batch
+        """
+        result = {"deleted": 0, "failed": []}
+        bucket = storage_client.bucket(bucket_name=bucket_name)
+        try:
+            with storage_client.batch():
+                for key in keys:
+                    bucket.blob(key).delete()
+            result["deleted"] = len(keys)
+            return result
+        except BaseException:
+            logging.warning(f"Batch delete of {len(keys)} blobs failed, falling back to single deletes")
+
+        for key in keys:
+            try:
+                bucket.blob(key).delete()
+                result["deleted"] += 1
+            except NotFound:
+                result["deleted"] += 1
+            except BaseException as error:
+                result["failed"].append({"Key": key, "Code": type(error).__name__, "Message": str(error)})
+        return result
+
+    def delete_objects_from_storage(self, **kwargs) -> dict:
+        """
+        This method deletes many GS objects with batch requests (up to 100 calls per request) sent concurrently
+        :param kwargs: gs_details, keys (iterable of keys) or prefix, batch_size, max_workers
+        :return: Summary dict (requested, deleted, failed, batches, seconds)
+        """
+        start = time.monotonic()
+        summary = {"requested": 0, "deleted": 0, "failed": [], "batches": 0, "retries": 0}
+        batch_size = min(kwargs.get("batch_size", self.batch_size), GSDeleteObject.batch_size)
+        bucket_name = kwargs["gs_details"]["bucket_name"]
+        try:
+            storage_client = StorageClient(sa_json_data=self.sa_json_data).return_client()
+            if "keys" in kwargs:
+                keys = iter(kwargs["keys"])
+            elif kwargs.get("prefix"):
+                keys = (blob.name for blob in storage_client.list_blobs(bucket_or_name=bucket_name,
+                                                                        prefix=kwargs["prefix"]))
+            else:
+                # Empty prefix would wipe out the whole bucket
+                logging.error("Neither keys nor prefix provided to delete !")
+                return summary
+
+            def collect(done_futures):
+                for done_future in done_futures:
+                    result = done_future.result()
+                    summary["deleted"] += result["deleted"]
+                    summary["failed"].extend(result["failed"])
+
+            max_workers = kwargs.get("max_workers", self.max_workers)
+            futures = set()
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                batch = []
+                for key in keys:
+                    batch.append(key)
+                    summary["requested"] += 1
+                    if len(batch) < batch_size:
+                        continue
+                    # Keeping in-flight batches bounded so that keys are not read far ahead of deletion
+                    if len(futures) >= max_workers * 2:
+                        done, futures = wait(futures, return_when=FIRST_COMPLETED)
+                        collect(done)
+                    futures.add(executor.submit(GSDeleteObject.delete_batch, storage_client, bucket_name, batch))
+                    summary["batches"] += 1
+                    batch = []
+                if batch:
+                    futures.add(executor.submit(GSDeleteObject.delete_batch, storage_client, bucket_name, batch))
+                    summary["batches"] += 1
+                collect(wait(futures).done)
+        except BaseException as error:
+            logging.error(f"Uncaught exception in gcs/storage.py : {traceback.format_exc()}")
+            if kwargs.get("throw_exception"):
+                raise error
+
+        summary["seconds"] = round(time.monotonic() - start, 3)
+        logging.info(f"Deleted {summary['deleted']} of {summary['requested']} objects from {bucket_name} in "
+                     f"{summary['batches']} batches ({len(summary['failed'])} failed)")
+        return summary
@@ -0,0 +1,632 @@
+#!/usr/bin/python3
+# coding=utf-8
+"""
+This scripts provides asyncio wrapper over storage providers in alpha_library
+S3 is served by aiobotocore, Azure by azure.storage.blob.aio and GS by aiohttp on top of GCS JSON API
+"""
+import asyncio
+import base64
+import logging
+import os
+import time
+import traceback
+from urllib.parse import quote
+
+import aiohttp
+from aiobotocore.config import AioConfig
+from aiobotocore.credentials import AioAssumeRoleCredentialFetcher, AioCredentials, \
+    AioDeferredRefreshableCredentials
+from aiobotocore.session import AioSession
+from azure.core.credentials import AzureNamedKeyCredential, AzureSasCredential
+from azure.core.exceptions import ResourceNotFoundError
+from azure.identity.aio import DefaultAzureCredential
+from azure.storage.blob.aio import BlobServiceClient
+from botocore.exceptions import ClientError
+from dateutil.parser import isoparse
+from google.auth import default
+from google.auth.transport.requests import Request
+from google.oauth2 import service_account
+
+try:
+    from alpha_library.boto3_helper.s3_transfer import same_credentials
+    from alpha_library.helper.stream_encryption import StreamCipher
+    from alpha_library.helper.transfer_engine import TransferEngine, get_provider
+except ModuleNotFoundError:
+    logging.info("Module called internally")
+    from boto3_helper.s3_transfer import same_credentials
+    from helper.stream_encryption import StreamCipher
+    from helper.transfer_engine import TransferEngine, get_provider
+
+# Default number of concurrent operations (and pooled connections) per backend
+default_limit = 256
+
+
+async def bounded_gather(func, items, limit=default_limit, return_exceptions=False) -> list:
+    """
+    This method awaits func(item) for every item with at most limit operations in flight
+    Items are pulled lazily by limit workers, so millions of items never turn into millions of pending tasks
+    :param func: Coroutine function called with one item
+    :param items: Iterable of items
+    :param limit: Maximum number of concurrent operations
+    :param return_exceptions: Return exceptions in place of results instead of raising the first one
+    :return: Results in order of items
+    """
+    results = dict()
+    iterator = enumerate(items)
+
+    async def worker():
+        # Shared iterator is safe, next() never interleaves inside a single event loop
+        for index, item in iterator:
+            try:
+                results[index] = await func(item)
+            except Exception as error:
+                if not return_exceptions:
+                    raise
+                results[index] = error
+
+    workers = [asyncio.ensure_future(worker()) for _ in range(limit)]
+    try:
+        await asyncio.gather(*workers)
+    except BaseException:
+        for task in workers:
+            task.cancel()
+        raise
+    return [results[index] for index in sorted(results)]
+
+
+async def gather_objects(display, keys, limit=default_limit, **kwargs) -> dict:
+    """
+    This method fetches content of many objects concurrently
+    :param display: AsyncDisplayStorageObject
+    :param keys: Object paths
+    :param limit: Maximum number of concurrent reads
+    :param kwargs: storage_details
+    :return: Dict of key -> bytes (or the exception raised while reading the key)
+    """
+    keys = list(keys)
+    kwargs["throw_exception"] = True
+    contents = await bounded_gather(lambda key: display.object_content(object_path=key, **kwargs), keys,
+                                    limit=limit, return_exceptions=True)
+    return dict(zip(keys, contents))
+
+
+class AsyncS3Backend(object):
+    """
+        This class provides async operations over S3 with aiobotocore
+    """
+    scheme = "s3"
+
+    def __init__(self, **kwargs):
+        self.cred_details = None
+        self.endpoint_url = None
+        self.max_pool_connections = default_limit
+        self.__dict__.update(kwargs)
+
+        self.__context = None
+        self.client = None
+
+    def assumes_role(self) -> bool:
+        return {"assigned_role_arn", "access_key", "secret_key", "region_name"}.issubset(
+            (self.cred_details or {}).keys())
+
+    def session(self) -> AioSession:
+        """
+        This method returns aiobotocore session, for assumed role it carries refreshable credentials which call
+        STS asynchronously (first use and before expiry) instead of blocking the event loop
+        """
+        aws_details = self.cred_details or {}
+        session = AioSession(profile=aws_details.get("profile_name"))
+        if self.assumes_role():
+            fetcher = AioAssumeRoleCredentialFetcher(
+                client_creator=session.create_client,
+                source_credentials=AioCredentials(aws_details["access_key"], aws_details["secret_key"]),
+                role_arn=aws_details["assigned_role_arn"],
+                extra_args={"ExternalId": aws_details["external_id"]} if aws_details.get("external_id") else None)
+            session._credentials = AioDeferredRefreshableCredentials(refresh_using=fetcher.fetch_credentials,
+                                                                     method="assume-role")
+        return session
+
+    def client_kwargs(self) -> dict:
+        """
+        This method returns credentials for aiobotocore client (assumed role credentials come from session)
+        """
+        aws_details = self.cred_details or {}
+        if self.assumes_role():
+            return {"region_name": aws_details["region_name"]}
+        if {"access_key", "secret_key"}.issubset(aws_details.keys()):
+            return {"aws_access_key_id": aws_details["access_key"], "aws_secret_access_key": aws_details["secret_key"],
+                    "aws_session_token": aws_details.get("aws_session_token"),
+                    "region_name": aws_details.get("region_name")}
+        return {"region_name": aws_details.get("region_name")}
+
+    async def open(self):
+        if self.client is None:
+            self.__context = self.session().create_client(
+                "s3", endpoint_url=self.endpoint_url,
+                config=AioConfig(max_pool_connections=self.max_pool_connections), **self.client_kwargs())
+            self.client = await self.__context.__aenter__()
+        return self
+
+    async def close(self):
+        if self.__context is not None:
+            await self.__context.__aexit__(None, None, None)
+            self.__context, self.client = None, None
+
+    @staticmethod
+    def container(storage_details) -> str:
+        return storage_details["bucket_name"]
+
+    async def get(self, storage_details, path) -> bytes:
+        response = await self.client.get_object(Bucket=self.container(storage_details), Key=path)
+        async with response["Body"] as stream:
+            return await stream.read()
+
+    async def stat(self, storage_details, path):
+        try:
+            response = await self.client.head_object(Bucket=self.container(storage_details), Key=path)
+        except ClientError as error:
+            if error.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+        return {"Key": path, "Size": response["ContentLength"], "ETag": response.get("ETag"),
+                "LastModified": response.get("LastModified")}
+
+    async def list(self, storage_details, prefix=""):
+        paginator = self.client.get_paginator("list_objects_v2")
+        async for page in paginator.paginate(Bucket=self.container(storage_details), Prefix=prefix):
+            for item in page.get("Contents", []):
+                yield item
+
+    async def put(self, storage_details, path, data):
+        await self.client.put_object(Bucket=self.container(storage_details), Key=path, Body=data)
+
+    async def delete(self, storage_details, path):
+        await self.client.delete_object(Bucket=self.container(storage_details), Key=path)
+
+    def can_copy_server_side(self, source) -> bool:
+        return isinstance(source, AsyncS3Backend) and source.endpoint_url == self.endpoint_url and \
+            same_credentials(source.cred_details, self.cred_details)
+
+    async def copy_server_side(self, source, source_details, source_path, storage_details, path) -> dict:
+        # CopyObject handles objects up to 5 GiB, larger ones are left to TransferEngine
+        await self.client.copy_object(CopySource={"Bucket": source.container(source_details), "Key": source_path},
+                                      Bucket=self.container(storage_details), Key=path)
+        return {"parts": 1}
+
+
+class AsyncGSBackend(object):
+    """
+        This class provides async operations over GS with aiohttp on top of GCS JSON API
+    """
+    scheme = "gs"
+    api_url = "https://storage.googleapis.com/storage/v1"
+    upload_url = "https://storage.googleapis.com/upload/storage/v1"
+    scopes = ["https://www.googleapis.com/auth/devstorage.read_write"]
+
+    def __init__(self, **kwargs):
+        self.cred_details = None
+        self.max_pool_connections = default_limit
+        self.__dict__.update(kwargs)
+
+        self.__credentials = None
+        self.__token_lock = None
+        self.session = None
+
+    async def open(self):
+        if self.session is None:
+            if self.cred_details:
+                self.__credentials = service_account.Credentials.from_service_account_info(
+                    self.cred_details, scopes=AsyncGSBackend.scopes)
+            else:
+                self.__credentials, _ = default(scopes=AsyncGSBackend.scopes)
+            self.__token_lock = asyncio.Lock()
+            self.session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.max_pool_connections))
+        return self
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    @staticmethod
+    def container(storage_details) -> str:
+        return storage_details["bucket_name"]
+
+    @staticmethod
+    def object_url(bucket, path) -> str:
+        return f"{AsyncGSBackend.api_url}/b/{quote(bucket, safe='')}/o/{quote(path, safe='')}"
+
+    @staticmethod
+    def blob_item(resource) -> dict:
+        return {"Key": resource["name"], "Size": int(resource["size"]), "ETag": resource.get("etag"),
+                "LastModified": isoparse(resource["updated"]) if resource.get("updated") else None,
+                "MD5": base64.b64decode(resource["md5Hash"]).hex() if resource.get("md5Hash") else None}
+
+    async def headers(self) -> dict:
+        """
+        This method returns authorization header, token is refreshed (on a thread) once it expires
+        """
+        async with self.__token_lock:
+            if not self.__credentials.valid:
+                await asyncio.get_running_loop().run_in_executor(None, self.__credentials.refresh, Request())
+        return {"Authorization": f"Bearer {self.__credentials.token}"}
+
+    async def get(self, storage_details, path) -> bytes:
+        async with self.session.get(AsyncGSBackend.object_url(self.container(storage_details), path),
+                                    params={"alt": "media"}, headers=await self.headers()) as response:
+            response.raise_for_status()
+            return await response.read()
+
+    async def stat(self, storage_details, path):
+        async with self.session.get(AsyncGSBackend.object_url(self.container(storage_details), path),
+                                    headers=await self.headers()) as response:
+            if response.status == 404:
+                return None
+            response.raise_for_status()
+            return AsyncGSBackend.blob_item(await response.json())
+
+    async def list(self, storage_details, prefix=""):
+        params = {"prefix": prefix, "fields": "items(name,size,etag,updated,md5Hash),nextPageToken"}
+        while True:
+            async with self.session.get(f"{AsyncGSBackend.api_url}/b/{quote(self.container(storage_details))}/o",
+                                        params=params, headers=await self.headers()) as response:
+                response.raise_for_status()
+                page = await response.json()
+            for resource in page.get("items", []):
+                yield AsyncGSBackend.blob_item(resource)
+            if not page.get("nextPageToken"):
+                break
+            params["pageToken"] = page["nextPageToken"]
+
+    async def put(self, storage_details, path, data):
+        async with self.session.post(f"{AsyncGSBackend.upload_url}/b/{quote(self.container(storage_details))}/o",
+                                     params={"uploadType": "media", "name": path}, data=data,
+                                     headers=await self.headers()) as response:
+            response.raise_for_status()
+
+    async def delete(self, storage_details, path):
+        async with self.session.delete(AsyncGSBackend.object_url(self.container(storage_details), path),
+                                       headers=await self.headers()) as response:
+            if response.status != 404:
+                response.raise_for_status()
+
+    def can_copy_server_side(self, source) -> bool:
+        return isinstance(source, AsyncGSBackend) and source.cred_details == self.cred_details
+
+    async def copy_server_side(self, source, source_details, source_path, storage_details, path) -> dict:
+        url = f"{AsyncGSBackend.object_url(source.container(source_details), source_path)}/rewriteTo/" \
+              f"b/{quote(self.container(storage_details), safe='')}/o/{quote(path, safe='')}"
+        params, calls = {}, 0
+        while True:
+            async with self.session.post(url, params=params, headers=await self.headers()) as response:
+                response.raise_for_status()
+                result = await response.json()
+            calls += 1
+            if result.get("done"):
+                return {"parts": calls}
+            params["rewriteToken"] = result["rewriteToken"]
+
+
+class AsyncAzureBackend(object):
+    """
+        This class provides async operations over Azure Blob storage with azure.storage.blob.aio
+    """
+    scheme = "azure"
+    copy_poll_interval = 2
+
+    def __init__(self, **kwargs):
+        self.cred_details = None
+        self.account_url = None
+        self.__dict__.update(kwargs)
+
+        self.__credential = None
+        self.client = None
+
+    async def open(self):
+        if self.client is None:
+            azure_details = self.cred_details or {}
+            if {"name", "key"}.issubset(azure_details.keys()):
+                self.__credential = AzureNamedKeyCredential(name=azure_details["name"], key=azure_details["key"])
+            elif azure_details.get("signature"):
+                self.__credential = AzureSasCredential(signature=azure_details["signature"])
+            else:
+                self.__credential = DefaultAzureCredential()
+
+            if "AZURE_STORAGE_CONNECTION_STRING" in os.environ:
+                self.client = BlobServiceClient.from_connection_string(
+                    conn_str=os.environ["AZURE_STORAGE_CONNECTION_STRING"], credential=self.__credential)
+            else:
+                self.client = BlobServiceClient(account_url=self.account_url, credential=self.__credential)
+        return self
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.close()
+            if isinstance(self.__credential, DefaultAzureCredential):
+                await self.__credential.close()
+            self.client = None
+
+    @staticmethod
+    def container(storage_details) -> str:
+        return storage_details["container_name"]
+
+    @staticmethod
+    def blob_item(blob) -> dict:
+        content_md5 = blob.content_settings.content_md5 if blob.content_settings else None
+        return {"Key": blob.name, "Size": blob.size, "ETag": blob.etag, "LastModified": blob.last_modified,
+                "MD5": bytes(content_md5).hex() if content_md5 else None}
+
+    def blob_client(self, storage_details, path):
+        return self.client.get_blob_client(container=self.container(storage_details), blob=path)
+
+    async def get(self, storage_details, path) -> bytes:
+        stream = await self.blob_client(storage_details, path).download_blob()
+        return await stream.readall()
+
+    async def stat(self, storage_details, path):
+        try:
+            return AsyncAzureBackend.blob_item(await self.blob_client(storage_details, path).get_blob_properties())
+        except ResourceNotFoundError:
+            return None
+
+    async def list(self, storage_details, prefix=""):
+        container_client = self.client.get_container_client(self.container(storage_details))
+        async for blob in container_client.list_blobs(name_starts_with=prefix):
+            yield AsyncAzureBackend.blob_item(blob)
+
+    async def put(self, storage_details, path, data):
+        await self.blob_client(storage_details, path).upload_blob(data, overwrite=True)
+
+    async def delete(self, storage_details, path):
+        try:
+            await self.blob_client(storage_details, path).delete_blob()
+        except ResourceNotFoundError:
+            logging.info(f"azure://{self.container(storage_details)}/{path} already deleted")
+
+    def can_copy_server_side(self, source) -> bool:
+        return isinstance(source, AsyncAzureBackend) and source.account_url == self.account_url and \
+            source.cred_details == self.cred_details
+
+    async def copy_server_side(self, source, source_details, source_path, storage_details, path) -> dict:
+        source_url = source.blob_client(source_details, source_path).url
+        destination_blob_client = self.blob_client(storage_details, path)
+        await destination_blob_client.start_copy_from_url(source_url)
+        properties = await destination_blob_client.get_blob_properties()
+        while properties.copy.status == "pending":
+            await asyncio.sleep(AsyncAzureBackend.copy_poll_interval)
+            properties = await destination_blob_client.get_blob_properties()
+        if properties.copy.status != "success":
+            raise IOError(f"Copy of {source_url} ended with status {properties.copy.status}")
+        return {"parts": 1}
+
+
+# Registry of async backends by storage type
+async_backends = {
+    "s3": AsyncS3Backend,
+    "gs": AsyncGSBackend,
+    "azure": AsyncAzureBackend
+}
+
+
+def get_async_backend(storage_type, **kwargs):
+    """
+    This method returns async backend instance for storage type
+    :param kwargs: cred_details, endpoint_url (s3), account_url (azure), max_pool_connections
+    """
+    if storage_type not in async_backends:
+        raise ValueError(f"Unsupported Cloud storage provider : {storage_type}")
+    return async_backends[storage_type](**kwargs)
+
+
+class AsyncStorage(object):
+    """
+        Base of async facade classes, backends are opened on entering (async with) and closed on exit
+        Without async with, backend is opened on first use and has to be closed with close()
+    """
+
+    def __init__(self, typ, **kwargs):
+        self.typ = typ
+        self.init_kwargs = kwargs
+        self.backend = get_async_backend(typ, cred_details=kwargs.get("cred_details"),
+                                         endpoint_url=kwargs.get("endpoint_url"),
+                                         account_url=kwargs.get("account_url"),
+                                         max_pool_connections=kwargs.get("max_pool_connections", default_limit)) \
+            if typ in async_backends else None
+
+    async def __aenter__(self):
+        await self.open_backend()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, exc_traceback):
+        await self.close()
+
+    async def close(self):
+        if self.backend:
+            await self.backend.close()
+
+    async def open_backend(self):
+        if self.backend is None:
+            raise ValueError(f"Unsupported Cloud storage provider : {self.typ}")
+        return await self.backend.open()
+
+
+# Display
+class AsyncDisplayStorageObject(AsyncStorage):
+
+    async def object_content(self, **kwargs) -> bytes:
+        try:
+            backend = await self.open_backend()
+            return await backend.get(kwargs.get("storage_details"), kwargs["object_path"])
+        except BaseException as error:
+            logging.error(f"Uncaught exception in async_storage_helper.py : {traceback.format_exc()}")
+            if kwargs.get("throw_exception"):
+                raise error
+
+    async def object_content_str(self, **kwargs) -> str:
+        data = await self.object_content(**kwargs)
+        return data.decode(kwargs.get("encoding", "utf-8")) if data is not None else None
+
+
+# Access Storage
+class AsyncStorageObjectList(AsyncStorage):
+
+    async def iter_contents_of_storage(self, **kwargs):
+        """
+        Async generator over non empty objects under folder_to_check
+        """
+        backend = await self.open_backend()
+        async for item in backend.list(kwargs.get("storage_details"), kwargs.get("folder_to_check", "")):
+            if item["Size"] > 0:
+                yield item
+
+    async def check_contents_of_storage(self, **kwargs) -> dict:
+        try:
+            return {item["Key"]: item async for item in self.iter_contents_of_storage(**kwargs)}
+        except BaseException as error:
+            logging.error(f"Uncaught exception in async_storage_helper.py : {traceback.format_exc()}")
+            if kwargs.get("throw_exception"):
+                raise error
+
+    async def check_existence_of_file_in_storage(self, **kwargs) -> bool:
+        try:
+            backend = await self.open_backend()
+            return await backend.stat(kwargs.get("storage_details"), kwargs["key"]) is not None
+        except BaseException as error:
+            logging.error(f"Uncaught exception in async_storage_helper.py : {traceback.format_exc()}")
+            if kwargs.get("throw_exception"):
+                raise error
+        return False
+
+    async def check_existence_of_files_in_storage(self, **kwargs) -> dict:
+        """
+        This method checks existence of keys concurrently (limit)
+        :return: Dict of key -> s3 like item or False
+        """
+        backend = await self.open_backend()
+        keys = list(kwargs["keys"])
+        items = await bounded_gather(lambda key: backend.stat(kwargs.get("storage_details"), key), keys,
+                                     limit=kwargs.get("limit", default_limit))
+        return {key: item or False for key, item in zip(keys, items)}
+
+
+# Copy
+class AsyncCopyObjectFromStorageToStorage(object):
+    """
+        Objects up to max_size_in_memory are read and written in memory on the event loop, larger objects are
+        handed over to TransferEngine on a thread, same provider pairs are copied server side
+    """
+    max_size_in_memory = 64 * 1024 ** 2
+
+    def __init__(self, source_type, destination_type, **kwargs):
+        self.source_type = source_type
+        self.destination_type = destination_type
+        self.init_kwargs = kwargs
+        self.max_size_in_memory = kwargs.get("max_size_in_memory",
+                                             AsyncCopyObjectFromStorageToStorage.max_size_in_memory)
+
+        self.source_settings = {"cred_details": kwargs.get("source_cred_details"),
+                                "endpoint_url": kwargs.get("source_endpoint_url"),
+                                "account_url": kwargs.get("source_account_url", kwargs.get("account_url"))}
+        self.destination_settings = {"cred_details": kwargs.get("destination_cred_details"),
+                                     "endpoint_url": kwargs.get("destination_endpoint_url"),
+                                     "account_url": kwargs.get("destination_account_url", kwargs.get("account_url"))}
+        limit = kwargs.get("max_pool_connections", default_limit)
+        self.source = get_async_backend(source_type, max_pool_connections=limit, **self.source_settings)
+        self.destination = get_async_backend(destination_type, max_pool_connections=limit,
+                                             **self.destination_settings)
+
+    async def __aenter__(self):
+        await self.source.open()
+        await self.destination.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, exc_traceback):
+        await self.close()
+
+    async def close(self):
+        await self.source.close()
+        await self.destination.close()
+
+    async def copy_from_source_to_destination_storage(self, **kwargs) -> dict:
+        start = time.monotonic()
+        source_details, destination_details = kwargs.get("source_storage_details"), \
+            kwargs.get("destination_storage_details")
+        source_path, destination_path = kwargs["object_original_path"], kwargs["object_destination_path"]
+        decrypt = StreamCipher.from_keys(kwargs.get("source_encryption_keys"))
+        encrypt = StreamCipher.from_keys(kwargs.get("destination_encryption_keys"))
+        summary = {"source": f"{self.source.scheme}://{self.source.container(source_details)}/{source_path}",
+                   "destination": f"{self.destination.scheme}://{self.destination.container(destination_details)}/"
+                                  f"{destination_path}"}
+        try:
+            source = await self.source.open()
+            destination = await self.destination.open()
+            source_item = await source.stat(source_details, source_path)
+            if source_item is None:
+                raise FileNotFoundError(f"{summary['source']} does not exist")
+
+            if source_item["Size"] > self.max_size_in_memory:
+                # Large objects are streamed (or copied server side) by TransferEngine on a thread
+                result = await asyncio.get_running_loop().run_in_executor(None, lambda: TransferEngine().copy(
+                    get_provider(self.source_type, **self.source_settings), source_details, source_path,
+                    get_provider(self.destination_type, **self.destination_settings), destination_details,
+                    destination_path, **{**kwargs, "throw_exception": True}))
+                summary.update(size=result["size"], server_side=result["server_side"])
+            elif kwargs.get("server_side_copy", True) and destination.can_copy_server_side(source) and \
+                    not (decrypt or encrypt):
+                await destination.copy_server_side(source, source_details, source_path,
+                                                   destination_details, destination_path)
+                summary.update(size=source_item["Size"], server_side=True)
+            else:
+                # Small objects are transformed in memory, as TransferEngine does while streaming
+                data = await source.get(source_details, source_path)
+                if decrypt:
+                    data = decrypt.decrypt(data)
+                if encrypt:
+                    data = encrypt.encrypt(data)
+                await destination.put(destination_details, destination_path, data)
+                summary.update(size=len(data), server_side=False)
+
+            summary["seconds"] = round(time.monotonic() - start, 3)
+            return summary
+        except BaseException as error:
+            logging.error(f"Uncaught exception in async_storage_helper.py : {traceback.format_exc()}")
+            if kwargs.get("throw_exception"):
+                raise error
+
+    async def copy_objects_from_source_to_destination_storage(self, **kwargs) -> list:
+        """
+        This method copies tasks (dicts of object_original_path, object_destination_path) concurrently (limit)
+        :return: Summary (or exception) per task
+        """
+        common = {key: value for key, value in kwargs.items() if key not in ("tasks", "limit")}
+        common["throw_exception"] = True
+        return await bounded_gather(lambda task: self.copy_from_source_to_destination_storage(**common, **task),
+                                    kwargs["tasks"], limit=kwargs.get("limit", default_limit), return_exceptions=True)
+
+
+# Delete
+class AsyncStorageDeleteObject(AsyncStorage):
+
+    async def delete_from_storage(self, **kwargs):
+        try:
+            backend = await self.open_backend()
+            await backend.delete(kwargs.get("storage_details"), kwargs["object_path"])
+        except BaseException as error:
+            logging.error(f"Uncaught exception in async_storage_helper.py : {traceback.format_exc()}")
+            if kwargs.get("throw_exception"):
+                raise error
+
+    async def delete_objects_from_storage(self, **kwargs) -> dict:
+        """
+        This method deletes keys concurrently (limit)
+        :return: Summary dict (requested, deleted, failed, seconds)
+        """
+        start = time.monotonic()
+        backend = await self.open_backend()
+        keys = list(kwargs["keys"])
+        results = await bounded_gather(lambda key: backend.delete(kwargs.get("storage_details"), key), keys,
+                                       limit=kwargs.get("limit", default_limit), return_exceptions=True)
+        failed = [{"Key": key, "Message": str(result)} for key, result in zip(keys, results)
+                  if isinstance(result, Exception)]
+        return {"requested": len(keys), "deleted": len(keys) - len(failed), "failed": failed,
+                "seconds": round(time.monotonic() - start, 3)}
@@ -0,0 +1,240 @@
+#!/usr/bin/python3
+# coding= utf-8
+"""
+This is a helper script to provide per host circuit breaker for HTTP helpers
+"""
+import logging
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+closed = "closed"
+open_state = "open"
+half_open = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """
+        Raised instead of calling a host whose circuit is open
+    """
+
+    def __init__(self, host, retry_in):
+        super().__init__(f"Circuit of {host} is open, calls fail fast for another {retry_in:.1f} seconds")
+        self.host = host
+        self.retry_in = retry_in
+
+
+class HostCircuit(object):
+    """
+        State of circuit of one host
+    """
+
+    def __init__(self):
+        self.state = closed
+        self.calls = deque()
+        self.opened_at = None
+        self.half_open_in_flight = 0
+        self.rejected = 0
+        self.opened = 0
+
+
+class CircuitBreaker(object):
+    """
+        This class keeps a circuit per host
+        closed : calls pass, outcome of calls in last window_seconds is tracked, circuit opens once at least
+                 minimum_calls were made and failure rate (no response / 5xx but healthy_statuses) or slow call rate
+                 (calls longer than slow_call_duration) reaches its threshold, closed circuits idle for window_seconds
+                 are dropped
+        open : calls fail fast with CircuitOpenError for open_seconds
+        half_open : up to half_open_max_calls trial calls pass, success closes the circuit, failure opens it again
+    """
+    failure_rate_threshold = 0.5
+    slow_call_rate_threshold = 0.8
+    # Seconds after which a call counts as slow (None : latency is not tracked)
+    slow_call_duration = None
+    minimum_calls = 10
+    window_seconds = 60
+    open_seconds = 30
+    half_open_max_calls = 1
+    # Server error statuses which do not count as failure of host
+    healthy_statuses = frozenset({501})
+
+    def __init__(self, **kwargs):
+        self.failure_rate_threshold = CircuitBreaker.failure_rate_threshold
+        self.slow_call_rate_threshold = CircuitBreaker.slow_call_rate_threshold
+        self.slow_call_duration = CircuitBreaker.slow_call_duration
+        self.minimum_calls = CircuitBreaker.minimum_calls
+        self.window_seconds = CircuitBreaker.window_seconds
+        self.open_seconds = CircuitBreaker.open_seconds
+        self.half_open_max_calls = CircuitBreaker.half_open_max_calls
+        self.__dict__.update(kwargs)
+
+        logging.debug(f"Instance variables for CircuitBreaker : {self.__dict__}")
+
+        self.__circuits = dict()
+        self.__lock = threading.Lock()
+        self.__evicted_at = time.monotonic()
+
+    @staticmethod
+    def host(url) -> str:
+        return urlsplit(str(url)).netloc
+
+    def __circuit(self, host) -> HostCircuit:
+        if host not in self.__circuits:
+            self.__circuits[host] = HostCircuit()
+        return self.__circuits[host]
+
+    def __evict(self, now):
+        """
+        This method drops circuits which are closed and had no call in last window_seconds (they carry no state),
+        so that a process calling many hosts (crawlers) does not keep a circuit for every host ever called
+        """
+        if now - self.__evicted_at < self.window_seconds:
+            return
+        self.__evicted_at = now
+        for host in [host for host, circuit in self.__circuits.items()
+                     if circuit.state == closed and not circuit.half_open_in_flight and
+                     (not circuit.calls or now - circuit.calls[-1][0] > self.window_seconds)]:
+            del self.__circuits[host]
+
+    def __open(self, host, circuit, now):
+        circuit.state, circuit.opened_at = open_state, now
+        circuit.calls.clear()
+        circuit.opened += 1
+        logging.warning(f"Circuit of {host} opened for {self.open_seconds} seconds")
+
+    def before_call(self, host):
+        """
+        This method admits a call to host
+        :raises CircuitOpenError: When circuit of host is open (or half open with its trial calls in flight)
+        """
+        now = time.monotonic()
+        with self.__lock:
+            self.__evict(now)
+            circuit = self.__circuit(host)
+            if circuit.state == open_state:
+                if now - circuit.opened_at < self.open_seconds:
+                    circuit.rejected += 1
+                    raise CircuitOpenError(host, self.open_seconds - (now - circuit.opened_at))
+                circuit.state = half_open
+                logging.info(f"Circuit of {host} half open, trying {self.half_open_max_calls} call(s)")
+            if circuit.state == half_open:
+                if circuit.half_open_in_flight >= self.half_open_max_calls:
+                    circuit.rejected += 1
+                    raise CircuitOpenError(host, 0)
+                circuit.half_open_in_flight += 1
+
+    def record(self, host, success, duration):
+        """
+        This method records outcome of a call admitted by before_call
+        """
+        now = time.monotonic()
+        slow = self.slow_call_duration is not None and duration >= self.slow_call_duration
+        with self.__lock:
+            circuit = self.__circuit(host)
+            if circuit.state == half_open:
+                circuit.half_open_in_flight = max(0, circuit.half_open_in_flight - 1)
+                if success and not slow:
+                    circuit.state = closed
+                    circuit.calls.clear()
+                    logging.info(f"Circuit of {host} closed")
+                else:
+                    self.__open(host, circuit, now)
+                return
+            if circuit.state == open_state:
+                return
+
+            circuit.calls.append((now, success, slow))
+            while circuit.calls and now - circuit.calls[0][0] > self.window_seconds:
+                circuit.calls.popleft()
+            if len(circuit.calls) < self.minimum_calls:
+                return
+            failures = sum(1 for _, call_success, _ in circuit.calls if not call_success)
+            slow_calls = sum(1 for _, _, call_slow in circuit.calls if call_slow)
+            if failures / len(circuit.calls) >= self.failure_rate_threshold or \
+                    slow_calls / len(circuit.calls) >= self.slow_call_rate_threshold:
+                self.__open(host, circuit, now)
+
+    def release(self, host):
+        """
+        This method releases a call admitted by before_call without an outcome (call was cancelled), a cancelled
+        call tells nothing about host but must not keep a half open trial slot
+        """
+        with self.__lock:
+            circuit = self.__circuit(host)
+            if circuit.state == half_open:
+                circuit.half_open_in_flight = max(0, circuit.half_open_in_flight - 1)
+
+    @staticmethod
+    def is_success(response) -> bool:
+        # 501 tells method is not supported (HEAD of many servers), host itself is healthy
+        status = getattr(response, "status_code", 0)
+        return response is not None and (status < 500 or status in CircuitBreaker.healthy_statuses)
+
+    def call(self, url, send):
+        """
+        This method calls send through circuit of host of url
+        :param send: Callable returning response, exceptions count as failures and are re-raised (cancellation and
+                     other BaseException only release the call)
+        """
+        host = CircuitBreaker.host(url)
+        self.before_call(host)
+        start = time.monotonic()
+        try:
+            response = send()
+        except Exception:
+            self.record(host, False, time.monotonic() - start)
+            raise
+        except BaseException:
+            self.release(host)
+            raise
+        self.record(host, CircuitBreaker.is_success(response), time.monotonic() - start)
+        return response
+
+    async def call_async(self, url, send):
+        """
+        This method is call for coroutine function send
+        """
+        host = CircuitBreaker.host(url)
+        self.before_call(host)
+        start = time.monotonic()
+        try:
+            response = await send()
+        except Exception:
+            self.record(host, False, time.monotonic() - start)
+            raise
+        except BaseException:
+            self.release(host)
+            raise
+        self.record(host, CircuitBreaker.is_success(response), time.monotonic() - start)
+        return response
+
+    def metrics(self) -> dict:
+        """
+        This method returns state of every circuit (state, calls, failure_rate, slow_call_rate, rejected, opened)
+        """
+        with self.__lock:
+            metrics = dict()
+            for host, circuit in self.__circuits.items():
+                calls = len(circuit.calls)
+                metrics[host] = {
+                    "state": circuit.state,
+                    "calls": calls,
+                    "failure_rate": round(sum(1 for call in circuit.calls if not call[1]) / calls, 3) if calls else 0,
+                    "slow_call_rate": round(sum(1 for call in circuit.calls if call[2]) / calls, 3) if calls else 0,
+                    "rejected": circuit.rejected,
+                    "opened": circuit.opened
+                }
+            return metrics
+
+    def reset(self, host=None):
+        with self.__lock:
+            if host:
+                self.__circuits.pop(host, None)
+            else:
+                self.__circuits.clear()
+
+
+# Breaker shared by every HTTPRequests / HTTPXRequests instance of the process
+default_circuit_breaker = CircuitBreaker()
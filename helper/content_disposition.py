@@ -9,10 +9,10 @@ import logging
 import requests
 
 try:
-    from alpha_library.helper.http_requests import HTTPRequests
+    from alpha_library.helper.http_requests import shared_http_requests
 except ModuleNotFoundError:
     logging.info("Module called internally")
-    from helper.http_requests import HTTPRequests
+    from helper.http_requests import shared_http_requests
 
 
 def guess_file_extension(input: str):
@@ -27,11 +27,11 @@ def guess_file_extension(input: str):
         logging.info(f"Assuming provided data is a url : {input}")
 
         # Doing HEAD HTTP call
-        response = HTTPRequests().call_head_requests(url=input)
+        response = shared_http_requests().call_head_requests(url=input)
 
         if not (response and response.status_code == 200):
             # Doing GET HTTP call with python-user-agent
-            response = HTTPRequests().call_get_requests(url=input, stream=True, close_early=True)
+            response = shared_http_requests().call_get_requests(url=input, stream=True, close_early=True)
 
     elif type(input) == requests.Response:
         logging.info(f"Got HTTP response : {input.__str__}")
@@ -3,7 +3,14 @@
 """
 This is a helper script to provide hash of data
 """
+import base64
 import hashlib
+import io
+import mmap
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import google_crc32c
 
 
 def calculate_md5sum(data, byte=False):
@@ -49,3 +56,234 @@ def calculate_sha512sum(data, byte=False):
     else:
         m.update(str(data).encode())
     return m.hexdigest()
+
+
+# Streaming checksums
+# Buffers handed to hashlib are large, hashlib releases the GIL while hashing them so files hash in parallel threads
+hash_chunk_size = 8 * 1024 ** 2
+# Default part size of s3 multipart uploads (boto3 / aws cli), ETag of a multipart object depends on it
+s3_part_size = 8 * 1024 ** 2
+
+
+def iter_buffers(source, chunk_size=hash_chunk_size):
+    """
+    Generator over buffers of source, buffers are reused (or released) once the next one is requested
+    :param source: Path (str / os.PathLike), bytes like object, binary file object or iterable of bytes chunks
+    :param chunk_size: Size of buffers read from paths and file objects
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        yield memoryview(source)
+        return
+
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as file:
+            size = os.fstat(file.fileno()).st_size
+            if not size:
+                return
+            # Pages of the file are hashed straight out of the page cache, no copy into python buffers
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                with memoryview(mapped) as view:
+                    for offset in range(0, size, chunk_size):
+                        buffer = view[offset:offset + chunk_size]
+                        yield buffer
+                        buffer.release()
+        return
+
+    if hasattr(source, "readinto"):
+        buffer = bytearray(chunk_size)
+        with memoryview(buffer) as view:
+            while True:
+                size = source.readinto(view)
+                if not size:
+                    break
+                chunk = view[:size]
+                yield chunk
+                chunk.release()
+        return
+
+    if hasattr(source, "read"):
+        for chunk in iter(lambda: source.read(chunk_size), b""):
+            yield chunk
+        return
+
+    for chunk in source:
+        yield chunk.encode() if isinstance(chunk, str) else chunk
+
+
+class S3ETag(object):
+    """
+        This class calculates ETag which S3 reports for an object uploaded in parts of part_size
+        (md5 of the concatenated part md5s followed by -<number of parts>, plain md5 for single part uploads)
+    """
+
+    def __init__(self, part_size=s3_part_size, multipart=None):
+        """
+        :param part_size: Part size of the upload
+        :param multipart: True / False when upload type is known, None treats objects above part_size as multipart
+        """
+        self.part_size = part_size
+        self.multipart = multipart
+        self.part_digests = []
+        self.current = hashlib.md5()
+        self.current_size = 0
+
+    def update(self, data):
+        view = memoryview(data)
+        while len(view):
+            size = min(len(view), self.part_size - self.current_size)
+            self.current.update(view[:size])
+            self.current_size += size
+            view = view[size:]
+            if self.current_size == self.part_size:
+                self.part_digests.append(self.current.digest())
+                self.current, self.current_size = hashlib.md5(), 0
+
+    def hexdigest(self) -> str:
+        part_digests = self.part_digests + ([self.current.digest()] if self.current_size or not self.part_digests
+                                            else [])
+        multipart = self.multipart if self.multipart is not None else len(part_digests) > 1
+        if not multipart:
+            return part_digests[0].hex()
+        return f"{hashlib.md5(b''.join(part_digests)).hexdigest()}-{len(part_digests)}"
+
+
+class CRC32C(object):
+    """
+        This class calculates CRC32C (hardware accelerated by google_crc32c), digest is base64 as GCS reports it
+    """
+
+    def __init__(self):
+        self.checksum = google_crc32c.Checksum()
+
+    def update(self, data):
+        self.checksum.update(bytes(data) if isinstance(data, memoryview) else data)
+
+    def hexdigest(self) -> str:
+        return base64.b64encode(self.checksum.digest()).decode()
+
+
+class ContentMD5(object):
+    """
+        This class calculates Content-MD5 (base64 md5) as Azure and GCS (md5Hash) report it
+    """
+
+    def __init__(self):
+        self.md5 = hashlib.md5()
+
+    def update(self, data):
+        self.md5.update(data)
+
+    def hexdigest(self) -> str:
+        return base64.b64encode(self.md5.digest()).decode()
+
+
+def new_hasher(algorithm, part_size=s3_part_size):
+    """
+    This method returns hasher for hashlib algorithm names, crc32c, content_md5 and s3_etag
+    """
+    if algorithm == "s3_etag":
+        return S3ETag(part_size=part_size)
+    if algorithm == "crc32c":
+        return CRC32C()
+    if algorithm == "content_md5":
+        return ContentMD5()
+    return hashlib.new(algorithm)
+
+
+def calculate_checksums(source, algorithms=("md5",), part_size=s3_part_size, chunk_size=hash_chunk_size) -> dict:
+    """
+    This method calculates several checksums of source in a single pass with constant memory
+    :param source: Path, bytes like object, binary file object or iterable of bytes chunks
+    :param algorithms: hashlib algorithm names, crc32c, content_md5 and s3_etag
+    :param part_size: Part size used for s3_etag
+    :param chunk_size: Size of buffers read from paths and file objects
+    :return: Dict of algorithm -> digest (hex, base64 for crc32c and content_md5)
+    """
+    hashers = {algorithm: new_hasher(algorithm, part_size=part_size) for algorithm in algorithms}
+    for buffer in iter_buffers(source, chunk_size=chunk_size):
+        for hasher in hashers.values():
+            hasher.update(buffer)
+    return {algorithm: hasher.hexdigest() for algorithm, hasher in hashers.items()}
+
+
+def calculate_digest(source, algorithm="md5", **kwargs) -> str:
+    """
+    This method streams source (path, file object, iterable of chunks) through a single checksum
+    """
+    if hasattr(hashlib, "file_digest") and hasattr(source, "fileno") and hasattr(source, "readinto") and \
+            algorithm in hashlib.algorithms_available:
+        # Binary files opened by caller
+        return hashlib.file_digest(source, algorithm).hexdigest()
+    return calculate_checksums(source, algorithms=(algorithm,), **kwargs)[algorithm]
+
+
+def calculate_s3_etag(source, part_size=s3_part_size, multipart=None) -> str:
+    """
+    This method returns ETag S3 reports for source uploaded in parts of part_size (without quotes)
+    """
+    hasher = S3ETag(part_size=part_size, multipart=multipart)
+    for buffer in iter_buffers(source):
+        hasher.update(buffer)
+    return hasher.hexdigest()
+
+
+def calculate_crc32c(source) -> str:
+    """
+    This method returns base64 CRC32C of source as reported by GCS
+    """
+    return calculate_digest(source, "crc32c")
+
+
+def calculate_content_md5(source) -> str:
+    """
+    This method returns base64 md5 of source as reported in Content-MD5 (Azure) and md5Hash (GCS)
+    """
+    return calculate_digest(source, "content_md5")
+
+
+def calculate_checksums_parallel(sources, algorithms=("md5",), max_workers=None, **kwargs) -> dict:
+    """
+    This method checksums many sources (paths) concurrently
+    :return: Dict of source -> checksums dict (or exception raised for the source)
+    """
+    def checksum(source):
+        try:
+            return calculate_checksums(source, algorithms=algorithms, **kwargs)
+        except BaseException as error:
+            return error
+
+    sources = list(sources)
+    with ThreadPoolExecutor(max_workers=max_workers or min(32, (os.cpu_count() or 1) + 4)) as executor:
+        return dict(zip(sources, executor.map(checksum, sources)))
+
+
+class HashingReader(io.RawIOBase):
+    """
+        This class passes reads of f_read through while checksumming them, so streamed copies can be verified
+        without reading the object again
+    """
+
+    def __init__(self, f_read, algorithms=("md5",), part_size=s3_part_size):
+        super().__init__()
+        self.f_read = f_read
+        self.hashers = {algorithm: new_hasher(algorithm, part_size=part_size) for algorithm in algorithms}
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        readinto = getattr(self.f_read, "readinto", None)
+        if readinto:
+            size = readinto(buffer)
+        else:
+            data = self.f_read.read(len(buffer))
+            size = len(data) if data else 0
+            buffer[:size] = data or b""
+        if size:
+            with memoryview(buffer) as view:
+                for hasher in self.hashers.values():
+                    hasher.update(view[:size])
+        return size or 0
+
+    def checksums(self) -> dict:
+        return {algorithm: hasher.hexdigest() for algorithm, hasher in self.hashers.items()}
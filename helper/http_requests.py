@@ -5,11 +5,46 @@ This is a helper script for sending HTTP Requests
 """
 import logging
 import ssl
-import time
+import threading
 
 import requests
 from urllib3 import poolmanager
 
+try:
+    from alpha_library.boto3_helper.client_cache import cache_key
+    from alpha_library.helper.circuit_breaker import CircuitOpenError, default_circuit_breaker
+    from alpha_library.helper.request_logging import default_request_logger
+    from alpha_library.helper.retry_policy import RetryPolicy
+except ModuleNotFoundError:
+    logging.info("Module called internally")
+    from boto3_helper.client_cache import cache_key
+    from helper.circuit_breaker import CircuitOpenError, default_circuit_breaker
+    from helper.request_logging import default_request_logger
+    from helper.retry_policy import RetryPolicy
+
+# Process wide HTTPRequests instances by configuration, see shared_http_requests
+shared_requests = dict()
+shared_requests_lock = threading.Lock()
+
+
+class RequestTimeout(Exception):
+    """
+        Raised by GET calls which timed out, retried calls treat it as a connection error
+    """
+
+
+def shared_http_requests(**kwargs):
+    """
+    This method returns HTTPRequests shared by every caller with same configuration, so that connections
+    (and TLS sessions) stay warm across calls instead of a new pool per call
+    :param kwargs: Configuration of HTTPRequests (ssl_verify, TLSAdapter, pool_connections, pool_maxsize etc.)
+    """
+    key = cache_key(kwargs)
+    with shared_requests_lock:
+        if key not in shared_requests:
+            shared_requests[key] = HTTPRequests(**kwargs)
+        return shared_requests[key]
+
 
 class HTTPRequests(object):
     """
@@ -17,14 +52,36 @@ class HTTPRequests(object):
     """
     # Class Variables
     no_response = "No Response !!"
+    # Number of hosts whose pools are kept and connections kept alive per host (urllib3 defaults are 10 and 10)
+    pool_connections = 10
+    pool_maxsize = 10
+    # Blocking pool waits for a free connection instead of opening (and discarding) extra ones
+    pool_block = False
 
     def __init__(self, **kwargs):
-        self.session = requests.Session()
+        self.session = None
         self.ssl_verify = True
         self.log_minimally = False
         self.TLSAdapter = False
+        self.pool_connections = HTTPRequests.pool_connections
+        self.pool_maxsize = HTTPRequests.pool_maxsize
+        self.pool_block = HTTPRequests.pool_block
+        # Dict of host -> maximum number of connections to the host (blocking pool of its own)
+        self.per_host_limits = dict()
+        # RetryPolicy of *_with_retry calls, by default one is built out of attempts / sleep_duration of the call
+        self.retry_policy = None
+        # Per host circuit breaker shared by the process (None disables it)
+        self.circuit_breaker = default_circuit_breaker
+        # RequestLogger writing one record per request (sampling, redaction, timings)
+        self.request_logger = default_request_logger
         self.__dict__.update(kwargs)
 
+        # Session passed by caller is left open for the caller
+        self.owns_session = self.session is None
+        if self.owns_session:
+            self.session = requests.Session()
+            self.mount_adapters()
+
         if not self.ssl_verify:
             self.session.verify = self.ssl_verify
 
@@ -35,7 +92,36 @@ class HTTPRequests(object):
         """
         Explicitly closed session object
         """
-        self.session.close()
+        if getattr(self, "owns_session", False):
+            self.session.close()
+
+    def circuit_call(self, url, send):
+        """
+        This method sends call through circuit of host, calls to a host with open circuit raise CircuitOpenError
+        (call_*_requests log it and return None as for connection errors)
+        """
+        if self.circuit_breaker is None:
+            return send()
+        return self.circuit_breaker.call(url, send)
+
+    def mount_adapters(self):
+        """
+        This method mounts adapters (and so connection pools) once for the session
+        """
+        https_adapter_class = TLSAdapter if self.TLSAdapter else requests.adapters.HTTPAdapter
+        self.session.mount("https://", https_adapter_class(pool_connections=self.pool_connections,
+                                                           pool_maxsize=self.pool_maxsize,
+                                                           pool_block=self.pool_block))
+        self.session.mount("http://", requests.adapters.HTTPAdapter(pool_connections=self.pool_connections,
+                                                                    pool_maxsize=self.pool_maxsize,
+                                                                    pool_block=self.pool_block))
+        # Longest matching prefix wins, so hosts with limits get a pool of their own (trailing slash keeps
+        # a.com from matching a.company.org)
+        for host, limit in (self.per_host_limits or {}).items():
+            self.session.mount(f"https://{host}/", https_adapter_class(pool_connections=1, pool_maxsize=limit,
+                                                                       pool_block=True))
+            self.session.mount(f"http://{host}/", requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=limit,
+                                                                                pool_block=True))
 
     def log_minimal(self, msg, *args, **kwargs):
         if self.log_minimally:
@@ -43,6 +129,9 @@ class HTTPRequests(object):
         else:
             logging.info(msg, *args, **kwargs)
 
+    def log_level(self) -> int:
+        return logging.DEBUG if self.log_minimally else logging.INFO
+
     def call_get_requests(self, url: str, headers=None, params=None, auth=None,
                           stream=False, close_early=False, cookies=None, timeout=None,
                           allow_redirects=True, error_message="Error in GET Request : "):
@@ -61,57 +150,55 @@ class HTTPRequests(object):
         :return: Response from the requests call
         """
         response = None
-        self.log_minimal("Url for HTTP GET request : %s", url)
-        logging.debug("Parameters for HTTP GET request : %s", params)
-        logging.debug("Headers for HTTP GET request : %s", headers)
-        logging.debug("Request Stream (True/False)? : %s", stream)
-        logging.debug("Close Connection Early (True/False)? : %s", close_early)
-        logging.debug("Cookies for HTTP GET request : %s", cookies)
-        logging.debug("Timeout for HTTP GET request : %s", timeout)
-        logging.debug("Allow Redirects for HTTP GET request : %s", allow_redirects)
-        logging.debug("Authorization for HTTP GET request : %s", auth)
-
+        timer = self.request_logger.timer(self.log_level())
         try:
-            if self.TLSAdapter:
-                self.session.mount('https://', TLSAdapter())
-            response = self.session.get(url, headers=headers, params=params, stream=stream, auth=auth,
-                                        cookies=cookies, timeout=timeout, allow_redirects=allow_redirects)
-            if isinstance(response, requests.Response):
-                logging.info("Request-Id for HTTP GET Request: %s", response.headers.get('X-Request-Id'))
+            response = self.circuit_call(url, lambda: self.session.get(
+                url, headers=headers, params=params, stream=stream, auth=auth, cookies=cookies, timeout=timeout,
+                allow_redirects=allow_redirects))
             if close_early:
                 response.close()
             response.raise_for_status()
         except requests.exceptions.Timeout as error:
             logging.error("%s %s", error_message, str(error))
-            raise Exception(error)
-        except requests.exceptions.RequestException as error:
+            raise RequestTimeout(error)
+        except (requests.exceptions.RequestException, CircuitOpenError) as error:
             logging.error("%s %s", error_message, str(error))
         finally:
-            if response:
-                self.log_minimal("Status Code : %s", response.status_code)
-                logging.debug("Total Time taken : %s", response.elapsed)
-                logging.debug("Response Headers : %s", response.headers)
-                logging.debug("Request Headers : %s", response.request.headers)
-            else:
+            self.request_logger.log("GET", url, response, timer, self.log_level(), headers=headers)
+            if not response:
                 logging.critical(HTTPRequests.no_response)
         return response
 
+    def retry_policy_for(self, attempts, sleep_duration, retry_policy=None) -> RetryPolicy:
+        """
+        This method returns retry policy of a call, attempts and sleep_duration (maximum backoff) apply when
+        neither call nor instance has a policy
+        """
+        return retry_policy or self.retry_policy or RetryPolicy(max_attempts=attempts, max_delay=sleep_duration)
+
+    def call_requests_with_retry(self, method: str, url: str, attempts=1, sleep_duration=15, retry_policy=None,
+                                 **kwargs):
+        """
+        Retry for failures of any method, retries follow retry policy (backoff with jitter, Retry-After,
+        idempotency of method and retry budget of host)
+        :param method: get, put, post, delete, head, patch, options
+        :param kwargs: Arguments of call_<method>_requests
+        :return: Last response
+        """
+        call = getattr(self, f"call_{method.lower()}_requests")
+        return self.retry_policy_for(attempts, sleep_duration, retry_policy).call(
+            method.upper(), url, lambda: call(url, **kwargs), retry_exceptions=(RequestTimeout,))
+
     def call_get_requests_with_retry(self, url: str, headers=None, params=None, auth=None,
                                      stream=False, close_early=False, cookies=None, timeout=None,
                                      allow_redirects=True, error_message="Error in GET Request : ", attempts=1,
-                                     sleep_duration=15):
+                                     sleep_duration=15, retry_policy=None):
         """Retry for GET failures"""
-        for attempt in range(0, attempts):
-            resp = self.call_get_requests(url, headers=headers, params=params, auth=auth,
-                                          stream=stream, close_early=close_early, cookies=cookies, timeout=timeout,
-                                          allow_redirects=allow_redirects, error_message=error_message)
-            if isinstance(resp, requests.Response):
-                logging.info("Request-Id for HTTP GET Request: %s", resp.headers.get('X-Request-Id'))
-            if resp is not None and resp.status_code < 500:
-                return resp
-            logging.info("No/error response %s. Retrying..", resp)
-            attempt += 1
-            time.sleep(sleep_duration)
+        return self.call_requests_with_retry("GET", url, attempts=attempts, sleep_duration=sleep_duration,
+                                             retry_policy=retry_policy, headers=headers, params=params, auth=auth,
+                                             stream=stream, close_early=close_early, cookies=cookies,
+                                             timeout=timeout, allow_redirects=allow_redirects,
+                                             error_message=error_message)
 
     def call_put_requests(self, url: str, headers=None, params=None, data=None, files=None,
                           close_early=False, cookies=None, timeout=None, auth=None,
@@ -132,34 +219,19 @@ class HTTPRequests(object):
         :return: Response from the requests call
         """
         response = None
-        self.log_minimal("Url for HTTP PUT request : %s", url)
-        logging.debug("Parameters for HTTP PUT request : %s", params)
-        logging.debug("Headers for HTTP PUT request : %s", headers)
-        logging.debug("Data for HTTP PUT request : %s", data)
-        logging.debug("Files for HTTP PUT request : %s", files)
-        logging.debug("Close Connection Early (True/False)? : %s", close_early)
-        logging.debug("Cookies for HTTP PUT request : %s", cookies)
-        logging.debug("Timeout for HTTP PUT request : %s", timeout)
-        logging.debug("Allow Redirects for HTTP PUT request : %s", allow_redirects)
-        logging.debug("Authorization for HTTP PUT request : %s", auth)
+        timer = self.request_logger.timer(self.log_level())
         try:
-            response = self.session.put(url, headers=headers, params=params, data=data,
-                                        files=files, cookies=cookies, timeout=timeout,
-                                        allow_redirects=allow_redirects, auth=auth)
-            if isinstance(response, requests.Response):
-                logging.info("Request-Id for HTTP GET Request: %s", response.headers.get('X-Request-Id'))
+            response = self.circuit_call(url, lambda: self.session.put(
+                url, headers=headers, params=params, data=data, files=files, cookies=cookies, timeout=timeout,
+                allow_redirects=allow_redirects, auth=auth))
             if close_early:
                 response.close()
             response.raise_for_status()
-        except requests.exceptions.RequestException as error:
+        except (requests.exceptions.RequestException, CircuitOpenError) as error:
             logging.error("%s %s", error_message, str(error))
         finally:
-            if response:
-                self.log_minimal("Status Code : %s", response.status_code)
-                logging.debug("Total Time taken : %s", response.elapsed)
-                logging.debug("Response Headers : %s", response.headers)
-                logging.debug("Request Headers : %s", response.request.headers)
-            else:
+            self.request_logger.log("PUT", url, response, timer, self.log_level(), headers=headers, data=data)
+            if not response:
                 logging.critical(HTTPRequests.no_response)
         return response
 
@@ -168,22 +240,27 @@ class HTTPRequests(object):
                                      cookies=None, timeout=None, auth=None,
                                      allow_redirects=True,
                                      error_message="Error in PUT Request : ",
-                                     attempts=1, sleep_duration=15):
+                                     attempts=1, sleep_duration=15, retry_policy=None):
         """Retry for PUT failures"""
-        for attempt in range(0, attempts):
-            resp = self.call_put_requests(url, headers=headers, params=params,
-                                          data=data, files=files, auth=auth,
-                                          cookies=cookies, timeout=timeout,
-                                          close_early=close_early,
-                                          allow_redirects=allow_redirects,
-                                          error_message=error_message)
-            if isinstance(resp, requests.Response):
-                logging.info("Request-Id for HTTP GET Request: %s", resp.headers.get('X-Request-Id'))
-            if resp is not None and resp.status_code < 500:
-                return resp
-            logging.info("No/error response %s. Retrying..", resp)
-            attempt += 1
-            time.sleep(sleep_duration)
+        return self.call_requests_with_retry("PUT", url, attempts=attempts, sleep_duration=sleep_duration,
+                                             retry_policy=retry_policy, headers=headers, params=params,
+                                             data=data, files=files, auth=auth, cookies=cookies, timeout=timeout,
+                                             close_early=close_early, allow_redirects=allow_redirects,
+                                             error_message=error_message)
+
+    def call_post_requests_with_retry(self, url: str, headers=None, params=None,
+                                      data=None, files=None, close_early=False,
+                                      cookies=None, timeout=None, auth=None,
+                                      allow_redirects=True,
+                                      error_message="Error in POST Request : ",
+                                      attempts=1, sleep_duration=15, retry_policy=None):
+        """Retry for POST failures, POST is retried only when server refused it (429/503) unless
+        retry policy allows non idempotent retries"""
+        return self.call_requests_with_retry("POST", url, attempts=attempts, sleep_duration=sleep_duration,
+                                             retry_policy=retry_policy, headers=headers, params=params,
+                                             data=data, files=files, auth=auth, cookies=cookies, timeout=timeout,
+                                             close_early=close_early, allow_redirects=allow_redirects,
+                                             error_message=error_message)
 
     def call_post_requests(self, url: str, headers=None, params=None, data=None, files=None,
                            close_early=False, cookies=None, timeout=None, auth=None,
@@ -204,36 +281,19 @@ class HTTPRequests(object):
         :return: Response from the requests call
         """
         response = None
-        self.log_minimal("Url for HTTP POST request : %s", url)
-        logging.debug("Parameters for HTTP POST request : %s", params)
-        logging.debug("Headers for HTTP POST request : %s", headers)
-        logging.debug("Data for HTTP POST request : %s", data)
-        logging.debug("Files for HTTP POST request : %s", files)
-        logging.debug("Auth for HTTP POST request : %s", auth)
-        logging.debug("Close Connection Early (True/False)? : %s", close_early)
-        logging.debug("Cookies for HTTP POST request : %s", cookies)
-        logging.debug("Timeout for HTTP POST request : %s", timeout)
-        logging.debug(
-            "Allow Redirects for HTTP POST request : %s", allow_redirects)
-
+        timer = self.request_logger.timer(self.log_level())
         try:
-            response = self.session.post(url, headers=headers, params=params, data=data,
-                                         files=files, cookies=cookies, timeout=timeout,
-                                         allow_redirects=allow_redirects, auth=auth)
-            if isinstance(response, requests.Response):
-                logging.info("Request-Id for HTTP GET Request: %s", response.headers.get('X-Request-Id'))
+            response = self.circuit_call(url, lambda: self.session.post(
+                url, headers=headers, params=params, data=data, files=files, cookies=cookies, timeout=timeout,
+                allow_redirects=allow_redirects, auth=auth))
             if close_early:
                 response.close()
             response.raise_for_status()
-        except requests.exceptions.RequestException as error:
+        except (requests.exceptions.RequestException, CircuitOpenError) as error:
             logging.error("%s %s", error_message, str(error))
         finally:
-            if response:
-                self.log_minimal("Status Code : %s", response.status_code)
-                logging.debug("Total Time taken : %s", response.elapsed)
-                logging.debug("Response Headers : %s", response.headers)
-                logging.debug("Request Headers : %s", response.request.headers)
-            else:
+            self.request_logger.log("POST", url, response, timer, self.log_level(), headers=headers, data=data)
+            if not response:
                 logging.critical(HTTPRequests.no_response)
         return response
 
@@ -254,33 +314,19 @@ class HTTPRequests(object):
         :return: Response from the requests call
         """
         response = None
-        self.log_minimal("Url for HTTP DELETE request : %s", url)
-        logging.debug("Parameters for HTTP DELETE request : %s", params)
-        logging.debug("Headers for HTTP DELETE request : %s", headers)
-        logging.debug("Close Connection Early (True/False)? : %s", close_early)
-        logging.debug("Cookies for HTTP DELETE request : %s", cookies)
-        logging.debug("Timeout for HTTP DELETE request : %s", timeout)
-        logging.debug(
-            "Allow Redirects for HTTP DELETE request : %s", allow_redirects)
-        logging.debug("Authorization for HTTP DELETE request : %s", auth)
-
+        timer = self.request_logger.timer(self.log_level())
         try:
-            response = self.session.delete(url, headers=headers, params=params, cookies=cookies,
-                                           timeout=timeout, allow_redirects=allow_redirects, auth=auth)
-            if isinstance(response, requests.Response):
-                logging.info("Request-Id for HTTP GET Request: %s", response.headers.get('X-Request-Id'))
+            response = self.circuit_call(url, lambda: self.session.delete(
+                url, headers=headers, params=params, cookies=cookies, timeout=timeout, allow_redirects=allow_redirects,
+                auth=auth))
             if close_early:
                 response.close()
             response.raise_for_status()
-        except requests.exceptions.RequestException as error:
+        except (requests.exceptions.RequestException, CircuitOpenError) as error:
             logging.error("%s %s", error_message, str(error))
         finally:
-            if response:
-                self.log_minimal("Status Code : %s", response.status_code)
-                logging.debug("Total Time taken : %s", response.elapsed)
-                logging.debug("Response Headers : %s", response.headers)
-                logging.debug("Request Headers : %s", response.request.headers)
-            else:
+            self.request_logger.log("DELETE", url, response, timer, self.log_level(), headers=headers)
+            if not response:
                 logging.critical(HTTPRequests.no_response)
         return response
 
@@ -301,35 +347,19 @@ class HTTPRequests(object):
         :return: Response from the requests call
         """
         response = None
-        self.log_minimal("Url for HTTP HEAD request : %s", url)
-        logging.debug("Parameters for HTTP HEAD request : %s", params)
-        logging.debug("Headers for HTTP HEAD request : %s", headers)
-        logging.debug("Close Connection Early (True/False)? : %s", close_early)
-        logging.debug("Cookies for HTTP HEAD request : %s", cookies)
-        logging.debug("Timeout for HTTP HEAD request : %s", timeout)
-        logging.debug(
-            "Allow Redirects for HTTP HEAD request : %s", allow_redirects)
-        logging.debug("Authorization for HTTP HEAD request : %s", auth)
-
+        timer = self.request_logger.timer(self.log_level())
         try:
-            if self.TLSAdapter:
-                self.session.mount('https://', TLSAdapter())
-            response = self.session.head(url, headers=headers, params=params, auth=auth,
-                                         cookies=cookies, timeout=timeout, allow_redirects=allow_redirects)
-            if isinstance(response, requests.Response):
-                logging.info("Request-Id for HTTP GET Request: %s", response.headers.get('X-Request-Id'))
+            response = self.circuit_call(url, lambda: self.session.head(
+                url, headers=headers, params=params, auth=auth, cookies=cookies, timeout=timeout,
+                allow_redirects=allow_redirects))
             if close_early:
                 response.close()
             response.raise_for_status()
-        except requests.exceptions.RequestException as error:
+        except (requests.exceptions.RequestException, CircuitOpenError) as error:
             logging.error("%s %s", error_message, str(error))
         finally:
-            if response:
-                self.log_minimal("Status Code : %s", response.status_code)
-                logging.debug("Total Time taken : %s", response.elapsed)
-                logging.debug("Response Headers : %s", response.headers)
-                logging.debug("Request Headers : %s", response.request.headers)
-            else:
+            self.request_logger.log("HEAD", url, response, timer, self.log_level(), headers=headers)
+            if not response:
                 logging.critical(HTTPRequests.no_response)
         return response
 
@@ -352,36 +382,19 @@ class HTTPRequests(object):
         :return: Response from the requests call
         """
         response = None
-        self.log_minimal("Url for HTTP PATCH request : %s", url)
-        logging.debug("Parameters for HTTP PATCH request : %s", params)
-        logging.debug("Headers for HTTP PATCH request : %s", headers)
-        logging.debug("Data for HTTP PATCH request : %s", data)
-        logging.debug("Files for HTTP PATCH request : %s", files)
-        logging.debug("Close Connection Early (True/False)? : %s", close_early)
-        logging.debug("Cookies for HTTP PATCH request : %s", cookies)
-        logging.debug("Timeout for HTTP PATCH  request : %s", timeout)
-        logging.debug(
-            "Allow Redirects for HTTP PATCH request : %s", allow_redirects)
-        logging.debug("Authorization for HTTP PATCH request : %s", auth)
-
+        timer = self.request_logger.timer(self.log_level())
         try:
-            response = self.session.patch(url, headers=headers, params=params, data=data,
-                                          files=files, cookies=cookies, timeout=timeout,
-                                          allow_redirects=allow_redirects, auth=auth)
-            if isinstance(response, requests.Response):
-                logging.info("Request-Id for HTTP GET Request: %s", response.headers.get('X-Request-Id'))
+            response = self.circuit_call(url, lambda: self.session.patch(
+                url, headers=headers, params=params, data=data, files=files, cookies=cookies, timeout=timeout,
+                allow_redirects=allow_redirects, auth=auth))
             if close_early:
                 response.close()
             response.raise_for_status()
-        except requests.exceptions.RequestException as error:
+        except (requests.exceptions.RequestException, CircuitOpenError) as error:
             logging.error("%s %s", error_message, str(error))
         finally:
-            if response:
-                self.log_minimal("Status Code : %s", response.status_code)
-                logging.debug("Total Time taken : %s", response.elapsed)
-                logging.debug("Response Headers : %s", response.headers)
-                logging.debug("Request Headers : %s", response.request.headers)
-            else:
+            self.request_logger.log("PATCH", url, response, timer, self.log_level(), headers=headers, data=data)
+            if not response:
                 logging.critical(HTTPRequests.no_response)
         return response
 
@@ -402,33 +415,19 @@ class HTTPRequests(object):
         :return: Response from the requests call
         """
         response = None
-        self.log_minimal("Url for HTTP OPTIONS request : %s", url)
-        logging.debug("Parameters for HTTP OPTIONS request : %s", params)
-        logging.debug("Headers for HTTP OPTIONS request : %s", headers)
-        logging.debug("Close Connection Early (True/False)? : %s", close_early)
-        logging.debug("Cookies for HTTP OPTIONS request : %s", cookies)
-        logging.debug("Timeout for HTTP OPTIONS request : %s", timeout)
-        logging.debug(
-            "Allow Redirects for HTTP OPTIONS request : %s", allow_redirects)
-        logging.debug("Authorization for HTTP OPTIONS request : %s", auth)
-
+        timer = self.request_logger.timer(self.log_level())
         try:
-            response = self.session.options(url, headers=headers, params=params, auth=auth,
-                                            cookies=cookies, timeout=timeout, allow_redirects=allow_redirects)
-            if isinstance(response, requests.Response):
-                logging.info("Request-Id for HTTP GET Request: %s", response.headers.get('X-Request-Id'))
+            response = self.circuit_call(url, lambda: self.session.options(
+                url, headers=headers, params=params, auth=auth, cookies=cookies, timeout=timeout,
+                allow_redirects=allow_redirects))
             if close_early:
                 response.close()
             response.raise_for_status()
-        except requests.exceptions.RequestException as error:
+        except (requests.exceptions.RequestException, CircuitOpenError) as error:
             logging.error("%s %s", error_message, str(error))
         finally:
-            if response:
-                self.log_minimal("Status Code : %s", response.status_code)
-                logging.debug("Total Time taken : %s", response.elapsed)
-                logging.debug("Response Headers : %s", response.headers)
-                logging.debug("Request Headers : %s", response.request.headers)
-            else:
+            self.request_logger.log("OPTIONS", url, response, timer, self.log_level(), headers=headers)
+            if not response:
                 logging.critical(HTTPRequests.no_response)
         return response
 
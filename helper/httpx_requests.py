@@ -3,10 +3,23 @@
 """
 This is a helper script for sending HTTP Requests
 """
+import asyncio
+import contextlib
 import logging
+import time
 
 import httpx
 
+try:
+    from alpha_library.helper.circuit_breaker import CircuitBreaker, CircuitOpenError, default_circuit_breaker
+    from alpha_library.helper.request_logging import default_request_logger
+    from alpha_library.helper.retry_policy import RetryPolicy
+except ModuleNotFoundError:
+    logging.info("Module called internally")
+    from helper.circuit_breaker import CircuitBreaker, CircuitOpenError, default_circuit_breaker
+    from helper.request_logging import default_request_logger
+    from helper.retry_policy import RetryPolicy
+
 
 class HTTPXRequests(object):
     """
@@ -17,6 +30,12 @@ class HTTPXRequests(object):
 
     def __init__(self, ssl_verify=True, **kwargs):
         self.client = httpx.Client(http2=True)
+        # RetryPolicy of call_requests_with_retry calls
+        self.retry_policy = None
+        # Per host circuit breaker shared by the process (None disables it)
+        self.circuit_breaker = default_circuit_breaker
+        # RequestLogger writing one record per request (sampling, redaction, timings)
+        self.request_logger = default_request_logger
         self.__dict__.update(kwargs)
         if not ssl_verify:
             self.client.verify = False
@@ -37,6 +56,30 @@ class HTTPXRequests(object):
         else:
             logging.info(msg, *args, **kwargs)
 
+    def log_level(self) -> int:
+        return logging.DEBUG if self.log_minimally else logging.INFO
+
+    def circuit_call(self, url, send):
+        """
+        This method sends call through circuit of host, calls to a host with open circuit raise CircuitOpenError
+        (call_*_requests log it and return None as for connection errors)
+        """
+        if self.circuit_breaker is None:
+            return send()
+        return self.circuit_breaker.call(url, send)
+
+    def call_requests_with_retry(self, method: str, url: str, retry_policy=None, **kwargs):
+        """
+        Retry for failures of any method, retries follow retry policy (backoff with jitter, Retry-After,
+        idempotency of method and retry budget of host)
+        :param method: get, put, post, delete, head, patch, options
+        :param kwargs: Arguments of call_<method>_requests
+        :return: Last response
+        """
+        call = getattr(self, f"call_{method.lower()}_requests")
+        return (retry_policy or self.retry_policy or RetryPolicy()).call(method.upper(), url,
+                                                                         lambda: call(url, **kwargs))
+
     def call_get_requests(self, url: str, headers=None, params=None, auth=None,
                           stream=False, stream_type=None, close_early=False, cookies=None,
                           timeout=None, allow_redirects=True, error_message="Error in GET Request : "):
@@ -56,51 +99,40 @@ class HTTPXRequests(object):
         :return: Response from the requests call
         """
         response = None
-        self.log_minimal("Url for HTTP GET request : %s", url)
-        logging.debug(f"Parameters for HTTP GET request : {params}")
-        logging.debug(f"Headers for HTTP GET request : {headers}")
-        logging.debug(f"Request Stream (True/False)? : {stream}")
-        logging.debug(f"Close Connection Early (True/False)? : {close_early}")
-        logging.debug(f"Cookies for HTTP GET request : {cookies}")
-        logging.debug(f"Timeout for HTTP GET request : {timeout}")
-        logging.debug(f"Allow Redirects for HTTP GET request : {allow_redirects}")
-        logging.debug(f"Authorization for HTTP GET request : {auth}")
+        timer = self.request_logger.timer(self.log_level())
         try:
             if stream:
                 # returns a stream object (https://www.python-httpx.org/quickstart/#streaming-responses)
                 # now it depends on developer how they want to take the response
-                httpx_stream_object = httpx.stream(url=url, method="GET", headers=headers, params=params, auth=auth,
-                                                   cookies=cookies, timeout=timeout)
+                # Response is sent through client (pool, circuit breaker) and closed once iterator is exhausted
+                request = self.client.build_request("GET", url, headers=headers, params=params, cookies=cookies,
+                                                    timeout=timeout, extensions=timer.extensions())
+                response = self.circuit_call(url, lambda: self.client.send(
+                    request, stream=True, auth=auth, follow_redirects=allow_redirects))
                 if stream_type == "binary":
-                    return httpx_stream_object.iter_bytes()
+                    return response.iter_bytes()
                 elif stream_type == "text":
-                    return httpx_stream_object.iter_text()
+                    return response.iter_text()
                 elif stream_type == "line-by-line":
-                    return httpx_stream_object.iter_lines()
+                    return response.iter_lines()
                 elif stream_type == "raw":
-                    return httpx_stream_object.iter_raw()
+                    return response.iter_raw()
                 else:
-                    return httpx_stream_object
+                    # Context manager closing the response, as httpx.stream
+                    return contextlib.closing(response)
 
             # Non-stream !
-            response = self.client.get(url, headers=headers, params=params, auth=auth,
-                                       cookies=cookies, timeout=timeout, follow_redirects=allow_redirects)
+            response = self.circuit_call(url, lambda: self.client.get(
+                url, headers=headers, params=params, auth=auth, cookies=cookies, timeout=timeout,
+                follow_redirects=allow_redirects, extensions=timer.extensions()))
             if close_early:
                 response.close()
             response.raise_for_status()
-        except (httpx.RequestError, httpx.HTTPStatusError) as error:
+        except (httpx.RequestError, httpx.HTTPStatusError, CircuitOpenError) as error:
             logging.error(error_message + str(error))
         finally:
-            if response:
-                self.log_minimal("Status Code : %s", response.status_code)
-                logging.debug(f"Total Time taken : {response.elapsed}")
-                logging.debug(f"Encoding : {response.encoding}")
-                logging.debug(f"Response Headers : {response.headers}")
-                logging.debug(f"Request Headers : {response.request.headers}")
-                logging.debug(f"Size of Response : {len(response.content)}")
-                if response.encoding or response.text:
-                    logging.debug(f"Response Text : {response.text}")
-            else:
+            self.request_logger.log("GET", url, response, timer, self.log_level(), headers=headers)
+            if not response:
                 logging.critical(HTTPXRequests.no_response)
         return response
 
@@ -123,36 +155,19 @@ class HTTPXRequests(object):
         :return: Response from the requests call
         """
         response = None
-        self.log_minimal(f"Url for HTTP PUT request : {url}")
-        logging.debug(f"Parameters for HTTP PUT request : {params}")
-        logging.debug(f"Headers for HTTP PUT request : {headers}")
-        logging.debug(f"Data for HTTP PUT request : {data}")
-        logging.debug(f"Files for HTTP PUT request : {files}")
-        logging.debug(f"Close Connection Early (True/False)? : {close_early}")
-        logging.debug(f"Cookies for HTTP PUT request : {cookies}")
-        logging.debug(f"Timeout for HTTP PUT request : {timeout}")
-        logging.debug(f"Allow Redirects for HTTP PUT request : {allow_redirects}")
-        logging.debug(f"Authorization for HTTP PUT request : {auth}")
+        timer = self.request_logger.timer(self.log_level())
         try:
-            response = self.client.put(url, headers=headers, params=params, data=data,
-                                       files=files, cookies=cookies, timeout=timeout,
-                                       follow_redirects=allow_redirects, auth=auth)
+            response = self.circuit_call(url, lambda: self.client.put(
+                url, headers=headers, params=params, data=data, files=files, cookies=cookies, timeout=timeout,
+                follow_redirects=allow_redirects, auth=auth, extensions=timer.extensions()))
             if close_early:
                 response.close()
             response.raise_for_status()
-        except (httpx.RequestError, httpx.HTTPStatusError) as error:
+        except (httpx.RequestError, httpx.HTTPStatusError, CircuitOpenError) as error:
             logging.error(error_message + str(error))
         finally:
-            if response:
-                self.log_minimal(f"Status Code : {response.status_code}")
-                logging.debug(f"Total Time taken : {response.elapsed}")
-                logging.debug(f"Encoding : {response.encoding}")
-                logging.debug(f"Response Headers : {response.headers}")
-                logging.debug(f"Request Headers : {response.request.headers}")
-                logging.debug(f"Size of Response : {len(response.content)}")
-                if response.encoding or response.text:
-                    logging.debug(f"Response Text : {response.text}")
-            else:
+            self.request_logger.log("PUT", url, response, timer, self.log_level(), headers=headers, data=data)
+            if not response:
                 logging.critical(HTTPXRequests.no_response)
         return response
 
@@ -175,37 +190,19 @@ class HTTPXRequests(object):
         :return: Response from the requests call
         """
         response = None
-        self.log_minimal(f"Url for HTTP POST request : {url}")
-        logging.debug(f"Parameters for HTTP POST request : {params}")
-        logging.debug(f"Headers for HTTP POST request : {headers}")
-        logging.debug(f"Data for HTTP POST request : {data}")
-        logging.debug(f"Files for HTTP POST request : {files}")
-        logging.debug(f"Auth for HTTP POST request : {auth}")
-        logging.debug(f"Close Connection Early (True/False)? : {close_early}")
-        logging.debug(f"Cookies for HTTP POST request : {cookies}")
-        logging.debug(f"Timeout for HTTP POST request : {timeout}")
-        logging.debug(f"Allow Redirects for HTTP POST request : {allow_redirects}")
-
+        timer = self.request_logger.timer(self.log_level())
         try:
-            response = self.client.post(url, headers=headers, params=params, data=data,
-                                        files=files, cookies=cookies, timeout=timeout,
-                                        follow_redirects=allow_redirects, auth=auth)
+            response = self.circuit_call(url, lambda: self.client.post(
+                url, headers=headers, params=params, data=data, files=files, cookies=cookies, timeout=timeout,
+                follow_redirects=allow_redirects, auth=auth, extensions=timer.extensions()))
             if close_early:
                 response.close()
             response.raise_for_status()
-        except (httpx.RequestError, httpx.HTTPStatusError) as error:
+        except (httpx.RequestError, httpx.HTTPStatusError, CircuitOpenError) as error:
             logging.error(error_message + str(error))
         finally:
-            if response:
-                self.log_minimal(f"Status Code : {response.status_code}")
-                logging.debug(f"Total Time taken : {response.elapsed}")
-                logging.debug(f"Encoding : {response.encoding}")
-                logging.debug(f"Response Headers : {response.headers}")
-                logging.debug(f"Request Headers : {response.request.headers}")
-                logging.debug(f"Size of response : {len(response.content)}")
-                if response.encoding or response.text:
-                    logging.debug(f"Response Text : {response.text}")
-            else:
+            self.request_logger.log("POST", url, response, timer, self.log_level(), headers=headers, data=data)
+            if not response:
                 logging.critical(HTTPXRequests.no_response)
         return response
 
@@ -226,34 +223,19 @@ class HTTPXRequests(object):
         :return: Response from the requests call
         """
         response = None
-        self.log_minimal(f"Url for HTTP DELETE request : {url}")
-        logging.debug(f"Parameters for HTTP DELETE request : {params}")
-        logging.debug(f"Headers for HTTP DELETE request : {headers}")
-        logging.debug(f"Close Connection Early (True/False)? : {close_early}")
-        logging.debug(f"Cookies for HTTP DELETE request : {cookies}")
-        logging.debug(f"Timeout for HTTP DELETE request : {timeout}")
-        logging.debug(f"Allow Redirects for HTTP DELETE request : {allow_redirects}")
-        logging.debug(f"Authorization for HTTP DELETE request : {auth}")
-
+        timer = self.request_logger.timer(self.log_level())
         try:
-            response = self.client.delete(url, headers=headers, params=params, cookies=cookies,
-                                          timeout=timeout, follow_redirects=allow_redirects, auth=auth)
+            response = self.circuit_call(url, lambda: self.client.delete(
+                url, headers=headers, params=params, cookies=cookies, timeout=timeout, follow_redirects=allow_redirects,
+                auth=auth, extensions=timer.extensions()))
             if close_early:
                 response.close()
             response.raise_for_status()
-        except (httpx.RequestError, httpx.HTTPStatusError) as error:
+        except (httpx.RequestError, httpx.HTTPStatusError, CircuitOpenError) as error:
             logging.error(error_message + str(error))
         finally:
-            if response:
-                self.log_minimal(f"Status Code : {response.status_code}")
-                logging.debug(f"Total Time taken : {response.elapsed}")
-                logging.debug(f"Encoding : {response.encoding}")
-                logging.debug(f"Response Headers : {response.headers}")
-                logging.debug(f"Request Headers : {response.request.headers}")
-                logging.debug(f"Size of response : {len(response.content)}")
-                if response.encoding or response.text:
-                    logging.debug(f"Response Text : {response.text}")
-            else:
+            self.request_logger.log("DELETE", url, response, timer, self.log_level(), headers=headers)
+            if not response:
                 logging.critical(HTTPXRequests.no_response)
         return response
 
@@ -274,34 +256,19 @@ class HTTPXRequests(object):
                 :return: Response from the requests call
                 """
         response = None
-        self.log_minimal(f"Url for HTTP HEAD request : {url}")
-        logging.debug(f"Parameters for HTTP HEAD request : {params}")
-        logging.debug(f"Headers for HTTP HEAD request : {headers}")
-        logging.debug(f"Close Connection Early (True/False)? : {close_early}")
-        logging.debug(f"Cookies for HTTP HEAD request : {cookies}")
-        logging.debug(f"Timeout for HTTP HEAD request : {timeout}")
-        logging.debug(f"Allow Redirects for HTTP HEAD request : {allow_redirects}")
-        logging.debug(f"Authorization for HTTP HEAD request : {auth}")
-
+        timer = self.request_logger.timer(self.log_level())
         try:
-            response = self.client.head(url, headers=headers, params=params, auth=auth,
-                                        timeout=timeout, cookies=cookies, follow_redirects=True)
+            response = self.circuit_call(url, lambda: self.client.head(
+                url, headers=headers, params=params, auth=auth, timeout=timeout, cookies=cookies,
+                follow_redirects=True, extensions=timer.extensions()))
             if close_early:
                 response.close()
             response.raise_for_status()
-        except (httpx.RequestError, httpx.HTTPStatusError) as error:
+        except (httpx.RequestError, httpx.HTTPStatusError, CircuitOpenError) as error:
             logging.error(error_message + str(error))
         finally:
-            if response:
-                self.log_minimal(f"Status Code : {response.status_code}")
-                logging.debug(f"Total Time taken : {response.elapsed}")
-                logging.debug(f"Encoding : {response.encoding}")
-                logging.debug(f"Response Headers : {response.headers}")
-                logging.debug(f"Request Headers : {response.request.headers}")
-                logging.debug(f"Size of response : {len(response.content)}")
-                if response.encoding or response.text:
-                    logging.debug(f"Response Text : {response.text}")
-            else:
+            self.request_logger.log("HEAD", url, response, timer, self.log_level(), headers=headers)
+            if not response:
                 logging.critical(HTTPXRequests.no_response)
         return response
 
@@ -324,37 +291,19 @@ class HTTPXRequests(object):
         :return: Response from the requests call
         """
         response = None
-        self.log_minimal(f"Url for HTTP PATCH request : {url}")
-        logging.debug(f"Parameters for HTTP PATCH request : {params}")
-        logging.debug(f"Headers for HTTP PATCH request : {headers}")
-        logging.debug(f"Data for HTTP PATCH request : {data}")
-        logging.debug(f"Files for HTTP PATCH request : {files}")
-        logging.debug(f"Close Connection Early (True/False)? : {close_early}")
-        logging.debug(f"Cookies for HTTP PATCH request : {cookies}")
-        logging.debug(f"Timeout for HTTP PATCH  request : {timeout}")
-        logging.debug(f"Allow Redirects for HTTP PATCH request : {allow_redirects}")
-        logging.debug(f"Authorization for HTTP PATCH request : {auth}")
-
+        timer = self.request_logger.timer(self.log_level())
         try:
-            response = self.client.patch(url, headers=headers, params=params, data=data,
-                                         files=files, cookies=cookies, timeout=timeout,
-                                         follow_redirects=allow_redirects, auth=auth)
+            response = self.circuit_call(url, lambda: self.client.patch(
+                url, headers=headers, params=params, data=data, files=files, cookies=cookies, timeout=timeout,
+                follow_redirects=allow_redirects, auth=auth, extensions=timer.extensions()))
             if close_early:
                 response.close()
             response.raise_for_status()
-        except (httpx.RequestError, httpx.HTTPStatusError) as error:
+        except (httpx.RequestError, httpx.HTTPStatusError, CircuitOpenError) as error:
             logging.error(error_message + str(error))
         finally:
-            if response:
-                self.log_minimal(f"Status Code : {response.status_code}")
-                logging.debug(f"Total Time taken : {response.elapsed}")
-                logging.debug(f"Encoding : {response.encoding}")
-                logging.debug(f"Response Headers : {response.headers}")
-                logging.debug(f"Request Headers : {response.request.headers}")
-                logging.debug(f"Size of response : {len(response.content)}")
-                if response.encoding or response.text:
-                    logging.debug(f"Response Text : {response.text}")
-            else:
+            self.request_logger.log("PATCH", url, response, timer, self.log_level(), headers=headers, data=data)
+            if not response:
                 logging.critical(HTTPXRequests.no_response)
         return response
 
@@ -375,39 +324,225 @@ class HTTPXRequests(object):
         :return: Response from the requests call
         """
         response = None
-        self.log_minimal(f"Url for HTTP OPTIONS request : {url}")
-        logging.debug(f"Parameters for HTTP OPTIONS request : {params}")
-        logging.debug(f"Headers for HTTP OPTIONS request : {headers}")
-        logging.debug(f"Close Connection Early (True/False)? : {close_early}")
-        logging.debug(f"Cookies for HTTP OPTIONS request : {cookies}")
-        logging.debug(f"Timeout for HTTP OPTIONS request : {timeout}")
-        logging.debug(f"Allow Redirects for HTTP OPTIONS request : {allow_redirects}")
-        logging.debug(f"Authorization for HTTP OPTIONS request : {auth}")
-
+        timer = self.request_logger.timer(self.log_level())
         try:
 
-            response = self.client.options(url, headers=headers, params=params, auth=auth,
-                                           cookies=cookies, timeout=timeout, follow_redirects=allow_redirects)
+            response = self.circuit_call(url, lambda: self.client.options(
+                url, headers=headers, params=params, auth=auth, cookies=cookies, timeout=timeout,
+                follow_redirects=allow_redirects, extensions=timer.extensions()))
             if close_early:
                 response.close()
             response.raise_for_status()
-        except (httpx.RequestError, httpx.HTTPStatusError) as error:
+        except (httpx.RequestError, httpx.HTTPStatusError, CircuitOpenError) as error:
             logging.error(error_message + str(error))
         finally:
-            if response:
-                self.log_minimal(f"Status Code : {response.status_code}")
-                logging.debug(f"Total Time taken : {response.elapsed}")
-                logging.debug(f"Encoding : {response.encoding}")
-                logging.debug(f"Response Headers : {response.headers}")
-                logging.debug(f"Request Headers : {response.request.headers}")
-                logging.debug(f"Size of response : {len(response.content)}")
-                if response.encoding or response.text:
-                    logging.debug(f"Response Text : {response.text}")
-            else:
+            self.request_logger.log("OPTIONS", url, response, timer, self.log_level(), headers=headers)
+            if not response:
                 logging.critical(HTTPXRequests.no_response)
         return response
 
 
+
+class AsyncHTTPXRequests(object):
+    """
+        This class is asyncio counterpart of HTTPXRequests on httpx.AsyncClient
+        Requests share few HTTP/2 connections (multiplexed streams), so concurrency is bound by network and
+        server instead of threads, fetch_many / stream_many run batches with bounded concurrency
+        Use as async context manager (or call aclose) to release connections
+    """
+    # Class Variables
+    no_response = "No Response !!"
+    max_connections = 20
+    max_keepalive_connections = 20
+    concurrency = 100
+
+    def __init__(self, ssl_verify=True, **kwargs):
+        self.log_minimally = False
+        self.http2 = True
+        self.max_connections = AsyncHTTPXRequests.max_connections
+        self.max_keepalive_connections = AsyncHTTPXRequests.max_keepalive_connections
+        self.timeout = None
+        # RetryPolicy of call_requests_with_retry calls and of batches
+        self.retry_policy = None
+        # Per host circuit breaker shared by the process (None disables it)
+        self.circuit_breaker = default_circuit_breaker
+        # RequestLogger writing one record per request (sampling, redaction, timings)
+        self.request_logger = default_request_logger
+        self.__dict__.update(kwargs)
+
+        logging.debug(f"Instance variables for AsyncHTTPXRequests : {self.__dict__}")
+
+        self.client = httpx.AsyncClient(http2=self.http2, verify=ssl_verify, timeout=self.timeout,
+                                        limits=httpx.Limits(max_connections=self.max_connections,
+                                                            max_keepalive_connections=self.max_keepalive_connections))
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, exc_traceback):
+        await self.aclose()
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    def log_minimal(self, msg, *args, **kwargs):
+        if self.log_minimally:
+            logging.debug(msg, *args, **kwargs)
+        else:
+            logging.info(msg, *args, **kwargs)
+
+    def log_level(self) -> int:
+        return logging.DEBUG if self.log_minimally else logging.INFO
+
+    async def call_requests(self, method: str, url: str, headers=None, params=None, data=None, files=None,
+                            json=None, close_early=False, cookies=None, timeout=None, auth=None,
+                            allow_redirects=True, error_message=None):
+        """
+        This method sends request of any method
+        :return: Response (also for HTTP error status) or None when no response was received
+        """
+        response = None
+        error_message = error_message or f"Error in {method.upper()} Request : "
+        timer = self.request_logger.timer(self.log_level())
+        request_params = {"headers": headers, "params": params, "cookies": cookies, "auth": auth,
+                          "follow_redirects": allow_redirects, "extensions": timer.extensions(asynchronous=True)}
+        for key, value in (("data", data), ("files", files), ("json", json)):
+            if value is not None:
+                request_params[key] = value
+        if timeout is not None:
+            request_params["timeout"] = timeout
+        try:
+            if self.circuit_breaker is None:
+                response = await self.client.request(method.upper(), url, **request_params)
+            else:
+                response = await self.circuit_breaker.call_async(
+                    url, lambda: self.client.request(method.upper(), url, **request_params))
+            if close_early:
+                await response.aclose()
+            response.raise_for_status()
+        except (httpx.RequestError, httpx.HTTPStatusError, CircuitOpenError) as error:
+            logging.error(error_message + str(error))
+        finally:
+            self.request_logger.log(method.upper(), url, response, timer, self.log_level(), headers=headers,
+                                    data=data if data is not None else json)
+            if response is None:
+                logging.critical(AsyncHTTPXRequests.no_response)
+        return response
+
+    async def call_get_requests(self, url: str, **kwargs):
+        return await self.call_requests("GET", url, **kwargs)
+
+    async def call_put_requests(self, url: str, **kwargs):
+        return await self.call_requests("PUT", url, **kwargs)
+
+    async def call_post_requests(self, url: str, **kwargs):
+        return await self.call_requests("POST", url, **kwargs)
+
+    async def call_delete_requests(self, url: str, **kwargs):
+        return await self.call_requests("DELETE", url, **kwargs)
+
+    async def call_head_requests(self, url: str, **kwargs):
+        return await self.call_requests("HEAD", url, **kwargs)
+
+    async def call_patch_requests(self, url: str, **kwargs):
+        return await self.call_requests("PATCH", url, **kwargs)
+
+    async def call_options_requests(self, url: str, **kwargs):
+        return await self.call_requests("OPTIONS", url, **kwargs)
+
+    async def call_requests_with_retry(self, method: str, url: str, retry_policy=None, **kwargs):
+        """
+        Retry for failures of any method following retry policy
+        """
+        return await (retry_policy or self.retry_policy or RetryPolicy()).call_async(
+            method.upper(), url, lambda: self.call_requests(method, url, **kwargs))
+
+    @staticmethod
+    def request_kwargs(request) -> dict:
+        """
+        This method normalises a batch request (url or dict of method, url and call_requests arguments)
+        """
+        if isinstance(request, str):
+            return {"method": "GET", "url": request}
+        return {"method": "GET", **request}
+
+    @staticmethod
+    async def run_bounded(func, items, concurrency) -> list:
+        """
+        This method awaits func(item) for every item with at most concurrency calls in flight
+        Items are pulled lazily by concurrency workers, so huge batches never create a task per item
+        :return: Results in order of items (exceptions in place of results)
+        """
+        results = dict()
+        iterator = enumerate(items)
+
+        async def worker():
+            for index, item in iterator:
+                try:
+                    results[index] = await func(item)
+                except Exception as error:
+                    results[index] = error
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return [results[index] for index in sorted(results)]
+
+    async def fetch_many(self, requests, concurrency=None, retry_policy=None) -> list:
+        """
+        This method sends many requests concurrently over the shared connections
+        :param requests: Iterable of urls (GET) or dicts of method, url and call_requests arguments
+        :param concurrency: Maximum requests in flight (default : AsyncHTTPXRequests.concurrency)
+        :param retry_policy: RetryPolicy of every request (default : retry_policy of instance, no retry without one)
+        :return: Responses in order of requests (None / exception for requests without response)
+        """
+        retry_policy = retry_policy or self.retry_policy
+
+        async def fetch(request):
+            request = AsyncHTTPXRequests.request_kwargs(request)
+            if retry_policy:
+                return await self.call_requests_with_retry(retry_policy=retry_policy, **request)
+            return await self.call_requests(**request)
+
+        return await AsyncHTTPXRequests.run_bounded(fetch, requests, concurrency or AsyncHTTPXRequests.concurrency)
+
+    async def stream_many(self, requests, handler, concurrency=None) -> list:
+        """
+        This method streams many responses concurrently, body is never buffered by this method
+        :param requests: Iterable of urls (GET) or dicts of method, url and httpx request arguments
+        :param handler: Coroutine function (request, response) consuming response (response.aiter_bytes() etc.)
+        :param concurrency: Maximum responses streamed at once (default : AsyncHTTPXRequests.concurrency)
+        :return: Results of handler in order of requests (exception for failed requests)
+        """
+        async def stream(request):
+            request = AsyncHTTPXRequests.request_kwargs(request)
+            method, url = request.pop("method"), request.pop("url")
+            host = CircuitBreaker.host(url)
+            if self.circuit_breaker:
+                self.circuit_breaker.before_call(host)
+            start = time.monotonic()
+            # Outcome of a stream is known once headers arrived, a transport error while body is read fails it,
+            # errors of handler do not, outcome is recorded exactly once (call without outcome is released)
+            success, duration = None, None
+            try:
+                async with self.client.stream(method, url, **request) as response:
+                    success, duration = CircuitBreaker.is_success(response), time.monotonic() - start
+                    response.raise_for_status()
+                    return await handler({"method": method, "url": url, **request}, response)
+            except httpx.TransportError:
+                success, duration = False, time.monotonic() - start
+                raise
+            except Exception:
+                if success is None:
+                    success, duration = False, time.monotonic() - start
+                raise
+            finally:
+                if self.circuit_breaker:
+                    if success is None:
+                        self.circuit_breaker.release(host)
+                    else:
+                        self.circuit_breaker.record(host, success, duration)
+
+        return await AsyncHTTPXRequests.run_bounded(stream, requests, concurrency or AsyncHTTPXRequests.concurrency)
+
 if __name__ == "__main__":
     # LOGGING #
     root = logging.getLogger()
@@ -0,0 +1,224 @@
+#!/usr/bin/python3
+# coding=utf-8
+"""
+This scripts provides local persistent (SQLite) index of storage listings with incremental refresh
+"""
+import datetime
+import logging
+import sqlite3
+import threading
+import time
+
+try:
+    from alpha_library.boto3_helper.s3 import S3ObjectList
+    from alpha_library.gcp_helper.storage import GSObjectList
+except ModuleNotFoundError:
+    logging.info("Module called internally")
+    from boto3_helper.s3 import S3ObjectList
+    from gcp_helper.storage import GSObjectList
+
+
+class ListingIndex(object):
+    """
+        This class keeps Key, Size, ETag and LastModified of storage objects in a local SQLite file
+        Refresh modes:
+            incremental : lists only keys after the last indexed key (StartAfter), for lexicographically
+                          increasing keys this is the cheapest way to find new files
+            modified : lists the whole prefix but writes only objects newer than LastModified watermark,
+                       picks up objects overwritten under an existing key
+            rebuild : drops the prefix from index and lists it again, picks up deleted objects as well
+    """
+    index_path = "/tmp/alpha_library_listing_index.sqlite"
+    batch_size = 1000
+
+    def __init__(self, **kwargs):
+        self.index_path = ListingIndex.index_path
+        self.__dict__.update(kwargs)
+
+        self.__lock = threading.Lock()
+        self.__connection = sqlite3.connect(self.index_path, check_same_thread=False)
+        with self.__lock, self.__connection:
+            self.__connection.execute("PRAGMA journal_mode=WAL")
+            self.__connection.execute("PRAGMA synchronous=NORMAL")
+            self.__connection.execute("CREATE TABLE IF NOT EXISTS objects ("
+                                      "storage_type TEXT, bucket TEXT, key TEXT, size INTEGER, etag TEXT, "
+                                      "last_modified REAL, PRIMARY KEY (storage_type, bucket, key))")
+            self.__connection.execute("CREATE INDEX IF NOT EXISTS objects_last_modified "
+                                      "ON objects (storage_type, bucket, last_modified)")
+            self.__connection.execute("CREATE TABLE IF NOT EXISTS watermarks ("
+                                      "storage_type TEXT, bucket TEXT, prefix TEXT, last_key TEXT, "
+                                      "last_modified REAL, refreshed_at REAL, "
+                                      "PRIMARY KEY (storage_type, bucket, prefix))")
+
+        logging.debug(f"Instance variables for ListingIndex : {self.__dict__}")
+
+    def close(self):
+        """
+        This method closes the index file
+        """
+        with self.__lock:
+            self.__connection.close()
+
+    @staticmethod
+    def list_storage(storage_type, cred_details, storage_details, folder_to_check, start_after=None, **kwargs):
+        """
+        This method returns generator over objects of the storage
+        """
+        if storage_type == "s3":
+            return S3ObjectList(aws_details=cred_details).iter_objects(
+                s3_details=storage_details, folder_to_check=folder_to_check, start_after=start_after,
+                endpoint_url=kwargs.get("endpoint_url"), throw_exception=True)
+        elif storage_type == "gs":
+            return GSObjectList(sa_json_data=cred_details).iter_objects(
+                gs_details=storage_details, folder_to_check=folder_to_check, start_after=start_after,
+                throw_exception=True)
+        raise ValueError(f"Unsupported Cloud storage provider for listing index : {storage_type}")
+
+    @staticmethod
+    def prefix_condition(prefix):
+        """
+        This method returns SQL condition (and parameters) selecting keys starting with prefix
+        Condition is a range on key (prefix <= key < prefix with last character incremented), so it is answered
+        out of the primary key index instead of scanning the table
+        """
+        upper = prefix.rstrip(chr(0x10FFFF))
+        if not upper:
+            return "key >= ?", [prefix]
+        return "key >= ? AND key < ?", [prefix, upper[:-1] + chr(ord(upper[-1]) + 1)]
+
+    def watermark(self, storage_type, bucket, prefix) -> dict:
+        """
+        This method returns watermark of the prefix (last_key, last_modified, refreshed_at)
+        """
+        with self.__lock:
+            row = self.__connection.execute(
+                "SELECT last_key, last_modified, refreshed_at FROM watermarks "
+                "WHERE storage_type = ? AND bucket = ? AND prefix = ?", (storage_type, bucket, prefix)).fetchone()
+        return dict(zip(("last_key", "last_modified", "refreshed_at"), row)) if row else {}
+
+    def refresh(self, storage_type, cred_details, storage_details, folder_to_check="", mode="incremental",
+                **kwargs) -> int:
+        """
+        This method refreshes the index for a prefix
+        :param storage_type: s3|gs
+        :param cred_details: Credentials of storage (aws_details / sa_json_data)
+        :param storage_details: Storage details containing bucket_name
+        :param folder_to_check: Prefix to index
+        :param mode: incremental|modified|rebuild (default : incremental)
+        :return: Number of objects written into index
+        """
+        start = time.monotonic()
+        bucket = storage_details["bucket_name"]
+        watermark = self.watermark(storage_type, bucket, folder_to_check)
+        last_key, last_modified = watermark.get("last_key"), watermark.get("last_modified")
+
+        if mode == "rebuild":
+            condition, parameters = ListingIndex.prefix_condition(folder_to_check)
+            with self.__lock, self.__connection:
+                self.__connection.execute(f"DELETE FROM objects WHERE storage_type = ? AND bucket = ? AND {condition}",
+                                          [storage_type, bucket] + parameters)
+            last_key, last_modified = None, None
+
+        start_after = last_key if mode == "incremental" else None
+        rows, written = [], 0
+        for item in ListingIndex.list_storage(storage_type, cred_details, storage_details, folder_to_check,
+                                              start_after=start_after, **kwargs):
+            item_last_modified = item["LastModified"].timestamp()
+            last_key = max(last_key or item["Key"], item["Key"])
+            if mode == "modified" and last_modified and item_last_modified <= last_modified:
+                continue
+            rows.append((storage_type, bucket, item["Key"], item["Size"], item["ETag"], item_last_modified))
+            if len(rows) == ListingIndex.batch_size:
+                written += self.__upsert(rows)
+                rows = []
+        written += self.__upsert(rows)
+
+        with self.__lock, self.__connection:
+            condition, parameters = ListingIndex.prefix_condition(folder_to_check)
+            latest = self.__connection.execute(
+                f"SELECT MAX(last_modified) FROM objects WHERE storage_type = ? AND bucket = ? AND {condition}",
+                [storage_type, bucket] + parameters).fetchone()[0]
+            self.__connection.execute("INSERT OR REPLACE INTO watermarks VALUES (?, ?, ?, ?, ?, ?)",
+                                      (storage_type, bucket, folder_to_check, last_key, latest, time.time()))
+
+        logging.info(f"Refreshed listing index for {storage_type}://{bucket}/{folder_to_check} ({mode}) : "
+                     f"{written} objects written in {time.monotonic() - start:.2f} seconds")
+        return written
+
+    def __upsert(self, rows) -> int:
+        """
+        This method writes a batch of rows into index
+        """
+        if rows:
+            with self.__lock, self.__connection:
+                self.__connection.executemany("INSERT OR REPLACE INTO objects VALUES (?, ?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    @staticmethod
+    def row_to_item(row) -> dict:
+        """
+        This method converts index row into s3 like item
+        """
+        return {"Key": row[0], "Size": row[1], "ETag": row[2],
+                "LastModified": datetime.datetime.fromtimestamp(row[3], tz=datetime.timezone.utc)}
+
+    def list_objects(self, storage_type, bucket, folder_to_check="", extensions=None, last_modified=None,
+                     min_size=None, latest_first=False):
+        """
+        Generator over indexed objects of the prefix
+        :param extensions: Only keys ending with one of these extensions
+        :param last_modified: Only objects modified on or after this datetime
+        :param min_size: Only objects with at least this size
+        :param latest_first: Order by LastModified descending instead of key
+        :return: Generator of s3 like items (Key, Size, ETag, LastModified)
+        """
+        condition, parameters = ListingIndex.prefix_condition(folder_to_check)
+        query = f"SELECT key, size, etag, last_modified FROM objects " \
+                f"WHERE storage_type = ? AND bucket = ? AND {condition}"
+        parameters = [storage_type, bucket] + parameters
+        if last_modified:
+            query += " AND last_modified >= ?"
+            parameters.append(last_modified.timestamp())
+        if min_size:
+            query += " AND size >= ?"
+            parameters.append(min_size)
+        query += " ORDER BY last_modified DESC" if latest_first else " ORDER BY key"
+
+        with self.__lock:
+            cursor = self.__connection.execute(query, parameters)
+        while True:
+            # Fetching in batches so that large prefixes are never loaded at once
+            with self.__lock:
+                rows = cursor.fetchmany(ListingIndex.batch_size)
+            if not rows:
+                break
+            for row in rows:
+                if extensions and not row[0].endswith(tuple(extensions)):
+                    continue
+                yield ListingIndex.row_to_item(row)
+
+    def latest_file(self, storage_type, bucket, folder_to_check="", extensions=None):
+        """
+        This method returns latest modified object of the prefix from index
+        :return: s3 like item or None
+        """
+        condition, parameters = ListingIndex.prefix_condition(folder_to_check)
+        with self.__lock:
+            cursor = self.__connection.execute(
+                f"SELECT key, size, etag, last_modified FROM objects WHERE storage_type = ? AND bucket = ? "
+                f"AND {condition} ORDER BY last_modified DESC", [storage_type, bucket] + parameters)
+            for row in cursor:
+                if not extensions or row[0].endswith(tuple(extensions)):
+                    return ListingIndex.row_to_item(row)
+        return None
+
+    def exists(self, storage_type, bucket, key):
+        """
+        This method checks existence of key in index
+        :return: s3 like item if key is indexed else None
+        """
+        with self.__lock:
+            row = self.__connection.execute(
+                "SELECT key, size, etag, last_modified FROM objects WHERE storage_type = ? AND bucket = ? AND key = ?",
+                (storage_type, bucket, key)).fetchone()
+        return ListingIndex.row_to_item(row) if row else None
@@ -0,0 +1,258 @@
+#!/usr/bin/python3
+# coding=utf-8
+"""
+This scripts provides read-through cache of object content with ETag revalidation
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class ObjectContentCache(object):
+    """
+        This class caches object content in memory (LRU bounded by total bytes) and optionally on disk
+        Entries younger than ttl are served without any network round trip, older entries are revalidated
+        with a conditional GET (If-None-Match on ETag) and only downloaded again when the object has changed
+        fetch callable passed to get receives the cached ETag (or None) and returns (data, etag), data is None
+        when the object was not modified
+    """
+    max_memory_bytes = 256 * 1024 ** 2
+    # Objects larger than this are never kept in memory (disk tier still keeps them)
+    max_object_size = 32 * 1024 ** 2
+    max_disk_bytes = 4 * 1024 ** 3
+    # Seconds for which an entry is trusted without revalidation
+    ttl = 30
+
+    def __init__(self, **kwargs):
+        self.max_memory_bytes = ObjectContentCache.max_memory_bytes
+        self.max_object_size = ObjectContentCache.max_object_size
+        self.max_disk_bytes = ObjectContentCache.max_disk_bytes
+        self.ttl = ObjectContentCache.ttl
+        # Directory of disk tier, disk tier is disabled without it
+        self.cache_dir = None
+        self.__dict__.update(kwargs)
+
+        logging.debug(f"Instance variables for ObjectContentCache : {self.__dict__}")
+
+        self.__lock = threading.Lock()
+        self.__key_locks = dict()
+        self.__memory = OrderedDict()
+        self.__memory_bytes = 0
+        self.__disk = OrderedDict()
+        self.__disk_bytes = 0
+        self.__stats = {"hits": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0, "revalidations": 0,
+                        "not_modified": 0, "bytes_saved": 0, "evictions": 0}
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self.__load_disk_index()
+
+    @staticmethod
+    def cache_key(*parts) -> str:
+        return "/".join(str(part) for part in parts)
+
+    def stats(self) -> dict:
+        with self.__lock:
+            return {**self.__stats, "memory_entries": len(self.__memory), "memory_bytes": self.__memory_bytes,
+                    "disk_entries": len(self.__disk), "disk_bytes": self.__disk_bytes}
+
+    def __acquire_key_lock(self, key) -> list:
+        """
+        This method locks key so that concurrent misses of one key result in a single fetch
+        Locks are reference counted and dropped once no thread uses them
+        """
+        with self.__lock:
+            key_lock = self.__key_locks.setdefault(key, [threading.Lock(), 0])
+            key_lock[1] += 1
+        key_lock[0].acquire()
+        return key_lock
+
+    def __release_key_lock(self, key, key_lock):
+        key_lock[0].release()
+        with self.__lock:
+            key_lock[1] -= 1
+            if not key_lock[1]:
+                self.__key_locks.pop(key, None)
+
+    # Disk tier
+    def __disk_path(self, key) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha256(key.encode()).hexdigest())
+
+    def __load_disk_index(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.cache_dir, name), "r") as meta_file:
+                    meta = json.load(meta_file)
+                entries.append((meta["accessed_at"], meta["key"], meta["size"]))
+            except (OSError, ValueError, KeyError):
+                continue
+        for _, key, size in sorted(entries):
+            self.__disk[key] = size
+            self.__disk_bytes += size
+
+    def __disk_read(self, key):
+        if not self.cache_dir or key not in self.__disk:
+            return None
+        path = self.__disk_path(key)
+        try:
+            with open(path + ".json", "r") as meta_file:
+                meta = json.load(meta_file)
+            with open(path + ".data", "rb") as data_file:
+                data = data_file.read()
+        except (OSError, ValueError):
+            self.__disk_remove(key)
+            return None
+        return {"data": data, "etag": meta["etag"], "validated_at": meta["validated_at"]}
+
+    def __disk_write_meta(self, key, entry):
+        path = self.__disk_path(key)
+        with open(path + ".json.tmp", "w") as meta_file:
+            json.dump({"key": key, "etag": entry["etag"], "validated_at": entry["validated_at"],
+                       "accessed_at": time.time(), "size": len(entry["data"])}, meta_file)
+        os.replace(path + ".json.tmp", path + ".json")
+
+    def __disk_touch(self, key, entry):
+        """
+        This method records revalidation of an entry whose content did not change, only metadata is rewritten
+        """
+        if not self.cache_dir:
+            return
+        with self.__lock:
+            on_disk = key in self.__disk
+        if on_disk:
+            self.__disk_write_meta(key, entry)
+        else:
+            self.__disk_write(key, entry)
+
+    def __disk_write(self, key, entry):
+        if not self.cache_dir or len(entry["data"]) > self.max_disk_bytes:
+            return
+        path = self.__disk_path(key)
+        # Files are replaced atomically, a crash never leaves a torn entry behind
+        with open(path + ".data.tmp", "wb") as data_file:
+            data_file.write(entry["data"])
+        os.replace(path + ".data.tmp", path + ".data")
+        self.__disk_write_meta(key, entry)
+
+        with self.__lock:
+            self.__disk_bytes += len(entry["data"]) - self.__disk.pop(key, 0)
+            self.__disk[key] = len(entry["data"])
+            evicted = []
+            while self.__disk_bytes > self.max_disk_bytes and len(self.__disk) > 1:
+                old_key, size = self.__disk.popitem(last=False)
+                self.__disk_bytes -= size
+                evicted.append(old_key)
+        for old_key in evicted:
+            self.__disk_unlink(old_key)
+
+    def __disk_remove(self, key):
+        with self.__lock:
+            self.__disk_bytes -= self.__disk.pop(key, 0)
+        self.__disk_unlink(key)
+
+    def __disk_unlink(self, key):
+        for suffix in (".data", ".json"):
+            try:
+                os.remove(self.__disk_path(key) + suffix)
+            except FileNotFoundError:
+                pass
+
+    # Memory tier
+    def __memory_put(self, key, entry):
+        with self.__lock:
+            old = self.__memory.pop(key, None)
+            if old:
+                self.__memory_bytes -= len(old["data"])
+            if len(entry["data"]) > self.max_object_size:
+                return
+            self.__memory[key] = entry
+            self.__memory_bytes += len(entry["data"])
+            while self.__memory_bytes > self.max_memory_bytes:
+                _, evicted = self.__memory.popitem(last=False)
+                self.__memory_bytes -= len(evicted["data"])
+                self.__stats["evictions"] += 1
+
+    def __lookup(self, key):
+        with self.__lock:
+            entry = self.__memory.get(key)
+            if entry:
+                self.__memory.move_to_end(key)
+                return entry, "memory"
+            if key in self.__disk:
+                self.__disk.move_to_end(key)
+        entry = self.__disk_read(key)
+        if entry:
+            self.__memory_put(key, entry)
+            return entry, "disk"
+        return None, None
+
+    def get(self, key, fetch) -> bytes:
+        """
+        This method returns content of key, fetching or revalidating through fetch only when needed
+        :param key: Cache key (see cache_key)
+        :param fetch: Callable(etag) -> (data, etag), data is None when object is not modified
+        :return: Object content in bytes
+        """
+        entry, tier = self.__lookup(key)
+        if entry and time.time() - entry["validated_at"] < self.ttl:
+            with self.__lock:
+                self.__stats["hits"] += 1
+                self.__stats[f"{tier}_hits"] += 1
+                self.__stats["bytes_saved"] += len(entry["data"])
+            return entry["data"]
+
+        key_lock = self.__acquire_key_lock(key)
+        try:
+            # Another thread may have refreshed the entry meanwhile
+            entry, tier = self.__lookup(key)
+            if entry and time.time() - entry["validated_at"] < self.ttl:
+                with self.__lock:
+                    self.__stats["hits"] += 1
+                    self.__stats[f"{tier}_hits"] += 1
+                    self.__stats["bytes_saved"] += len(entry["data"])
+                return entry["data"]
+
+            data, etag = fetch(entry["etag"] if entry and entry["etag"] else None)
+            with self.__lock:
+                if entry:
+                    self.__stats["revalidations"] += 1
+                if data is None and entry:
+                    self.__stats["not_modified"] += 1
+                    self.__stats["bytes_saved"] += len(entry["data"])
+                else:
+                    self.__stats["misses"] += 1
+
+            if data is None:
+                if entry is None:
+                    raise ValueError(f"Fetch of {key} returned no content")
+                entry = {"data": entry["data"], "etag": entry["etag"], "validated_at": time.time()}
+                self.__memory_put(key, entry)
+                self.__disk_touch(key, entry)
+            else:
+                entry = {"data": data, "etag": etag, "validated_at": time.time()}
+                self.__memory_put(key, entry)
+                self.__disk_write(key, entry)
+            return entry["data"]
+        finally:
+            self.__release_key_lock(key, key_lock)
+
+    def invalidate(self, key):
+        """
+        This method drops key from both tiers
+        """
+        with self.__lock:
+            entry = self.__memory.pop(key, None)
+            if entry:
+                self.__memory_bytes -= len(entry["data"])
+        if self.cache_dir:
+            self.__disk_remove(key)
+
+    def clear(self):
+        for key in list(self.__memory.keys()) + list(self.__disk.keys()):
+            self.invalidate(key)
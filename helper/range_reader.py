@@ -0,0 +1,122 @@
+#!/usr/bin/python3
+# coding=utf-8
+"""
+This scripts provides byte range reads (single and coalesced multi range) shared by storage providers
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+
+def check_range(offset, length=None):
+    """
+    This method validates a byte range, same rule holds for every provider : a suffix range (negative offset)
+    always reads last -offset bytes, so it takes no length
+    :raises ValueError: When length is given with a negative offset
+    """
+    if offset < 0 and length is not None:
+        raise ValueError(f"Suffix range (offset {offset}) reads till end of object and takes no length ({length})")
+
+
+def range_header(offset, length=None) -> str:
+    """
+    This method returns HTTP Range header value
+    :param offset: First byte, negative offset reads last -offset bytes (suffix range)
+    :param length: Number of bytes, None reads till end of object (must be None for suffix range)
+    """
+    check_range(offset, length)
+    if offset < 0:
+        return f"bytes={offset}"
+    if length is None:
+        return f"bytes={offset}-"
+    return f"bytes={offset}-{offset + length - 1}"
+
+
+class RangeReader(object):
+    """
+        This class reads many byte ranges of one object with as few requests as possible
+        Ranges closer than max_gap are coalesced into one request (up to max_request_size), requests are fetched
+        concurrently and sliced back into the requested ranges
+        Suffix ranges (negative offset) are fetched as they are, so no size lookup is needed
+        fetch callable receives (offset, length) and returns bytes of that range
+    """
+    max_gap = 1024 ** 2
+    max_request_size = 16 * 1024 ** 2
+    max_workers = 8
+
+    def __init__(self, **kwargs):
+        self.max_gap = RangeReader.max_gap
+        self.max_request_size = RangeReader.max_request_size
+        self.max_workers = RangeReader.max_workers
+        self.__dict__.update(kwargs)
+
+        logging.debug(f"Instance variables for RangeReader : {self.__dict__}")
+
+    @staticmethod
+    def from_kwargs(**kwargs):
+        """
+        This method returns RangeReader configured by max_gap, max_request_size and max_workers out of kwargs
+        """
+        return RangeReader(**{key: kwargs[key] for key in ("max_gap", "max_request_size", "max_workers")
+                              if kwargs.get(key)})
+
+    def plan(self, ranges) -> list:
+        """
+        This method groups ranges into requests
+        :param ranges: List of (offset, length)
+        :return: List of requests (offset, length, [(index, offset, length)])
+        """
+        requests = []
+        positive = sorted((offset, length, index) for index, (offset, length) in enumerate(ranges)
+                          if offset >= 0 and length is not None)
+        for index, (offset, length) in enumerate(ranges):
+            # Suffix ranges and ranges open till end of object are never coalesced
+            if offset < 0 or length is None:
+                requests.append((offset, length, [(index, offset, length)]))
+
+        current = None
+        for offset, length, index in positive:
+            end = offset + length
+            if current and offset - current["end"] <= self.max_gap and \
+                    max(end, current["end"]) - current["start"] <= self.max_request_size:
+                current["end"] = max(end, current["end"])
+                current["members"].append((index, offset, length))
+                continue
+            if current:
+                requests.append((current["start"], current["end"] - current["start"], current["members"]))
+            current = {"start": offset, "end": end, "members": [(index, offset, length)]}
+        if current:
+            requests.append((current["start"], current["end"] - current["start"], current["members"]))
+        return requests
+
+    def read_ranges(self, fetch, ranges) -> list:
+        """
+        This method reads ranges through fetch
+        :param fetch: Callable(offset, length) -> bytes
+        :param ranges: List of (offset, length), negative offset is a suffix range of -offset bytes (length must
+                       be None), length None reads till end of object
+        :return: List of bytes in order of ranges (shorter at end of object)
+        """
+        for offset, length in ranges:
+            check_range(offset, length)
+        ranges = [(offset, -offset if offset < 0 and length is None else length) for offset, length in ranges]
+        requests = self.plan(ranges)
+        results = [b""] * len(ranges)
+
+        def run(request):
+            start, length, members = request
+            data = fetch(start, None if start < 0 else length)
+            for index, offset, member_length in members:
+                if start < 0:
+                    results[index] = data
+                elif member_length is None:
+                    results[index] = data
+                else:
+                    results[index] = data[offset - start:offset - start + member_length]
+
+        if len(requests) == 1:
+            run(requests[0])
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(requests))) as executor:
+                list(executor.map(run, requests))
+        logging.debug(f"Read {len(ranges)} ranges with {len(requests)} requests")
+        return results
@@ -0,0 +1,146 @@
+#!/usr/bin/python3
+# coding=utf-8
+"""
+This scripts provides seekable read only file object over an object of any storage provider
+"""
+import io
+import logging
+import threading
+from collections import OrderedDict
+
+
+class RemoteFile(io.RawIOBase):
+    """
+        This class exposes a remote object as a seekable raw file (zipfile, tarfile, pyarrow, PIL etc.)
+        Object is read in blocks with ranged GETs and blocks are kept in a LRU cache of cache_blocks blocks
+        Sequential reads double the read-ahead window (up to max_read_ahead blocks per request), a seek elsewhere
+        resets it, so random access stays cheap while streaming reads need few large requests
+    """
+    block_size = 1024 ** 2
+    cache_blocks = 64
+    max_read_ahead = 16
+
+    def __init__(self, provider, storage_details, path, **kwargs):
+        """
+        :param provider: StorageProvider (helper.transfer_engine) of the object
+        :param storage_details: Storage details of the provider (bucket_name / container_name)
+        :param path: Path of the object
+        :param kwargs: block_size, cache_blocks, max_read_ahead, size (skips stat when known)
+        """
+        super().__init__()
+        self.provider = provider
+        self.storage_details = storage_details
+        self.path = path
+        self.block_size = kwargs.get("block_size") or RemoteFile.block_size
+        self.cache_blocks = kwargs.get("cache_blocks") or RemoteFile.cache_blocks
+        self.max_read_ahead = kwargs.get("max_read_ahead") or RemoteFile.max_read_ahead
+        self.name = provider.address(storage_details, path)
+        self.stats = {"requests": 0, "bytes_fetched": 0, "block_hits": 0, "block_misses": 0}
+        self.__position = 0
+        self.__blocks = OrderedDict()
+        self.__read_ahead = 1
+        self.__next_sequential_block = None
+        self.__lock = threading.Lock()
+
+        self.size = kwargs.get("size")
+        if self.size is None:
+            item = provider.stat(storage_details, path)
+            if item is None:
+                raise FileNotFoundError(self.name)
+            self.size = item["Size"]
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.__position
+
+    def seek(self, offset, whence=io.SEEK_SET) -> int:
+        if self.closed:
+            raise ValueError("I/O operation on closed file")
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self.__position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence ({whence})")
+        if position < 0:
+            raise ValueError(f"Negative seek position {position}")
+        self.__position = position
+        return position
+
+    def __fetch(self, index) -> bytes:
+        """
+        This method fetches block index and the read-ahead window behind it with one ranged GET
+        :return: Bytes of block index
+        """
+        if index == self.__next_sequential_block:
+            self.__read_ahead = min(self.__read_ahead * 2, self.max_read_ahead)
+        else:
+            self.__read_ahead = 1
+
+        last_block = (self.size - 1) // self.block_size
+        count = 1
+        # Window stops at end of object and at the first block which is already cached, and never holds more
+        # blocks than the cache keeps (else requested block would be evicted by its own read-ahead)
+        window = min(self.__read_ahead, self.cache_blocks)
+        while count < window and index + count <= last_block and index + count not in self.__blocks:
+            count += 1
+
+        offset = index * self.block_size
+        data = self.provider.read_range(self.storage_details, self.path, offset,
+                                        min(count * self.block_size, self.size - offset))
+        self.stats["requests"] += 1
+        self.stats["bytes_fetched"] += len(data)
+        for number in range(count):
+            self.__store(index + number, data[number * self.block_size:(number + 1) * self.block_size])
+        self.__next_sequential_block = index + count
+        return data[:self.block_size]
+
+    def __store(self, index, block):
+        self.__blocks[index] = block
+        self.__blocks.move_to_end(index)
+        while len(self.__blocks) > self.cache_blocks:
+            self.__blocks.popitem(last=False)
+
+    def __block(self, index) -> bytes:
+        block = self.__blocks.get(index)
+        if block is None:
+            self.stats["block_misses"] += 1
+            block = self.__fetch(index)
+        else:
+            self.stats["block_hits"] += 1
+            self.__blocks.move_to_end(index)
+        return block
+
+    def readinto(self, buffer) -> int:
+        if self.closed:
+            raise ValueError("I/O operation on closed file")
+        view = memoryview(buffer).cast("B")
+        with self.__lock:
+            end = min(self.__position + len(view), self.size)
+            filled = 0
+            while self.__position < end:
+                index, block_offset = divmod(self.__position, self.block_size)
+                block = self.__block(index)
+                size = min(len(block) - block_offset, end - self.__position)
+                if size <= 0:
+                    break
+                view[filled:filled + size] = block[block_offset:block_offset + size]
+                filled += size
+                self.__position += size
+            return filled
+
+    def readall(self) -> bytes:
+        return self.read(max(self.size - self.__position, 0))
+
+    def close(self):
+        if not self.closed:
+            logging.debug(f"Closed {self.name} : {self.stats}")
+            self.__blocks.clear()
+        super().close()
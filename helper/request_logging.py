@@ -0,0 +1,178 @@
+#!/usr/bin/python3
+# coding= utf-8
+"""
+This is a helper script to provide cheap structured per request logging (sampling, redaction, timings) for HTTP helpers
+"""
+import logging
+import random
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+redacted = "***"
+
+
+class RequestTimer(object):
+    """
+        This class measures one request and carries whether request is sampled for logging
+        With trace set it is also the httpx trace extension of the request and keeps time of connection events
+        (connect includes DNS resolution, httpcore reports no separate DNS event)
+    """
+
+    def __init__(self, sampled=True, trace=False):
+        self.sampled = sampled
+        self.trace = trace
+        self.start = time.monotonic()
+        self.events = dict()
+
+    def __call__(self, event_name, info):
+        # http11.send_request_headers.started -> send_request_headers.started
+        self.events[event_name.split(".", 1)[-1]] = time.monotonic()
+
+    async def async_trace(self, event_name, info):
+        self(event_name, info)
+
+    def extensions(self, asynchronous=False):
+        """
+        This method returns extensions argument of httpx request (None when timings are not collected)
+        """
+        if not self.trace:
+            return None
+        return {"trace": self.async_trace if asynchronous else self}
+
+    def span(self, start_event, end_event):
+        if start_event in self.events and end_event in self.events:
+            return round((self.events[end_event] - self.events[start_event]) * 1000, 3)
+        return None
+
+    def timings(self) -> dict:
+        """
+        This method returns timings in milliseconds, connect / tls are absent when connection was reused
+        """
+        timings = {"connect_ms": self.span("connect_tcp.started", "connect_tcp.complete"),
+                   "tls_ms": self.span("start_tls.started", "start_tls.complete"),
+                   "ttfb_ms": self.span("send_request_headers.started", "receive_response_headers.complete")}
+        return {key: value for key, value in timings.items() if value is not None}
+
+
+class RequestLogger(object):
+    """
+        This class writes one record per request instead of a line per argument
+        Record is built only when logger is enabled for level and request is sampled (failed requests are never
+        sampled out and are logged at WARNING at least), headers and body are logged only when asked and secrets
+        (auth headers, cookies, tokens and signatures of query string) are redacted
+        Record is logfmt message (method=GET url=... status=200 total_ms=12.5, values with spaces, quotes or = are
+        quoted) with fields also in extra "http_request" for structured handlers
+    """
+    sample_rate = 1.0
+    max_body_size = 1024
+    redact_headers = frozenset({"authorization", "proxy-authorization", "cookie", "set-cookie", "x-api-key",
+                                "x-amz-security-token", "x-goog-api-key", "x-ms-encryption-key"})
+    redact_params = frozenset({"token", "access_token", "refresh_token", "id_token", "key", "api_key", "apikey",
+                               "password", "secret", "client_secret", "code", "sig", "signature",
+                               "x-amz-signature", "x-amz-security-token", "x-amz-credential", "x-goog-signature",
+                               "x-goog-credential"})
+
+    def __init__(self, **kwargs):
+        self.logger = logging.getLogger()
+        self.level = logging.INFO
+        # Fraction of successful requests which are logged (1.0 : every request)
+        self.sample_rate = RequestLogger.sample_rate
+        self.log_headers = False
+        self.log_body = False
+        self.max_body_size = RequestLogger.max_body_size
+        # Collect connect / TLS / TTFB timings (httpx trace extension) of sampled requests
+        self.timings = False
+        self.__dict__.update(kwargs)
+
+        logging.debug(f"Instance variables for RequestLogger : {self.__dict__}")
+
+    def timer(self, level=None) -> RequestTimer:
+        """
+        This method starts timer of a request, sampling is decided here so unsampled requests cost no tracing
+        """
+        sampled = self.logger.isEnabledFor(level or self.level) and self.sampled()
+        return RequestTimer(sampled=sampled, trace=sampled and self.timings)
+
+    def sampled(self) -> bool:
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    @staticmethod
+    def redact_url(url) -> str:
+        url = str(url)
+        parts = urlsplit(url)
+        if not parts.query and "@" not in parts.netloc:
+            return url
+        query = urlencode([(key, redacted if key.lower() in RequestLogger.redact_params else value)
+                           for key, value in parse_qsl(parts.query, keep_blank_values=True)], safe="*")
+        netloc = parts.netloc.rsplit("@", 1)[-1]
+        return urlunsplit((parts.scheme, netloc, parts.path, query, parts.fragment))
+
+    @staticmethod
+    def redact_header_values(headers) -> dict:
+        return {key: redacted if key.lower() in RequestLogger.redact_headers else value
+                for key, value in (headers or {}).items()}
+
+    def body(self, data):
+        if data is None or not isinstance(data, (str, bytes, bytearray)):
+            return None if data is None else type(data).__name__
+        if len(data) > self.max_body_size:
+            return f"{data[:self.max_body_size]!r}... ({len(data)} bytes)"
+        return repr(data)
+
+    @staticmethod
+    def logfmt_value(value) -> str:
+        value = str(value)
+        if value and not any(character in value for character in ' ="\\\n\r\t'):
+            return value
+        return '"' + value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n").replace("\r", "\\r") \
+            .replace("\t", "\\t") + '"'
+
+    def fields(self, method, url, response, timer, headers=None, data=None) -> dict:
+        fields = {"method": method, "url": RequestLogger.redact_url(url),
+                  "status": getattr(response, "status_code", None),
+                  "total_ms": round((time.monotonic() - timer.start) * 1000, 3)}
+        if response is not None:
+            response_headers = getattr(response, "headers", None) or {}
+            fields["request_id"] = response_headers.get("X-Request-Id")
+            fields["bytes"] = response_headers.get("Content-Length")
+            # Time till headers were parsed (requests) or till response was read (httpx)
+            elapsed = getattr(response, "elapsed", None)
+            if elapsed is not None:
+                fields["elapsed_ms"] = round(elapsed.total_seconds() * 1000, 3)
+        if timer.trace:
+            fields.update(timer.timings())
+        if self.log_headers:
+            request = getattr(response, "request", None)
+            fields["request_headers"] = RequestLogger.redact_header_values(
+                getattr(request, "headers", None) or headers)
+            if response is not None:
+                fields["response_headers"] = RequestLogger.redact_header_values(response.headers)
+        if self.log_body:
+            fields["body"] = self.body(data)
+        return {key: value for key, value in fields.items() if value is not None}
+
+    def log(self, method, url, response, timer, level=None, headers=None, data=None):
+        """
+        This method writes record of a request
+        :param method: HTTP method
+        :param url: URL of request
+        :param response: Response, None when no response was received
+        :param timer: RequestTimer started before request was sent
+        :param level: Level of record (default : level of logger), failed requests are logged at WARNING at least
+        :param headers: Headers of request (logged when response does not carry the sent headers)
+        :param data: Body of request (logged only when log_body is set)
+        """
+        level = level or self.level
+        failed = response is None or getattr(response, "status_code", 0) >= 400
+        if failed:
+            level = max(level, logging.WARNING)
+        if not (timer.sampled or failed) or not self.logger.isEnabledFor(level):
+            return
+        fields = self.fields(method, url, response, timer, headers, data)
+        self.logger.log(level, "HTTP request %s",
+                        " ".join(f"{key}={RequestLogger.logfmt_value(value)}" for key, value in fields.items()),
+                        extra={"http_request": fields})
+
+
+# Logger used by HTTP helpers which are not given one of their own
+default_request_logger = RequestLogger()
@@ -0,0 +1,199 @@
+#!/usr/bin/python3
+# coding= utf-8
+"""
+This is a helper script to provide retry policy (backoff, Retry-After, retry budget) for HTTP helpers
+"""
+import asyncio
+import logging
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+
+class RetryBudget(object):
+    """
+        This class keeps a token bucket of retries per host, shared by every policy using it
+        Every retry takes a token, tokens refill at refill_rate per second up to capacity, so during an outage
+        retries of the whole process towards a host are capped instead of multiplying the load
+    """
+    capacity = 20
+    refill_rate = 1.0
+
+    def __init__(self, capacity=None, refill_rate=None):
+        self.capacity = capacity or RetryBudget.capacity
+        self.refill_rate = refill_rate or RetryBudget.refill_rate
+        self.__buckets = dict()
+        self.__lock = threading.Lock()
+
+    def acquire(self, host) -> bool:
+        """
+        This method takes a retry token of host
+        :return: False when budget of host is exhausted
+        """
+        now = time.monotonic()
+        with self.__lock:
+            tokens, updated_at = self.__buckets.get(host, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - updated_at) * self.refill_rate)
+            if tokens < 1:
+                self.__buckets[host] = (tokens, now)
+                return False
+            self.__buckets[host] = (tokens - 1, now)
+            return True
+
+
+# Budget shared by policies which are not given one of their own
+default_retry_budget = RetryBudget()
+
+
+class RetryPolicy(object):
+    """
+        This class decides whether and when a HTTP call is retried
+        Delay is exponential backoff with full jitter (uniform between 0 and min(max_delay, base_delay * 2^attempt)),
+        Retry-After of 429/503 responses takes precedence (capped at max_retry_after)
+        Idempotent methods are retried on connection errors and retry_statuses, non idempotent methods (POST, PATCH)
+        only when server refused the request (429/503) unless retry_non_idempotent is set
+    """
+    max_attempts = 5
+    base_delay = 0.5
+    max_delay = 30
+    max_retry_after = 120
+    retry_statuses = frozenset({408, 425, 429, 500, 502, 503, 504})
+    refused_statuses = frozenset({429, 503})
+    idempotent_methods = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE", "TRACE"})
+
+    def __init__(self, **kwargs):
+        self.max_attempts = RetryPolicy.max_attempts
+        self.base_delay = RetryPolicy.base_delay
+        self.max_delay = RetryPolicy.max_delay
+        self.max_retry_after = RetryPolicy.max_retry_after
+        self.retry_statuses = RetryPolicy.retry_statuses
+        self.retry_non_idempotent = False
+        self.budget = default_retry_budget
+        self.__dict__.update(kwargs)
+
+        logging.debug(f"Instance variables for RetryPolicy : {self.__dict__}")
+
+    def backoff(self, attempt) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    @staticmethod
+    def retry_after(response):
+        """
+        This method returns seconds asked by Retry-After header (delay seconds or HTTP date), None if absent
+        """
+        headers = getattr(response, "headers", None) or {}
+        value = headers.get("Retry-After")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            return None
+
+    def should_retry(self, method, response) -> bool:
+        """
+        This method checks whether call of method which ended with response (None on connection error) is retried
+        """
+        idempotent = method.upper() in RetryPolicy.idempotent_methods or self.retry_non_idempotent
+        if response is None:
+            return idempotent
+        status = getattr(response, "status_code", None)
+        if status is None:
+            # Results which are not responses (streams handed over to caller) are final
+            return False
+        if status not in self.retry_statuses:
+            return False
+        return idempotent or status in RetryPolicy.refused_statuses
+
+    def delay(self, attempt, response) -> float:
+        if getattr(response, "status_code", None) in RetryPolicy.refused_statuses:
+            retry_after = RetryPolicy.retry_after(response)
+            if retry_after is not None:
+                return min(retry_after, self.max_retry_after)
+        return self.backoff(attempt)
+
+    def next_delay(self, method, url, attempt, response):
+        """
+        This method returns delay before next attempt, None when call is not to be retried
+        """
+        if attempt + 1 >= self.max_attempts or not self.should_retry(method, response):
+            return None
+        host = urlsplit(url).netloc
+        if self.budget and not self.budget.acquire(host):
+            logging.warning(f"Retry budget of {host} exhausted, not retrying {method} {url}")
+            return None
+        delay = self.delay(attempt, response)
+        logging.info(f"Retrying {method} {url} in {delay:.2f} seconds (attempt {attempt + 2} of {self.max_attempts}, "
+                     f"last response {getattr(response, 'status_code', response)})")
+        return delay
+
+    @staticmethod
+    def discard(response):
+        """
+        This method closes response which is retried, so that its connection goes back to the pool
+        (streamed responses keep it till body is read or closed)
+        """
+        close = getattr(response, "close", None)
+        if callable(close):
+            close()
+
+    @staticmethod
+    async def discard_async(response):
+        aclose = getattr(response, "aclose", None)
+        if callable(aclose):
+            await aclose()
+        else:
+            RetryPolicy.discard(response)
+
+    def call(self, method, url, send, retry_exceptions=()):
+        """
+        This method calls send till it succeeds or policy gives up
+        :param method: HTTP method
+        :param url: URL of the call (host keys the retry budget)
+        :param send: Callable returning response (None on connection error)
+        :param retry_exceptions: Exceptions of send which count as connection error (no response) of the attempt,
+                                 last one is raised when policy gives up
+        :return: Last response
+        """
+        attempt = 0
+        while True:
+            error = None
+            try:
+                response = send()
+            except retry_exceptions as raised:
+                response, error = None, raised
+            delay = self.next_delay(method, url, attempt, response)
+            if delay is None:
+                if error is not None:
+                    raise error
+                return response
+            RetryPolicy.discard(response)
+            time.sleep(delay)
+            attempt += 1
+
+    async def call_async(self, method, url, send, retry_exceptions=()):
+        """
+        This method is call for coroutine function send
+        """
+        attempt = 0
+        while True:
+            error = None
+            try:
+                response = await send()
+            except retry_exceptions as raised:
+                response, error = None, raised
+            delay = self.next_delay(method, url, attempt, response)
+            if delay is None:
+                if error is not None:
+                    raise error
+                return response
+            await RetryPolicy.discard_async(response)
+            await asyncio.sleep(delay)
+            attempt += 1
@@ -3,32 +3,60 @@
 """
 This scripts provides wrapper over storage providers in alpha_library
 """
+import io
 import json
 import logging
+import traceback
 
 from Crypto.Cipher import AES
 
 try:
+    from alpha_library.boto3_helper.client_cache import cache_key
     from alpha_library.boto3_helper.s3 import DisplayS3Object, CopyObjectFromLocalToS3, CopyObjectFromURLtoS3, \
-        CopyObjectFromS3ToLocal, DeleteS3Object, S3ObjectList, CopyObjectFromS3ToS3, \
-        CopyObjectFromS3ToGS, CopyObjectFromS3ToAzure, CopyObjectFromLocalToS3FS
+        CopyObjectFromS3ToLocal, DeleteS3Object, S3ObjectList, CopyObjectFromLocalToS3FS
     from alpha_library.gcp_helper.storage import CopyObjectFromLocalToGS, CopyObjectFromURLtoGS, \
-        CopyObjectFromGSToLocal, GSDeleteObject, GSObjectList, DisplayGSObject, \
-        CopyObjectFromGSToGS, CopyObjectFromGSToS3, CopyObjectFromGSToAzure, CopyObjectFromLocalToGCSFS
+        CopyObjectFromGSToLocal, GSDeleteObject, GSObjectList, DisplayGSObject, CopyObjectFromLocalToGCSFS
     from alpha_library.azure_helper.blob import CopyObjectFromLocalToAzure, CopyObjectFromURLtoAzure, \
         CopyObjectFromAzureToLocal, AzureDeleteObject, AzureObjectList, DisplayAzureObject, \
-        CopyObjectFromAzureToAzure, CopyObjectFromAzureToS3, CopyObjectFromAzureToGS, CopyObjectFromLocalToAzureCFS
+        CopyObjectFromLocalToAzureCFS
+    from alpha_library.helper.transfer_engine import TransferEngine, get_provider, providers
+    from alpha_library.helper.transfer_job import TransferJob
+    from alpha_library.helper.storage_sync import StorageSync
+    from alpha_library.helper.object_cache import ObjectContentCache
+    from alpha_library.helper.remote_file import RemoteFile
+    from alpha_library.helper.stream_encryption import StreamCipher
+    from alpha_library.helper.transfer_pipe import TransferPipe
 except ModuleNotFoundError:
     logging.info("Module called internally")
+    from boto3_helper.client_cache import cache_key
     from boto3_helper.s3 import DisplayS3Object, CopyObjectFromLocalToS3, CopyObjectFromURLtoS3, \
-        CopyObjectFromS3ToLocal, DeleteS3Object, S3ObjectList, CopyObjectFromS3ToS3, \
-        CopyObjectFromS3ToGS, CopyObjectFromS3ToAzure, CopyObjectFromLocalToS3FS
+        CopyObjectFromS3ToLocal, DeleteS3Object, S3ObjectList, CopyObjectFromLocalToS3FS
     from gcp_helper.storage import CopyObjectFromLocalToGS, CopyObjectFromURLtoGS, \
-        CopyObjectFromGSToLocal, GSDeleteObject, GSObjectList, DisplayGSObject, \
-        CopyObjectFromGSToGS, CopyObjectFromGSToS3, CopyObjectFromGSToAzure, CopyObjectFromLocalToGCSFS
+        CopyObjectFromGSToLocal, GSDeleteObject, GSObjectList, DisplayGSObject, CopyObjectFromLocalToGCSFS
     from azure_helper.blob import CopyObjectFromLocalToAzure, CopyObjectFromURLtoAzure, \
         CopyObjectFromAzureToLocal, AzureDeleteObject, AzureObjectList, DisplayAzureObject, \
-        CopyObjectFromAzureToAzure, CopyObjectFromAzureToS3, CopyObjectFromAzureToGS, CopyObjectFromLocalToAzureCFS
+        CopyObjectFromLocalToAzureCFS
+    from helper.transfer_engine import TransferEngine, get_provider, providers
+    from helper.transfer_job import TransferJob
+    from helper.storage_sync import StorageSync
+    from helper.object_cache import ObjectContentCache
+    from helper.remote_file import RemoteFile
+    from helper.stream_encryption import StreamCipher
+    from helper.transfer_pipe import TransferPipe
+
+
+def open_remote(storage_type, storage_details, path, **kwargs) -> RemoteFile:
+    """
+    This method opens object as seekable read only file (io.RawIOBase) backed by ranged GETs and a block cache
+    e.g. zipfile.ZipFile(open_remote("s3", {"bucket_name": "bucket"}, "archive.zip", cred_details=aws_details))
+    :param storage_type: s3 / gs / azure (or any registered provider)
+    :param storage_details: Storage details of the provider (bucket_name / container_name)
+    :param path: Path of the object
+    :param kwargs: cred_details, endpoint_url, account_url, block_size, cache_blocks, max_read_ahead, size
+    """
+    provider = get_provider(storage_type, cred_details=kwargs.get("cred_details"),
+                            endpoint_url=kwargs.get("endpoint_url"), account_url=kwargs.get("account_url"))
+    return RemoteFile(provider, storage_details, path, **kwargs)
 
 
 # Display
@@ -41,9 +69,13 @@ class DisplayStorageObject(object):
         self.azure_details = None
         self.aws_details = None
         self.sa_json_data = None
+        # Optional ObjectContentCache shared between instances, content is then revalidated by ETag
+        self.cache = kwargs.pop("cache", None)
         self.init_kwargs = kwargs
         self.encryption_keys = kwargs.get("encryption_keys", {})
-        if self.encryption_keys:
+        # encryption_keys of mode gcm use streaming chunked AES-GCM, other encryption_keys the legacy AES layout
+        self.cipher = StreamCipher.from_keys(self.encryption_keys)
+        if self.encryption_keys and not self.cipher:
             key = self.encryption_keys['key']
             iv = self.encryption_keys['initialisation_vector']
             self.block_size = int(self.encryption_keys['block_size'])
@@ -57,13 +89,48 @@ class DisplayStorageObject(object):
             self.azure_details = kwargs.get("cred_details")
 
     def decrypt_data(self, data):
+        if self.cipher:
+            return self.cipher.decrypt(data)
         de_data = self.decryptor.decrypt(data)
         de_data = de_data[0:len(de_data) // self.block_size].decode()
         return de_data
 
+    def cached_content(self, **kwargs) -> bytes:
+        """
+        This method serves object content through cache, only changed objects are downloaded again
+        """
+        storage_details = kwargs.get("storage_details") or {}
+        # Hash of credentials keeps entries of different accounts (and permissions) apart
+        key = ObjectContentCache.cache_key(self.typ, cache_key(self.aws_details, self.sa_json_data, self.azure_details),
+                                           kwargs.get("endpoint_url") or self.account_url or "",
+                                           storage_details.get("bucket_name", storage_details.get("container_name")),
+                                           kwargs["object_path"])
+
+        def fetch(etag):
+            params = {**kwargs, "etag": etag, "throw_exception": True}
+            if self.typ == "s3":
+                return DisplayS3Object(aws_details=self.aws_details, **self.init_kwargs).object_content_if_changed(
+                    s3_details=storage_details, **params)
+            elif self.typ == "gs":
+                return DisplayGSObject(sa_json_data=self.sa_json_data, **self.init_kwargs).object_content_if_changed(
+                    gs_details=storage_details, **params)
+            return DisplayAzureObject(account_url=self.account_url, azure_details=self.azure_details,
+                                      **self.init_kwargs).object_content_if_changed(
+                container_details=storage_details, **params)
+
+        try:
+            return self.cache.get(key, fetch)
+        except BaseException as error:
+            logging.error(f"Uncaught exception in storage_helper.py : {traceback.format_exc()}")
+            if kwargs.get("throw_exception"):
+                raise error
+
     def object_content(self, **kwargs):
 
-        if self.typ == "s3":
+        if self.cache and self.typ in ("s3", "gs", "azure"):
+            data = self.cached_content(**kwargs)
+
+        elif self.typ == "s3":
             data = DisplayS3Object(aws_details=self.aws_details, **self.init_kwargs).object_content(
                 s3_details=kwargs.get("storage_details"), **kwargs)
 
@@ -86,7 +153,16 @@ class DisplayStorageObject(object):
 
     def object_content_str(self, **kwargs):
 
-        if self.typ == "s3":
+        if self.cipher:
+            # Ciphertext is binary, it is decrypted first and decoded afterwards
+            data = self.object_content(**kwargs)
+            return data.decode(kwargs.get("encoding", "utf-8")) if data is not None else None
+
+        if self.cache and self.typ in ("s3", "gs", "azure"):
+            data = self.cached_content(**kwargs)
+            data = data.decode(kwargs.get("encoding", "utf-8")) if data is not None else None
+
+        elif self.typ == "s3":
             data = DisplayS3Object(aws_details=self.aws_details, **self.init_kwargs).object_content_str(
                 s3_details=kwargs.get("storage_details"), **kwargs)
 
@@ -107,6 +183,60 @@ class DisplayStorageObject(object):
 
         return data
 
+    def read_range(self, **kwargs) -> bytes:
+        """
+        This method reads length bytes at offset of object_path without downloading whole object
+        Negative offset reads last -offset bytes (e.g. offset=-65536 for a parquet footer) and takes no length
+        Objects encrypted with mode gcm are decrypted reading only the chunks covering the range
+        """
+        if self.cipher and self.typ in providers:
+            provider = get_provider(self.typ, cred_details=self.init_kwargs.get("cred_details"),
+                                    endpoint_url=kwargs.get("endpoint_url"), account_url=self.account_url)
+            storage_details, path = kwargs.get("storage_details"), kwargs["object_path"]
+            try:
+                return self.cipher.decrypt_range(
+                    lambda offset, length: provider.read_range(storage_details, path, offset, length),
+                    kwargs["offset"], kwargs.get("length"), provider.stat(storage_details, path)["Size"])
+            except BaseException as error:
+                logging.error(f"Uncaught exception in storage_helper.py : {traceback.format_exc()}")
+                if kwargs.get("throw_exception"):
+                    raise error
+                return None
+
+        if self.typ == "s3":
+            return DisplayS3Object(aws_details=self.aws_details, **self.init_kwargs).read_range(
+                s3_details=kwargs.get("storage_details"), **kwargs)
+        elif self.typ == "gs":
+            return DisplayGSObject(sa_json_data=self.sa_json_data, **self.init_kwargs).read_range(
+                gs_details=kwargs.get("storage_details"), **kwargs)
+        elif self.typ == "azure":
+            return DisplayAzureObject(account_url=self.account_url, azure_details=self.azure_details,
+                                      **self.init_kwargs).read_range(
+                container_details=kwargs.get("storage_details"), **kwargs)
+        logging.info("Unsupported Cloud storage provider")
+        return None
+
+    def read_ranges(self, **kwargs) -> list:
+        """
+        This method reads ranges [(offset, length), ...] of object_path, nearby ranges are coalesced into one request
+        and requests are fetched concurrently (max_gap, max_request_size, max_workers)
+        """
+        if self.cipher:
+            return [self.read_range(offset=offset, length=length, **kwargs) for offset, length in kwargs["ranges"]]
+
+        if self.typ == "s3":
+            return DisplayS3Object(aws_details=self.aws_details, **self.init_kwargs).read_ranges(
+                s3_details=kwargs.get("storage_details"), **kwargs)
+        elif self.typ == "gs":
+            return DisplayGSObject(sa_json_data=self.sa_json_data, **self.init_kwargs).read_ranges(
+                gs_details=kwargs.get("storage_details"), **kwargs)
+        elif self.typ == "azure":
+            return DisplayAzureObject(account_url=self.account_url, azure_details=self.azure_details,
+                                      **self.init_kwargs).read_ranges(
+                container_details=kwargs.get("storage_details"), **kwargs)
+        logging.info("Unsupported Cloud storage provider")
+        return None
+
 
 # Access Storage
 class StorageObjectList(object):
@@ -127,7 +257,24 @@ class StorageObjectList(object):
         elif self.typ == "azure":
             self.azure_details = kwargs.get("cred_details")
 
+    def refresh_listing_index(self, **kwargs):
+        """
+        This method refreshes listing_index (helper.listing_index.ListingIndex) for folder_to_check
+        """
+        if kwargs.get("refresh_index", True):
+            kwargs["listing_index"].refresh(self.typ, kwargs.get("cred_details", self.init_kwargs.get("cred_details")),
+                                            kwargs.get("storage_details"), kwargs.get("folder_to_check", ""),
+                                            mode=kwargs.get("index_refresh_mode", "incremental"),
+                                            endpoint_url=kwargs.get("endpoint_url"))
+
     def check_contents_of_storage(self, **kwargs):
+        if kwargs.get("listing_index") and self.typ in ("s3", "gs"):
+            # Answered from local listing index
+            self.refresh_listing_index(**kwargs)
+            return {item["Key"]: item for item in kwargs["listing_index"].list_objects(
+                self.typ, kwargs.get("storage_details")["bucket_name"], kwargs.get("folder_to_check", ""),
+                extensions=kwargs.get("extensions"), last_modified=kwargs.get("last_modified"))}
+
         if self.typ == "s3":
             return S3ObjectList(aws_details=self.aws_details, **self.init_kwargs).check_contents_of_storage(
                 s3_details=kwargs.get("storage_details"), **kwargs)
@@ -141,7 +288,42 @@ class StorageObjectList(object):
             logging.info("Unsupported Cloud storage provider")
             return None
 
+    def iter_contents_of_storage(self, **kwargs):
+        """
+        Generator over the objects of storage, s3 prefixes can be listed in parallel shards with parallel_listing
+        """
+        if self.typ == "s3":
+            object_list = S3ObjectList(aws_details=self.aws_details, **self.init_kwargs)
+            if kwargs.get("parallel_listing"):
+                return object_list.iter_objects_parallel(s3_details=kwargs.get("storage_details"), **kwargs)
+            return object_list.iter_objects(s3_details=kwargs.get("storage_details"), **kwargs)
+        elif self.typ == "gs":
+            return GSObjectList(sa_json_data=self.sa_json_data, **self.init_kwargs).iter_objects(
+                gs_details=kwargs.get("storage_details"), **kwargs)
+        elif self.typ == "azure":
+            logging.info("Implementation Missing at moment !")
+            return None
+        else:
+            logging.info("Unsupported Cloud storage provider")
+            return None
+
+    def get_latest_file_from_index(self, **kwargs):
+        """
+        This method returns latest modified object (s3 like item) of folder_to_check using listing_index
+        """
+        self.refresh_listing_index(**kwargs)
+        return kwargs["listing_index"].latest_file(self.typ, kwargs.get("storage_details")["bucket_name"],
+                                                   kwargs.get("folder_to_check", ""),
+                                                   extensions=kwargs.get("extensions"))
+
     def check_existence_of_file_in_storage(self, **kwargs):
+        if kwargs.get("listing_index") and self.typ in ("s3", "gs"):
+            # Answered from local listing index, keys created after last refresh need refresh_index
+            if kwargs.get("refresh_index"):
+                self.refresh_listing_index(**kwargs)
+            return kwargs["listing_index"].exists(self.typ, kwargs.get("storage_details")["bucket_name"],
+                                                  kwargs["key"]) is not None
+
         if self.typ == "s3":
             return S3ObjectList(aws_details=self.aws_details, **self.init_kwargs).check_file_existence(
                 s3_details=kwargs.get("storage_details"), **kwargs)
@@ -155,6 +337,20 @@ class StorageObjectList(object):
             logging.info("Unsupported Cloud storage provider")
             return None
 
+    def check_existence_of_files_in_storage(self, **kwargs):
+        if self.typ == "s3":
+            return S3ObjectList(aws_details=self.aws_details, **self.init_kwargs).check_files_existence(
+                s3_details=kwargs.get("storage_details"), **kwargs)
+        elif self.typ == "gs":
+            return GSObjectList(sa_json_data=self.sa_json_data, **self.init_kwargs).check_files_existence(
+                gs_details=kwargs.get("storage_details"), **kwargs)
+        elif self.typ == "azure":
+            logging.info("Implementation Missing at moment !")
+            return None
+        else:
+            logging.info("Unsupported Cloud storage provider")
+            return None
+
 
 # Copy
 class CopyObjectFromLocalToStorage(object):
@@ -168,7 +364,8 @@ class CopyObjectFromLocalToStorage(object):
         self.destination_sa_json_data = None
         self.init_kwargs = kwargs
         self.encryption_keys = kwargs.get("encryption_keys", {})
-        if self.encryption_keys:
+        self.cipher = StreamCipher.from_keys(self.encryption_keys)
+        if self.encryption_keys and not self.cipher:
             key = self.encryption_keys['key']
             iv = self.encryption_keys['initialisation_vector']
             self.block_size = int(self.encryption_keys['block_size'])
@@ -182,10 +379,54 @@ class CopyObjectFromLocalToStorage(object):
             self.destination_azure_details = kwargs.get("destination_cred_details")
 
     def encrypt_data(self, data):
+        if self.cipher:
+            return self.cipher.encrypt(data)
         enc_data = self.encryptor.encrypt(data * self.block_size)
         return enc_data
 
+    def upload_encrypted_content(self, **kwargs):
+        """
+        This method uploads local file (source_file_path) or file object (file_object) encrypting it with mode gcm
+        while streaming, so memory stays constant whatever the size of file
+        """
+        f_source = open(kwargs["source_file_path"], "rb") if kwargs.get("source_file_path") else kwargs["file_object"]
+        # Encrypting reader returns at most one chunk per read, uploads expect reads filled to the asked size
+        f_read = io.BufferedReader(self.cipher.encrypting_reader(f_source))
+        upload_kwargs = {key: value for key, value in kwargs.items()
+                         if key not in ("source_file_path", "file_object", "data")}
+        try:
+            if self.typ == "s3":
+                return CopyObjectFromLocalToS3(destination_aws_details=self.destination_aws_details,
+                                               **self.init_kwargs). \
+                    copy_to_destination_storage(destination_s3_details=kwargs.get("destination_storage_details"),
+                                                file_object=f_read, **upload_kwargs)
+
+            provider = get_provider(self.typ, cred_details=self.init_kwargs.get("destination_cred_details"),
+                                    endpoint_url=kwargs.get("destination_endpoint_url"),
+                                    account_url=self.init_kwargs.get("destination_account_url",
+                                                                     self.init_kwargs.get("account_url")))
+            with provider.open_writer(kwargs.get("destination_storage_details"), kwargs["object_destination_path"],
+                                      **upload_kwargs) as f_write:
+                size = TransferPipe.stream(f_read, f_write, **upload_kwargs)
+            return {"destination": provider.address(kwargs.get("destination_storage_details"),
+                                                    kwargs["object_destination_path"]), "size": size}
+        except BaseException as error:
+            logging.error(f"Uncaught exception in storage_helper.py : {traceback.format_exc()}")
+            if kwargs.get("throw_exception"):
+                raise error
+        finally:
+            if kwargs.get("source_file_path"):
+                f_source.close()
+
     def copy_to_destination_storage(self, **kwargs):
+        if self.encryption_keys and (kwargs.get("source_file_path") or kwargs.get("file_object")):
+            if not self.cipher:
+                raise ValueError("Local file or file object can be encrypted only with mode gcm encryption keys")
+            if self.typ not in providers:
+                logging.info("Unsupported Cloud storage provider")
+                return None
+            return self.upload_encrypted_content(**kwargs)
+
         if self.encryption_keys:
             kwargs["data"] = self.encrypt_data(kwargs.get("data", json.dumps({})))
 
@@ -238,6 +479,7 @@ class CopyObjectFromStorageToLocal(object):
         self.aws_details = None
         self.sa_json_data = None
         self.init_kwargs = kwargs
+        self.cipher = StreamCipher.from_keys(kwargs.get("encryption_keys"))
 
         if self.typ == "s3":
             self.aws_details = kwargs.get("cred_details")
@@ -246,7 +488,25 @@ class CopyObjectFromStorageToLocal(object):
         elif self.typ == "azure":
             self.azure_details = kwargs.get("cred_details")
 
+    def download_decrypted_content(self, **kwargs):
+        """
+        This method streams object encrypted with mode gcm into local_file_path decrypting it on the way
+        """
+        provider = get_provider(self.typ, cred_details=self.init_kwargs.get("cred_details"),
+                                endpoint_url=kwargs.get("endpoint_url"), account_url=self.account_url)
+        try:
+            with provider.open_reader(kwargs.get("storage_details"), kwargs["object_path"]) as f_read:
+                with open(kwargs["local_file_path"], "wb") as local_file:
+                    return TransferPipe.stream(self.cipher.decrypting_reader(f_read), local_file, **kwargs)
+        except BaseException as error:
+            logging.error(f"Uncaught exception in storage_helper.py : {traceback.format_exc()}")
+            if kwargs.get("throw_exception"):
+                raise error
+
     def download_content(self, **kwargs):
+        if self.cipher and self.typ in providers:
+            return self.download_decrypted_content(**kwargs)
+
         if self.typ == "s3":
             return CopyObjectFromS3ToLocal(aws_details=self.aws_details, **self.init_kwargs).download_content(
                 s3_details=kwargs.get("storage_details"), **kwargs)
@@ -331,74 +591,72 @@ class CopyObjectFromStorageToStorage(object):
             self.destination_azure_details = kwargs.get("destination_cred_details")
 
     def copy_from_source_to_destination_storage(self, **kwargs):
-        # S3 Combinations
-        if self.source_type == "s3" and self.destination_type == "s3":
-            return CopyObjectFromS3ToS3(source_aws_details=self.source_aws_details,
-                                        destination_aws_details=self.destination_aws_details, **self.init_kwargs). \
-                copy_from_source_to_destination_storage(
-                source_s3_details=kwargs.get("source_storage_details"),
-                destination_s3_details=kwargs.get("destination_storage_details"), **kwargs)
-        elif self.source_type == "s3" and self.destination_type == "gs":
-            return CopyObjectFromS3ToGS(source_aws_details=self.source_aws_details,
-                                        destination_sa_json_data=self.destination_sa_json_data, **self.init_kwargs). \
-                copy_from_source_to_destination_storage(
-                source_s3_details=kwargs.get("source_storage_details"),
-                destination_gs_details=kwargs.get("destination_storage_details"), **kwargs)
-        elif self.source_type == "s3" and self.destination_type == "azure":
-            return CopyObjectFromS3ToAzure(source_aws_details=self.source_aws_details,
-                                           destination_azure_details=self.destination_azure_details,
-                                           **self.init_kwargs). \
-                copy_from_source_to_destination_storage(
-                source_s3_details=kwargs.get("source_storage_details"),
-                destination_container_details=kwargs.get("destination_storage_details"), **kwargs)
-
-        # GS Combinations
-        elif self.source_type == "gs" and self.destination_type == "gs":
-            return CopyObjectFromGSToGS(source_sa_json_data=self.source_sa_json_data,
-                                        destination_sa_json_data=self.destination_sa_json_data, **self.init_kwargs). \
-                copy_from_source_to_destination_storage(
-                source_gs_details=kwargs.get("source_storage_details"),
-                destination_gs_details=kwargs.get("destination_storage_details"), **kwargs)
-        elif self.source_type == "gs" and self.destination_type == "s3":
-            return CopyObjectFromGSToS3(source_sa_json_data=self.source_sa_json_data,
-                                        destination_aws_details=self.destination_aws_details, **self.init_kwargs). \
-                copy_from_source_to_destination_storage(
-                source_gs_details=kwargs.get("source_storage_details"),
-                destination_s3_details=kwargs.get("destination_storage_details"), **kwargs)
-        elif self.source_type == "gs" and self.destination_type == "azure":
-            return CopyObjectFromGSToAzure(source_sa_json_data=self.source_sa_json_data,
-                                           destination_azure_details=self.destination_azure_details,
-                                           **self.init_kwargs). \
-                copy_from_source_to_destination_storage(
-                source_gs_details=kwargs.get("source_storage_details"),
-                destination_container_details=kwargs.get("destination_storage_details"), **kwargs)
-
-        # Azure Combinations
-        elif self.source_type == "azure" and self.destination_type == "azure":
-            return CopyObjectFromAzureToAzure(source_azure_details=self.source_azure_details,
-                                              destination_azure_details=self.destination_azure_details,
-                                              **self.init_kwargs). \
-                copy_from_source_to_destination_storage(
-                source_container_details=kwargs.get("source_storage_details"),
-                destination_container_details=kwargs.get("destination_storage_details"), **kwargs)
-        elif self.source_type == "azure" and self.destination_type == "s3":
-            return CopyObjectFromAzureToS3(source_azure_details=self.source_azure_details,
-                                           destination_aws_details=self.destination_aws_details, **self.init_kwargs). \
-                copy_from_source_to_destination_storage(
-                source_container_details=kwargs.get("source_storage_details"),
-                destination_s3_details=kwargs.get("destination_storage_details"), **kwargs)
-        elif self.source_type == "azure" and self.destination_type == "gs":
-            return CopyObjectFromAzureToS3(source_azure_details=self.source_azure_details,
-                                           destination_sa_json_data=self.destination_sa_json_data, **self.init_kwargs). \
-                copy_from_source_to_destination_storage(
-                source_container_details=kwargs.get("source_storage_details"),
-                destination_gs_details=kwargs.get("destination_storage_details"), **kwargs)
-
-        else:
+        """
+        This method copies object between any two providers through TransferEngine,
+        server side copy is used when both sides allow it (s3 -> s3, gs -> gs, azure -> azure)
+        """
+        if self.source_type not in providers or self.destination_type not in providers:
             logging.info(
                 f"Either source_type {self.source_type} or destination_type {self.destination_type} not supported yet")
             return None
 
+        source = get_provider(self.source_type, cred_details=self.init_kwargs.get("source_cred_details"),
+                              endpoint_url=kwargs.get("source_endpoint_url"),
+                              account_url=self.init_kwargs.get("source_account_url",
+                                                               self.init_kwargs.get("account_url")))
+        destination = get_provider(self.destination_type, cred_details=self.init_kwargs.get("destination_cred_details"),
+                                   endpoint_url=kwargs.get("destination_endpoint_url"),
+                                   account_url=self.init_kwargs.get("destination_account_url",
+                                                                    self.init_kwargs.get("account_url")))
+        return TransferEngine().copy(
+            source, kwargs.get("source_storage_details"), kwargs["object_original_path"],
+            destination, kwargs.get("destination_storage_details"), kwargs["object_destination_path"], **kwargs)
+
+    def sync_source_to_destination_storage(self, **kwargs) -> dict:
+        """
+        This method syncs source_prefix into destination_prefix copying only new or changed objects
+        additional arguments : compare (etag|size|last_modified), delete_extras, dry_run, job_kwargs
+        """
+        sync_params = {key: kwargs[key] for key in ("compare", "delete_extras", "dry_run", "job_kwargs")
+                       if kwargs.get(key) is not None}
+        return StorageSync(source_type=self.source_type, destination_type=self.destination_type,
+                           source_cred_details=self.init_kwargs.get("source_cred_details"),
+                           destination_cred_details=self.init_kwargs.get("destination_cred_details"),
+                           source_storage_details=kwargs.get("source_storage_details"),
+                           destination_storage_details=kwargs.get("destination_storage_details"),
+                           source_endpoint_url=kwargs.get("source_endpoint_url"),
+                           destination_endpoint_url=kwargs.get("destination_endpoint_url"),
+                           source_account_url=self.init_kwargs.get("source_account_url",
+                                                                   self.init_kwargs.get("account_url")),
+                           destination_account_url=self.init_kwargs.get("destination_account_url",
+                                                                        self.init_kwargs.get("account_url")),
+                           **sync_params).sync(source_prefix=kwargs.get("source_prefix", ""),
+                                               destination_prefix=kwargs.get("destination_prefix", ""))
+
+    def copy_objects_from_source_to_destination_storage(self, **kwargs) -> dict:
+        """
+        This method copies many objects (manifest_path, prefix or tasks) through TransferJob
+        additional arguments : checkpoint_path, executor (thread|process), max_workers, per_destination_limit,
+        max_retries, copy_kwargs (passed on to TransferEngine.copy)
+        """
+        job_params = {key: kwargs[key] for key in ("checkpoint_path", "executor", "max_workers",
+                                                   "per_destination_limit", "max_retries", "copy_kwargs")
+                      if kwargs.get(key) is not None}
+        return TransferJob(source_type=self.source_type, destination_type=self.destination_type,
+                           source_cred_details=self.init_kwargs.get("source_cred_details"),
+                           destination_cred_details=self.init_kwargs.get("destination_cred_details"),
+                           source_storage_details=kwargs.get("source_storage_details"),
+                           destination_storage_details=kwargs.get("destination_storage_details"),
+                           source_endpoint_url=kwargs.get("source_endpoint_url"),
+                           destination_endpoint_url=kwargs.get("destination_endpoint_url"),
+                           source_account_url=self.init_kwargs.get("source_account_url",
+                                                                   self.init_kwargs.get("account_url")),
+                           destination_account_url=self.init_kwargs.get("destination_account_url",
+                                                                        self.init_kwargs.get("account_url")),
+                           **job_params).run(manifest_path=kwargs.get("manifest_path"), prefix=kwargs.get("prefix"),
+                                             destination_prefix=kwargs.get("destination_prefix", ""),
+                                             tasks=kwargs.get("tasks"))
+
 
 # Object FS
 class CopyObjectFromLocalToObjectFS(object):
@@ -471,6 +729,20 @@ class StorageDeleteObject(object):
             logging.info("Unsupported Cloud storage provider")
             return None
 
+    def delete_objects_from_storage(self, **kwargs):
+        if self.typ == "s3":
+            return DeleteS3Object(aws_details=self.aws_details, **self.init_kwargs).delete_objects_from_storage(
+                s3_details=kwargs.get("storage_details"), **kwargs)
+        elif self.typ == "gs":
+            return GSDeleteObject(sa_json_data=self.sa_json_data, **self.init_kwargs).delete_objects_from_storage(
+                gs_details=kwargs.get("storage_details"), **kwargs)
+        elif self.typ == "azure":
+            logging.info("Yet to be implemented !")
+            return None
+        else:
+            logging.info("Unsupported Cloud storage provider")
+            return None
+
 
 if __name__ == "__main__":
     # LOGGING #
@@ -0,0 +1,243 @@
+#!/usr/bin/python3
+# coding=utf-8
+"""
+This scripts provides incremental (rsync like) sync of a prefix between any two storage providers
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from alpha_library.helper.transfer_engine import S3Provider, get_provider
+    from alpha_library.helper.transfer_job import TransferJob
+except ModuleNotFoundError:
+    logging.info("Module called internally")
+    from helper.transfer_engine import S3Provider, get_provider
+    from helper.transfer_job import TransferJob
+
+
+def prefetch(iterable, buffer_size=10000):
+    """
+    Generator which consumes iterable on a background thread, so that two listings proceed in parallel
+    :param iterable: Iterable to consume
+    :param buffer_size: Maximum number of items read ahead
+    """
+    items = queue.Queue(maxsize=buffer_size)
+    end = object()
+    errors = []
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        # Consumer may stop early, producer must not block forever on a full queue then
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def producer():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+        except BaseException as error:
+            errors.append(error)
+        put(end)
+
+    thread = threading.Thread(target=producer, name="storage-sync-listing", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = items.get()
+            if item is end:
+                break
+            yield item
+    finally:
+        stop.set()
+    if errors:
+        raise errors[0]
+
+
+class StorageSync(object):
+    """
+        This class mirrors a prefix of source storage into a prefix of destination storage
+        Both sides are listed in parallel (listings are lexicographically ordered) and merge joined on the path
+        relative to the prefix, only new or changed objects are copied (through TransferJob), unchanged objects
+        are never downloaded
+        compare :
+            etag : size and content md5 (multipart ETags of same part count between s3), falls back to LastModified
+                   when md5 is unknown (s3 md5 changes are confirmed with head of objects, ETag of SSE-KMS / SSE-C
+                   objects is not a md5)
+            size : size only
+            last_modified : size and source newer than destination
+    """
+    compare = "etag"
+    delete_workers = 16
+
+    def __init__(self, **kwargs):
+        # Required variable to drive this Class, expected to be provided from parent Object
+        self.source_type = None
+        self.destination_type = None
+        self.source_cred_details = None
+        self.destination_cred_details = None
+        self.source_storage_details = None
+        self.destination_storage_details = None
+
+        # Optional variables
+        self.source_endpoint_url = None
+        self.destination_endpoint_url = None
+        self.source_account_url = None
+        self.destination_account_url = None
+        self.compare = StorageSync.compare
+        self.delete_extras = False
+        self.dry_run = False
+        # Passed on to TransferJob (checkpoint_path, executor, max_workers, per_destination_limit, copy_kwargs)
+        self.job_kwargs = dict()
+        self.__dict__.update(kwargs)
+
+    @staticmethod
+    def etag_parts(item):
+        """
+        This method returns part count of a multipart ETag ("...-N"), None for other ETags
+        """
+        etag = (item.get("ETag") or "").strip('"')
+        return etag.rsplit("-", 1)[-1] if "-" in etag else None
+
+    def is_changed(self, source_item, destination_item) -> bool:
+        """
+        This method decides whether source item has to be copied over destination item
+        """
+        if source_item["Size"] != destination_item["Size"]:
+            return True
+        if self.compare == "size":
+            return False
+        if self.compare == "etag":
+            if source_item.get("MD5") and destination_item.get("MD5"):
+                return source_item["MD5"] != destination_item["MD5"]
+            source_parts = StorageSync.etag_parts(source_item)
+            if self.source_type == self.destination_type == "s3" and source_parts and \
+                    source_parts == StorageSync.etag_parts(destination_item) and \
+                    not (S3Provider.opaque_etag(source_item) or S3Provider.opaque_etag(destination_item)):
+                # Multipart ETags of s3 are comparable only when both sides were uploaded with same part layout
+                # (same size and part count), other layouts (and ETag of gs and azure, a version tag) fall back
+                # to LastModified
+                return source_item.get("ETag") != destination_item.get("ETag")
+        return bool(source_item.get("LastModified") and destination_item.get("LastModified") and
+                    source_item["LastModified"] > destination_item["LastModified"])
+
+    def is_changed_object(self, source, destination, source_item, destination_item) -> bool:
+        """
+        This method confirms a change of s3 items found by content md5 against head of both objects, listings do not
+        tell encryption and ETag of SSE-KMS / SSE-C objects is not a md5
+        """
+        if self.compare != "etag" or source_item["Size"] != destination_item["Size"] or \
+                not (source_item.get("MD5") and destination_item.get("MD5")) or \
+                not (isinstance(source, S3Provider) or isinstance(destination, S3Provider)):
+            return True
+        source_object = source.stat(self.source_storage_details, source_item["Key"])
+        destination_object = destination.stat(self.destination_storage_details, destination_item["Key"])
+        if not (source_object and destination_object):
+            return True
+        return self.is_changed(source_object, destination_object)
+
+    def diff(self, source_prefix, destination_prefix, report, extras):
+        """
+        Generator of copy tasks out of merge join of both listings, extra destination paths are put in extras
+        """
+        source = get_provider(self.source_type, cred_details=self.source_cred_details,
+                              endpoint_url=self.source_endpoint_url, account_url=self.source_account_url)
+        destination = get_provider(self.destination_type, cred_details=self.destination_cred_details,
+                                   endpoint_url=self.destination_endpoint_url, account_url=self.destination_account_url)
+        source_items = prefetch(source.list(self.source_storage_details, source_prefix))
+        destination_items = prefetch(destination.list(self.destination_storage_details, destination_prefix))
+
+        source_item = next(source_items, None)
+        destination_item = next(destination_items, None)
+        while source_item or destination_item:
+            source_path = source_item["Key"][len(source_prefix):] if source_item else None
+            destination_path = destination_item["Key"][len(destination_prefix):] if destination_item else None
+
+            if destination_item is None or (source_item and source_path < destination_path):
+                report["new"] += 1
+                report["listed_source"] += 1
+                yield {"source_path": source_item["Key"], "destination_path": destination_prefix + source_path}
+                source_item = next(source_items, None)
+            elif source_item is None or destination_path < source_path:
+                report["extra"] += 1
+                report["listed_destination"] += 1
+                extras.append(destination_item["Key"])
+                destination_item = next(destination_items, None)
+            else:
+                report["listed_source"] += 1
+                report["listed_destination"] += 1
+                if self.is_changed(source_item, destination_item) and \
+                        self.is_changed_object(source, destination, source_item, destination_item):
+                    report["changed"] += 1
+                    yield {"source_path": source_item["Key"], "destination_path": destination_item["Key"]}
+                else:
+                    report["unchanged"] += 1
+                source_item = next(source_items, None)
+                destination_item = next(destination_items, None)
+
+    def delete(self, paths) -> int:
+        """
+        This method deletes extra paths from destination
+        :return: Number of deleted paths
+        """
+        destination = get_provider(self.destination_type, cred_details=self.destination_cred_details,
+                                   endpoint_url=self.destination_endpoint_url, account_url=self.destination_account_url)
+
+        def delete(path):
+            try:
+                destination.delete(self.destination_storage_details, path)
+                return 1
+            except BaseException as error:
+                logging.error(f"Deleting {path} failed : {error}")
+                return 0
+
+        with ThreadPoolExecutor(max_workers=StorageSync.delete_workers) as executor:
+            return sum(executor.map(delete, paths))
+
+    def sync(self, source_prefix="", destination_prefix="") -> dict:
+        """
+        This method syncs source_prefix into destination_prefix
+        :param source_prefix: Prefix in source storage
+        :param destination_prefix: Prefix in destination storage
+        :return: Report (listed_source, listed_destination, new, changed, unchanged, extra, deleted, copy, seconds)
+        """
+        start = time.monotonic()
+        report = {"listed_source": 0, "listed_destination": 0, "new": 0, "changed": 0, "unchanged": 0, "extra": 0,
+                  "deleted": 0}
+        extras = []
+        tasks = self.diff(source_prefix, destination_prefix, report, extras)
+
+        if self.dry_run:
+            report["tasks"] = list(tasks)
+        else:
+            # Copies start while both sides are still being listed
+            report["copy"] = TransferJob(source_type=self.source_type, destination_type=self.destination_type,
+                                         source_cred_details=self.source_cred_details,
+                                         destination_cred_details=self.destination_cred_details,
+                                         source_storage_details=self.source_storage_details,
+                                         destination_storage_details=self.destination_storage_details,
+                                         source_endpoint_url=self.source_endpoint_url,
+                                         destination_endpoint_url=self.destination_endpoint_url,
+                                         source_account_url=self.source_account_url,
+                                         destination_account_url=self.destination_account_url,
+                                         **self.job_kwargs).run(tasks=tasks)
+
+        if self.delete_extras:
+            if self.dry_run:
+                report["extras"] = extras
+            else:
+                report["deleted"] = self.delete(extras)
+
+        report["seconds"] = round(time.monotonic() - start, 3)
+        logging.info(f"Synced {self.source_type}:{source_prefix} to {self.destination_type}:{destination_prefix} : "
+                     f"{report['new']} new, {report['changed']} changed, {report['unchanged']} unchanged, "
+                     f"{report['extra']} extra ({report['deleted']} deleted) in {report['seconds']} seconds")
+        return report
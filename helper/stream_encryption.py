@@ -0,0 +1,249 @@
+#!/usr/bin/python3
+# coding=utf-8
+"""
+This scripts provides streaming authenticated encryption (chunked AES-GCM) of storage objects
+
+Layout of an encrypted object :
+    header : magic (4 bytes) | version (1 byte) | chunk_size (4 bytes) | nonce_prefix (8 bytes)
+    chunks : ciphertext of every chunk_size bytes of plaintext followed by its 16 bytes GCM tag
+Nonce of chunk i is nonce_prefix | i (4 bytes), associated data of chunk i is header | i (8 bytes) | final flag,
+so chunks can neither be reordered, moved between objects nor dropped from the end without failing authentication
+"""
+import io
+import logging
+import os
+import struct
+
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+try:
+    from alpha_library.helper.range_reader import check_range
+except ModuleNotFoundError:
+    logging.info("Module called internally")
+    from helper.range_reader import check_range
+
+header_struct = struct.Struct(">4sBI8s")
+magic = b"ALSE"
+version = 1
+tag_size = 16
+
+
+def read_exact(f_read, size) -> bytes:
+    """
+    This method reads size bytes unless end of stream is reached first
+    """
+    data = bytearray()
+    while len(data) < size:
+        chunk = f_read.read(size - len(data))
+        if not chunk:
+            break
+        data += chunk
+    return bytes(data)
+
+
+class StreamCipher(object):
+    """
+        This class encrypts and decrypts objects in the chunked AES-GCM layout with constant memory
+        Transforms are readers wrapping readers (encrypting_reader / decrypting_reader), so they plug into
+        TransferPipe and TransferEngine copies and chain with each other (re-encryption)
+    """
+    chunk_size = 1024 ** 2
+
+    def __init__(self, **kwargs):
+        # Required variable to drive this Class, AES key of 16, 24 or 32 bytes
+        self.key = None
+        self.chunk_size = StreamCipher.chunk_size
+        self.__dict__.update(kwargs)
+
+        if isinstance(self.key, str):
+            self.key = self.key.encode()
+        self.chunk_size = int(self.chunk_size)
+        self.aead = AESGCM(self.key)
+
+    @staticmethod
+    def from_keys(encryption_keys):
+        """
+        This method returns StreamCipher for encryption_keys of mode gcm, None for other (legacy) encryption_keys
+        """
+        if not encryption_keys or encryption_keys.get("mode") != "gcm":
+            return None
+        return StreamCipher(key=encryption_keys["key"],
+                            chunk_size=encryption_keys.get("chunk_size") or StreamCipher.chunk_size)
+
+    @staticmethod
+    def parse_header(header) -> tuple:
+        """
+        This method returns (chunk_size, nonce_prefix) out of header
+        """
+        if len(header) < header_struct.size:
+            raise ValueError("Encrypted object is truncated (no header)")
+        header_magic, header_version, chunk_size, nonce_prefix = header_struct.unpack(header[:header_struct.size])
+        if header_magic != magic or header_version != version:
+            raise ValueError("Object is not encrypted with stream encryption")
+        return chunk_size, nonce_prefix
+
+    @staticmethod
+    def encrypted_size(size, chunk_size=None) -> int:
+        chunk_size = chunk_size or StreamCipher.chunk_size
+        return header_struct.size + size + max(1, -(-size // chunk_size)) * tag_size
+
+    @staticmethod
+    def plain_size(size, chunk_size) -> int:
+        chunks = -(-(size - header_struct.size) // (chunk_size + tag_size))
+        return size - header_struct.size - chunks * tag_size
+
+    @staticmethod
+    def associated_data(header, index, final) -> bytes:
+        return header + index.to_bytes(8, "big") + (b"\x01" if final else b"\x00")
+
+    def encrypt_chunk(self, header, nonce_prefix, index, chunk, final) -> bytes:
+        return self.aead.encrypt(nonce_prefix + index.to_bytes(4, "big"), chunk,
+                                 StreamCipher.associated_data(header, index, final))
+
+    def decrypt_chunk(self, header, nonce_prefix, index, chunk, final) -> bytes:
+        return self.aead.decrypt(nonce_prefix + index.to_bytes(4, "big"), chunk,
+                                 StreamCipher.associated_data(header, index, final))
+
+    def encrypting_reader(self, f_read):
+        return EncryptingReader(self, f_read)
+
+    def decrypting_reader(self, f_read):
+        return DecryptingReader(self, f_read)
+
+    def encrypt(self, data) -> bytes:
+        if isinstance(data, str):
+            data = data.encode()
+        return self.encrypting_reader(io.BytesIO(data)).read()
+
+    def decrypt(self, data) -> bytes:
+        return self.decrypting_reader(io.BytesIO(data)).read()
+
+    def decrypt_range(self, fetch, offset, length, size) -> bytes:
+        """
+        This method decrypts a plaintext range by fetching only header and the chunks covering it
+        :param fetch: Callable(offset, length) -> bytes of encrypted object
+        :param offset: Plaintext offset, negative offset reads last -offset bytes (without length)
+        :param length: Number of plaintext bytes, None reads till end
+        :param size: Size of encrypted object
+        """
+        check_range(offset, length)
+        header = fetch(0, header_struct.size)
+        chunk_size, nonce_prefix = StreamCipher.parse_header(header)
+        chunks = -(-(size - header_struct.size) // (chunk_size + tag_size))
+        plain_size = size - header_struct.size - chunks * tag_size
+
+        if offset < 0:
+            offset = max(0, plain_size + offset)
+        end = plain_size if length is None else min(offset + length, plain_size)
+        if offset >= end:
+            return b""
+
+        first, last = offset // chunk_size, (end - 1) // chunk_size
+        data = fetch(header_struct.size + first * (chunk_size + tag_size),
+                     min((last - first + 1) * (chunk_size + tag_size),
+                         size - header_struct.size - first * (chunk_size + tag_size)))
+        plaintext = b"".join(
+            self.decrypt_chunk(header, nonce_prefix, index,
+                               data[(index - first) * (chunk_size + tag_size):
+                                    (index - first + 1) * (chunk_size + tag_size)], index == chunks - 1)
+            for index in range(first, last + 1))
+        return plaintext[offset - first * chunk_size:end - first * chunk_size]
+
+
+class TransformReader(io.RawIOBase):
+    """
+        Base of readers which produce output one chunk at a time (next_chunk returns None at end of stream)
+    """
+
+    def __init__(self, cipher, f_read):
+        super().__init__()
+        self.cipher = cipher
+        self.f_read = f_read
+        self.__pending = memoryview(b"")
+
+    def readable(self) -> bool:
+        return True
+
+    def next_chunk(self):
+        raise NotImplementedError
+
+    def readinto(self, buffer) -> int:
+        view = memoryview(buffer).cast("B")
+        while not self.__pending:
+            chunk = self.next_chunk()
+            if chunk is None:
+                return 0
+            self.__pending = memoryview(chunk)
+        size = min(len(view), len(self.__pending))
+        view[:size] = self.__pending[:size]
+        self.__pending = self.__pending[size:]
+        return size
+
+
+class EncryptingReader(TransformReader):
+    """
+        This class reads plaintext from f_read and returns encrypted object (header and chunks)
+    """
+
+    def __init__(self, cipher, f_read):
+        super().__init__(cipher, f_read)
+        self.nonce_prefix = os.urandom(8)
+        self.header = header_struct.pack(magic, version, cipher.chunk_size, self.nonce_prefix)
+        self.index = -1
+        self.lookahead = None
+
+    def next_chunk(self):
+        if self.index == -1:
+            self.index = 0
+            self.lookahead = read_exact(self.f_read, self.cipher.chunk_size)
+            return self.header
+        if self.lookahead is None:
+            return None
+        chunk = self.lookahead
+        # One chunk of lookahead tells whether current chunk is the final one
+        self.lookahead = read_exact(self.f_read, self.cipher.chunk_size) \
+            if len(chunk) == self.cipher.chunk_size else b""
+        final = not self.lookahead
+        encrypted = self.cipher.encrypt_chunk(self.header, self.nonce_prefix, self.index, chunk, final)
+        self.index += 1
+        if final:
+            self.lookahead = None
+        return encrypted
+
+
+class DecryptingReader(TransformReader):
+    """
+        This class reads encrypted object from f_read and returns plaintext, authentication failure of any chunk
+        (tampering, truncation, reordering) raises cryptography.exceptions.InvalidTag
+    """
+
+    def __init__(self, cipher, f_read):
+        super().__init__(cipher, f_read)
+        self.header = None
+        self.index = 0
+        self.lookahead = None
+
+    def read_header(self) -> int:
+        """
+        This method reads header of encrypted object (once) and returns its chunk size
+        """
+        if self.header is None:
+            self.header = read_exact(self.f_read, header_struct.size)
+            self.chunk_size, self.nonce_prefix = StreamCipher.parse_header(self.header)
+            self.lookahead = read_exact(self.f_read, self.chunk_size + tag_size)
+        return self.chunk_size
+
+    def next_chunk(self):
+        self.read_header()
+        if self.lookahead is None:
+            return None
+        chunk = self.lookahead
+        self.lookahead = read_exact(self.f_read, self.chunk_size + tag_size) \
+            if len(chunk) == self.chunk_size + tag_size else b""
+        final = not self.lookahead
+        plaintext = self.cipher.decrypt_chunk(self.header, self.nonce_prefix, self.index, chunk, final)
+        self.index += 1
+        if final:
+            self.lookahead = None
+            logging.debug(f"Decrypted {self.index} chunks")
+        return plaintext
@@ -0,0 +1,514 @@
+#!/usr/bin/python3
+# coding=utf-8
+"""
+This scripts provides provider agnostic transfer engine between storage providers in alpha_library
+"""
+import base64
+import logging
+import time
+import traceback
+
+from azure.core.exceptions import ResourceNotFoundError
+from botocore.exceptions import ClientError
+from google.api_core.exceptions import NotFound
+from smart_open import open
+
+try:
+    from alpha_library.boto3_helper.client import Client
+    from alpha_library.boto3_helper.s3_transfer import S3ServerSideCopy, same_credentials
+    from alpha_library.gcp_helper.client import StorageClient
+    from alpha_library.azure_helper.client import AzureStorageClient
+    from alpha_library.helper.hash_calculator import HashingReader
+    from alpha_library.helper.range_reader import check_range, range_header
+    from alpha_library.helper.stream_encryption import StreamCipher
+    from alpha_library.helper.transfer_pipe import TransferPipe
+except ModuleNotFoundError:
+    logging.info("Module called internally")
+    from boto3_helper.client import Client
+    from boto3_helper.s3_transfer import S3ServerSideCopy, same_credentials
+    from gcp_helper.client import StorageClient
+    from azure_helper.client import AzureStorageClient
+    from helper.hash_calculator import HashingReader
+    from helper.range_reader import check_range, range_header
+    from helper.stream_encryption import StreamCipher
+    from helper.transfer_pipe import TransferPipe
+
+
+class StorageProvider(object):
+    """
+        Base class of storage providers used by TransferEngine
+        Every provider knows how to open_reader/open_writer/stat/list/delete an object of its storage,
+        storage_details follow the convention of the provider (bucket_name / container_name)
+        Items returned by stat/list carry MD5 (hex) whenever the provider knows content md5, so that content can be
+        compared across providers
+    """
+    scheme = None
+    chunk_size = 256 * 1024 ** 2
+
+    def __init__(self, **kwargs):
+        # Required variable to drive this Class, expected to be provided from parent Object
+        self.cred_details = None
+        self.endpoint_url = None
+        self.account_url = None
+        self.chunk_size = StorageProvider.chunk_size
+        self.__dict__.update(kwargs)
+
+        self.__client = None
+
+        logging.debug(f"Instance variables for {type(self).__name__} : {self.__dict__}")
+
+    @property
+    def client(self):
+        """
+        Client of the storage, created once per provider
+        """
+        if self.__client is None:
+            self.__client = self.create_client()
+        return self.__client
+
+    def create_client(self):
+        raise NotImplementedError
+
+    @staticmethod
+    def container(storage_details) -> str:
+        return storage_details["bucket_name"]
+
+    def address(self, storage_details, path) -> str:
+        return f"{self.scheme}://{self.container(storage_details)}/{path}"
+
+    def reader_transport_params(self) -> dict:
+        return {"client": self.client}
+
+    def writer_transport_params(self, size=None, **kwargs) -> dict:
+        return {"client": self.client, "min_part_size": kwargs.get("chunk_size") or self.chunk_size}
+
+    def open_reader(self, storage_details, path, **kwargs):
+        """
+        This method opens object for streaming read
+        """
+        return open(self.address(storage_details, path), "rb", transport_params=self.reader_transport_params())
+
+    def open_writer(self, storage_details, path, size=None, **kwargs):
+        """
+        This method opens object for streaming write
+        :param size: Size of data to be written if known, providers use it to pick the upload strategy
+        """
+        return open(self.address(storage_details, path), "wb",
+                    transport_params=self.writer_transport_params(size=size, **kwargs))
+
+    def read_range(self, storage_details, path, offset, length=None) -> bytes:
+        """
+        This method reads length bytes at offset of object with one ranged GET
+        Negative offset reads last -offset bytes and takes no length (ValueError, see check_range),
+        length None reads till end
+        """
+        raise NotImplementedError
+
+    def stat(self, storage_details, path):
+        """
+        This method returns s3 like item (Key, Size, ETag, LastModified) of object or None if missing
+        """
+        raise NotImplementedError
+
+    def list(self, storage_details, prefix="", **kwargs):
+        """
+        Generator over s3 like items (Key, Size, ETag, LastModified) of objects under prefix
+        """
+        raise NotImplementedError
+
+    def delete(self, storage_details, path, **kwargs):
+        """
+        This method deletes object
+        """
+        raise NotImplementedError
+
+    def can_copy_server_side(self, source, **kwargs) -> bool:
+        """
+        This method checks whether object of source provider can be copied into this provider server side
+        """
+        return False
+
+    def copy_server_side(self, source, source_details, source_path, storage_details, path, **kwargs) -> dict:
+        """
+        This method copies object of source provider into this provider without moving data through local machine
+        """
+        raise NotImplementedError
+
+
+class S3Provider(StorageProvider):
+    """
+        Provider for AWS S3 (and S3 compatible endpoints)
+    """
+    scheme = "s3"
+    # Objects up to this size are uploaded with a single PutObject instead of multipart upload
+    max_size_for_single_upload = 256 * 1024 ** 2
+
+    def __init__(self, **kwargs):
+        self.max_size_for_single_upload = S3Provider.max_size_for_single_upload
+        super().__init__(**kwargs)
+
+    def create_client(self):
+        return Client(aws_details=self.cred_details).return_client("s3", endpoint_url=self.endpoint_url)
+
+    @staticmethod
+    def opaque_etag(item) -> bool:
+        """
+        This method tells whether ETag of object (head_object response or item of stat) is not derived from its
+        content, which is the case for objects encrypted with SSE-KMS or SSE-C
+        """
+        return (item.get("ServerSideEncryption") or "").startswith("aws:kms") or bool(item.get("SSECustomerAlgorithm"))
+
+    @staticmethod
+    def etag_md5(etag, item=None):
+        """
+        This method returns md5 (hex) out of ETag, ETag of multipart uploads (with -) and of objects encrypted with
+        SSE-KMS or SSE-C (item carries encryption of object) is not a md5
+        """
+        etag = (etag or "").strip('"')
+        return etag if etag and "-" not in etag and not (item and S3Provider.opaque_etag(item)) else None
+
+    def writer_transport_params(self, size=None, **kwargs) -> dict:
+        transport_params = super().writer_transport_params(size=size, **kwargs)
+        if size is not None and size <= kwargs.get("max_size_for_single_upload", self.max_size_for_single_upload):
+            transport_params["multipart_upload"] = False
+        return transport_params
+
+    def read_range(self, storage_details, path, offset, length=None) -> bytes:
+        return self.client.get_object(Bucket=self.container(storage_details), Key=path,
+                                      Range=range_header(offset, length))["Body"].read()
+
+    def stat(self, storage_details, path):
+        try:
+            response = self.client.head_object(Bucket=self.container(storage_details), Key=path)
+        except ClientError as error:
+            if error.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+        return {"Key": path, "Size": response["ContentLength"], "ETag": response.get("ETag"),
+                "LastModified": response.get("LastModified"),
+                "MD5": S3Provider.etag_md5(response.get("ETag"), response),
+                "ServerSideEncryption": response.get("ServerSideEncryption"),
+                "SSECustomerAlgorithm": response.get("SSECustomerAlgorithm")}
+
+    def part_size(self, storage_details, path):
+        """
+        This method returns size of first part of a multipart uploaded object (None for single part objects),
+        uploaders cut every part but the last at this size
+        """
+        response = self.client.head_object(Bucket=self.container(storage_details), Key=path, PartNumber=1)
+        return response["ContentLength"] if response.get("PartsCount", 1) > 1 else None
+
+    def list(self, storage_details, prefix="", **kwargs):
+        list_objects_params = {"Bucket": self.container(storage_details), "Prefix": prefix}
+        if kwargs.get("start_after"):
+            list_objects_params["StartAfter"] = kwargs["start_after"]
+        while True:
+            response = self.client.list_objects_v2(**list_objects_params)
+            for item in response.get("Contents", []):
+                item["MD5"] = S3Provider.etag_md5(item.get("ETag"))
+                yield item
+            if not response.get("IsTruncated"):
+                break
+            list_objects_params["ContinuationToken"] = response["NextContinuationToken"]
+
+    def delete(self, storage_details, path, **kwargs):
+        self.client.delete_object(Bucket=self.container(storage_details), Key=path)
+
+    def can_copy_server_side(self, source, **kwargs) -> bool:
+        # CopyObject/UploadPartCopy need source readable with destination credentials on same endpoint
+        return isinstance(source, S3Provider) and source.endpoint_url == self.endpoint_url and \
+            same_credentials(source.cred_details, self.cred_details)
+
+    def copy_server_side(self, source, source_details, source_path, storage_details, path, **kwargs) -> dict:
+        server_side_copy_params = {key: kwargs[key] for key in ("part_size", "max_workers") if kwargs.get(key)}
+        return S3ServerSideCopy(client=self.client, **server_side_copy_params).copy(
+            source_bucket=source.container(source_details), source_key=source_path,
+            destination_bucket=self.container(storage_details), destination_key=path)
+
+
+class GSProvider(StorageProvider):
+    """
+        Provider for Google Cloud Storage
+    """
+    scheme = "gs"
+
+    def create_client(self):
+        return StorageClient(sa_json_data=self.cred_details).return_client()
+
+    @staticmethod
+    def blob_item(blob) -> dict:
+        return {"Key": blob.name, "Size": blob.size, "ETag": blob.etag, "LastModified": blob.updated,
+                "MD5": base64.b64decode(blob.md5_hash).hex() if blob.md5_hash else None, "CRC32C": blob.crc32c}
+
+    def read_range(self, storage_details, path, offset, length=None) -> bytes:
+        check_range(offset, length)
+        # Negative start is sent as suffix range
+        return self.client.bucket(bucket_name=self.container(storage_details)).blob(path).download_as_bytes(
+            start=offset, end=offset + length - 1 if length is not None else None)
+
+    def stat(self, storage_details, path):
+        blob = self.client.bucket(bucket_name=self.container(storage_details)).get_blob(path)
+        return GSProvider.blob_item(blob) if blob else None
+
+    def list(self, storage_details, prefix="", **kwargs):
+        for blob in self.client.list_blobs(bucket_or_name=self.container(storage_details), prefix=prefix,
+                                           start_offset=kwargs.get("start_after")):
+            # start_offset is inclusive unlike StartAfter of s3
+            if blob.name != kwargs.get("start_after"):
+                yield GSProvider.blob_item(blob)
+
+    def delete(self, storage_details, path, **kwargs):
+        try:
+            self.client.bucket(bucket_name=self.container(storage_details)).blob(path).delete()
+        except NotFound:
+            logging.info(f"{self.address(storage_details, path)} already deleted")
+
+    def can_copy_server_side(self, source, **kwargs) -> bool:
+        # Rewrite needs source readable with destination credentials
+        return isinstance(source, GSProvider) and source.cred_details == self.cred_details
+
+    def copy_server_side(self, source, source_details, source_path, storage_details, path, **kwargs) -> dict:
+        start = time.monotonic()
+        source_blob = self.client.bucket(bucket_name=source.container(source_details)).blob(source_path)
+        destination_blob = self.client.bucket(bucket_name=self.container(storage_details)).blob(path)
+        # Rewrite continues in multiple calls (token) for large objects or objects moving across locations
+        token, rewritten, size = destination_blob.rewrite(source_blob)
+        calls = 1
+        while token is not None:
+            token, rewritten, size = destination_blob.rewrite(source_blob, token=token)
+            calls += 1
+        return {"size": size, "parts": calls, "seconds": time.monotonic() - start}
+
+
+class AzureProvider(StorageProvider):
+    """
+        Provider for Azure Blob storage
+    """
+    scheme = "azure"
+    copy_poll_interval = 2
+
+    def create_client(self):
+        return AzureStorageClient(account_url=self.account_url,
+                                  azure_details=self.cred_details).return_blob_service_client()
+
+    @staticmethod
+    def container(storage_details) -> str:
+        return storage_details["container_name"]
+
+    @staticmethod
+    def blob_item(blob) -> dict:
+        content_md5 = blob.content_settings.content_md5 if blob.content_settings else None
+        return {"Key": blob.name, "Size": blob.size, "ETag": blob.etag, "LastModified": blob.last_modified,
+                "MD5": bytes(content_md5).hex() if content_md5 else None}
+
+    def read_range(self, storage_details, path, offset, length=None) -> bytes:
+        check_range(offset, length)
+        blob_client = self.client.get_blob_client(container=self.container(storage_details), blob=path)
+        if offset < 0:
+            # Blob service takes no suffix range, size is looked up first
+            offset = max(0, blob_client.get_blob_properties().size + offset)
+        return blob_client.download_blob(offset=offset, length=length).readall()
+
+    def stat(self, storage_details, path):
+        try:
+            properties = self.client.get_blob_client(container=self.container(storage_details),
+                                                     blob=path).get_blob_properties()
+        except ResourceNotFoundError:
+            return None
+        return AzureProvider.blob_item(properties)
+
+    def list(self, storage_details, prefix="", **kwargs):
+        container_client = self.client.get_container_client(self.container(storage_details))
+        for blob in container_client.list_blobs(name_starts_with=prefix):
+            if kwargs.get("start_after") and blob.name <= kwargs["start_after"]:
+                continue
+            yield AzureProvider.blob_item(blob)
+
+    def delete(self, storage_details, path, **kwargs):
+        self.client.get_blob_client(container=self.container(storage_details), blob=path).delete_blob()
+
+    def can_copy_server_side(self, source, **kwargs) -> bool:
+        # Copy from url is authorised by destination credentials only inside the same account
+        return isinstance(source, AzureProvider) and source.account_url == self.account_url and \
+            source.cred_details == self.cred_details
+
+    def copy_server_side(self, source, source_details, source_path, storage_details, path, **kwargs) -> dict:
+        start = time.monotonic()
+        source_url = source.client.get_blob_client(container=source.container(source_details), blob=source_path).url
+        destination_blob_client = self.client.get_blob_client(container=self.container(storage_details), blob=path)
+        destination_blob_client.start_copy_from_url(source_url)
+        properties = destination_blob_client.get_blob_properties()
+        while properties.copy.status == "pending":
+            time.sleep(AzureProvider.copy_poll_interval)
+            properties = destination_blob_client.get_blob_properties()
+        if properties.copy.status != "success":
+            raise IOError(f"Copy of {source_url} ended with status {properties.copy.status}")
+        return {"size": properties.size, "parts": 1, "seconds": time.monotonic() - start}
+
+
+# Registry of storage providers by storage type, extended with register_provider
+providers = {
+    "s3": S3Provider,
+    "gs": GSProvider,
+    "azure": AzureProvider
+}
+
+
+def register_provider(storage_type, provider_class):
+    """
+    This method registers a provider class (StorageProvider subclass) for a storage type
+    """
+    providers[storage_type] = provider_class
+
+
+def get_provider(storage_type, **kwargs) -> StorageProvider:
+    """
+    This method returns provider instance for storage type
+    :param kwargs: cred_details, endpoint_url (s3), account_url (azure), chunk_size
+    """
+    if storage_type not in providers:
+        raise ValueError(f"Unsupported Cloud storage provider : {storage_type}")
+    return providers[storage_type](**kwargs)
+
+
+class TransferEngine(object):
+    """
+        This class copies objects between any two providers
+        Server side copy is used whenever destination provider supports it for the source, otherwise data is streamed
+        through TransferPipe, so tuning (chunk_size, pipe_buffer_size, pipe_ring_size, verify) applies to every pair
+        verify :
+            True : size of destination is compared with bytes transferred
+            checksum : streamed data is checksummed on the way (md5, s3 multipart ETag, crc32c as destination reports
+                       them) and compared with checksum reported by destination, server side copies compare md5
+                       reported by both sides, so no object is read twice
+    """
+    min_pipe_buffer_size = 64 * 1024
+
+    def __init__(self, **kwargs):
+        self.server_side_copy = True
+        # Verifying size of destination after copy
+        self.verify = False
+        self.__dict__.update(kwargs)
+
+        logging.debug(f"Instance variables for TransferEngine : {self.__dict__}")
+
+    @staticmethod
+    def pipe_kwargs(size, **kwargs) -> dict:
+        """
+        This method shrinks pipe buffers for small objects, so that a small copy does not allocate the whole ring
+        """
+        buffer_size = kwargs.get("pipe_buffer_size") or TransferPipe.buffer_size
+        return {**kwargs, "pipe_buffer_size": min(buffer_size, max(size, TransferEngine.min_pipe_buffer_size))}
+
+    @staticmethod
+    def checksum_algorithms(destination) -> tuple:
+        """
+        This method returns checksums which destination provider reports for uploaded objects
+        """
+        if isinstance(destination, S3Provider):
+            return "md5", "s3_etag"
+        if isinstance(destination, GSProvider):
+            return "md5", "crc32c"
+        return ("md5",)
+
+    @staticmethod
+    def verify_checksums(checksums, item, part_size=None):
+        """
+        This method compares checksums with the item of destination
+        :param part_size: Part size s3_etag was calculated with, multipart ETag is compared only when item was
+                          uploaded with the same part size (PartSize of item)
+        :return: True / False, None when destination reports no comparable checksum
+        """
+        if item.get("MD5") and checksums.get("md5"):
+            return item["MD5"] == checksums["md5"]
+        if item.get("CRC32C") and checksums.get("crc32c"):
+            return item["CRC32C"] == checksums["crc32c"]
+        if S3Provider.opaque_etag(item):
+            return None
+        etag = (item.get("ETag") or "").strip('"')
+        if "-" in etag and "-" in checksums.get("s3_etag", "") and item.get("PartSize") and \
+                item["PartSize"] == part_size:
+            return etag == checksums["s3_etag"]
+        return None
+
+    def copy(self, source, source_details, source_path, destination, destination_details, destination_path,
+             **kwargs) -> dict:
+        """
+        This method copies one object from source provider to destination provider
+        :param source: Source StorageProvider
+        :param source_details: Storage details of source (bucket_name / container_name)
+        :param source_path: Object path in source
+        :param destination: Destination StorageProvider
+        :param destination_details: Storage details of destination (bucket_name / container_name)
+        :param destination_path: Object path in destination
+        :param kwargs: chunk_size, pipe_buffer_size, pipe_ring_size, part_size, max_workers, throw_exception,
+                       source_encryption_keys (source is decrypted while streaming),
+                       destination_encryption_keys (destination is encrypted while streaming)
+        :return: Summary of copy (source, destination, size, server_side, seconds)
+        """
+        start = time.monotonic()
+        verify = kwargs.get("verify") or self.verify
+        decrypt = StreamCipher.from_keys(kwargs.get("source_encryption_keys"))
+        encrypt = StreamCipher.from_keys(kwargs.get("destination_encryption_keys"))
+        summary = {"source": source.address(source_details, source_path),
+                   "destination": destination.address(destination_details, destination_path)}
+        try:
+            if self.server_side_copy and kwargs.get("server_side_copy", True) and not (decrypt or encrypt) and \
+                    destination.can_copy_server_side(source, **kwargs):
+                result = destination.copy_server_side(source, source_details, source_path,
+                                                      destination_details, destination_path, **kwargs)
+                summary.update(size=result.get("size"), server_side=True)
+                if verify == "checksum":
+                    source_item = source.stat(source_details, source_path)
+                    summary["checksums"] = {"md5": source_item.get("MD5"), "crc32c": source_item.get("CRC32C")}
+            else:
+                source_item = source.stat(source_details, source_path)
+                if source_item is None:
+                    raise FileNotFoundError(f"{summary['source']} does not exist")
+                size = source_item["Size"]
+                with source.open_reader(source_details, source_path, **kwargs) as f_read:
+                    # Encryption transforms wrap the reader, so that they chain (decrypt then encrypt re-encrypts)
+                    if decrypt:
+                        f_read = decrypt.decrypting_reader(f_read)
+                        size = StreamCipher.plain_size(size, f_read.read_header())
+                    if encrypt:
+                        f_read = encrypt.encrypting_reader(f_read)
+                        size = StreamCipher.encrypted_size(size, encrypt.chunk_size)
+                    if verify == "checksum":
+                        f_read = hashing_reader = HashingReader(
+                            f_read, algorithms=TransferEngine.checksum_algorithms(destination),
+                            part_size=kwargs.get("chunk_size") or destination.chunk_size)
+                    with destination.open_writer(destination_details, destination_path, size=size,
+                                                 **kwargs) as f_write:
+                        pipe_kwargs = TransferEngine.pipe_kwargs(size, **kwargs)
+                        size = TransferPipe.stream(f_read, f_write, **pipe_kwargs)
+                summary.update(size=size, server_side=False)
+                if verify == "checksum":
+                    summary["checksums"] = hashing_reader.checksums()
+
+            if verify:
+                destination_item = destination.stat(destination_details, destination_path)
+                if not destination_item or destination_item["Size"] != summary["size"]:
+                    raise IOError(f"Verification of {summary['destination']} failed : expected {summary['size']} "
+                                  f"bytes, found {destination_item and destination_item['Size']}")
+                if verify == "checksum":
+                    part_size = kwargs.get("chunk_size") or destination.chunk_size
+                    if isinstance(destination, S3Provider) and "-" in (destination_item.get("ETag") or "") and \
+                            not S3Provider.opaque_etag(destination_item):
+                        # Writer decides where parts are cut, so part size is read back from destination
+                        destination_item["PartSize"] = destination.part_size(destination_details, destination_path)
+                    summary["verified"] = TransferEngine.verify_checksums(summary["checksums"], destination_item,
+                                                                          part_size)
+                    if summary["verified"] is False:
+                        raise IOError(f"Verification of {summary['destination']} failed : checksum mismatch "
+                                      f"{summary['checksums']} != {destination_item}")
+                    if summary["verified"] is None:
+                        logging.warning(f"{summary['destination']} reports no comparable checksum, only size verified")
+
+            summary["seconds"] = round(time.monotonic() - start, 3)
+            logging.info(f"Copied {summary['source']} to {summary['destination']} : {summary}")
+            return summary
+        except BaseException as error:
+            logging.error(f"Uncaught exception in transfer_engine.py : {traceback.format_exc()}")
+            if kwargs.get("throw_exception"):
+                raise error
@@ -0,0 +1,256 @@
+#!/usr/bin/python3
+# coding=utf-8
+"""
+This scripts provides bulk transfer jobs (manifest or prefix driven) on top of TransferEngine with checkpointing
+"""
+import csv
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+try:
+    from alpha_library.boto3_helper.client_cache import cache_key
+    from alpha_library.helper.transfer_engine import TransferEngine, get_provider
+except ModuleNotFoundError:
+    logging.info("Module called internally")
+    from boto3_helper.client_cache import cache_key
+    from helper.transfer_engine import TransferEngine, get_provider
+
+# Providers of the worker (thread pool shares them, every process of a process pool builds its own)
+worker_providers = dict()
+worker_providers_lock = threading.Lock()
+
+
+def worker_provider(storage_type, **kwargs):
+    """
+    This method returns provider shared inside the worker process for the storage type and its settings
+    """
+    key = cache_key(storage_type, kwargs)
+    with worker_providers_lock:
+        if key not in worker_providers:
+            worker_providers[key] = get_provider(storage_type, **kwargs)
+        return worker_providers[key]
+
+
+def run_transfer_task(job_config, task) -> dict:
+    """
+    This method copies one task of a job, it is a module level function so that process pool can pickle it
+    :param job_config: Picklable job settings (see TransferJob.job_config)
+    :param task: Dict of source_path, destination_path and optional source_bucket/destination_bucket
+    :return: Summary of TransferEngine.copy
+    """
+    source = worker_provider(job_config["source_type"], **job_config["source"])
+    destination = worker_provider(job_config["destination_type"], **job_config["destination"])
+    source_details = TransferJob.storage_details(job_config["source_storage_details"], task.get("source_bucket"))
+    destination_details = TransferJob.storage_details(job_config["destination_storage_details"],
+                                                      task.get("destination_bucket"))
+    # Task failures always raise so they are retried and reported, throw_exception of caller is not forwarded
+    copy_kwargs = dict(job_config["copy_kwargs"])
+    copy_kwargs.pop("throw_exception", None)
+
+    for attempt in range(job_config["max_retries"] + 1):
+        try:
+            return TransferEngine().copy(source, source_details, task["source_path"],
+                                         destination, destination_details, task["destination_path"],
+                                         throw_exception=True, **copy_kwargs)
+        except BaseException:
+            if attempt == job_config["max_retries"]:
+                raise
+            time.sleep(min(30, 2 ** attempt))
+
+
+class TransferJob(object):
+    """
+        This class copies many objects from one storage to another with a worker pool
+        Tasks come from a manifest (csv/jsonl with source_path, destination_path and optional source_bucket,
+        destination_bucket columns), from a source prefix or from any iterable of task dicts
+        Every finished task is appended to checkpoint_path (jsonl), a restarted job skips the tasks already done
+    """
+    max_workers = 16
+    # Maximum number of concurrent copies into one destination bucket/container (None : max_workers)
+    per_destination_limit = None
+    max_retries = 2
+
+    def __init__(self, **kwargs):
+        # Required variable to drive this Class, expected to be provided from parent Object
+        self.source_type = None
+        self.destination_type = None
+        self.source_cred_details = None
+        self.destination_cred_details = None
+        self.source_storage_details = None
+        self.destination_storage_details = None
+
+        # Optional variables
+        self.source_endpoint_url = None
+        self.destination_endpoint_url = None
+        self.source_account_url = None
+        self.destination_account_url = None
+        self.checkpoint_path = None
+        self.executor = "thread"
+        self.max_workers = TransferJob.max_workers
+        self.per_destination_limit = TransferJob.per_destination_limit
+        self.max_retries = TransferJob.max_retries
+        # Passed on to TransferEngine.copy (chunk_size, pipe_buffer_size, verify, server_side_copy etc.)
+        self.copy_kwargs = dict()
+        self.__dict__.update(kwargs)
+
+        self.__lock = threading.Lock()
+        self.__destination_semaphores = dict()
+
+    @staticmethod
+    def storage_details(storage_details, bucket=None) -> dict:
+        """
+        This method returns storage details of the task, bucket of task (if any) overrides bucket of the job
+        """
+        if not bucket:
+            return storage_details
+        storage_details = dict(storage_details or {})
+        storage_details["container_name" if "container_name" in storage_details else "bucket_name"] = bucket
+        return storage_details
+
+    def job_config(self) -> dict:
+        """
+        This method returns picklable settings handed over to workers
+        """
+        return {
+            "source_type": self.source_type,
+            "destination_type": self.destination_type,
+            "source": {"cred_details": self.source_cred_details, "endpoint_url": self.source_endpoint_url,
+                       "account_url": self.source_account_url},
+            "destination": {"cred_details": self.destination_cred_details,
+                            "endpoint_url": self.destination_endpoint_url,
+                            "account_url": self.destination_account_url},
+            "source_storage_details": self.source_storage_details,
+            "destination_storage_details": self.destination_storage_details,
+            "max_retries": self.max_retries,
+            "copy_kwargs": self.copy_kwargs
+        }
+
+    @staticmethod
+    def read_manifest(manifest_path):
+        """
+        Generator over tasks of a csv (with header) or jsonl manifest
+        """
+        with open(manifest_path, "r", newline="") as manifest:
+            if manifest_path.endswith((".jsonl", ".json")):
+                for line in manifest:
+                    if line.strip():
+                        yield json.loads(line)
+            else:
+                for row in csv.DictReader(manifest):
+                    yield {key: value for key, value in row.items() if value}
+
+    def tasks_from_prefix(self, prefix, destination_prefix=""):
+        """
+        Generator over tasks copying every object under prefix of source to destination_prefix
+        """
+        source = get_provider(self.source_type, **self.job_config()["source"])
+        for item in source.list(self.source_storage_details, prefix):
+            # Folder markers are not copied
+            if item["Key"].endswith("/") and not item["Size"]:
+                continue
+            yield {"source_path": item["Key"], "destination_path": destination_prefix + item["Key"][len(prefix):]}
+
+    @staticmethod
+    def task_key(task) -> str:
+        return json.dumps([task.get("source_bucket"), task["source_path"],
+                           task.get("destination_bucket"), task["destination_path"]])
+
+    def read_checkpoint(self) -> set:
+        """
+        This method returns keys of tasks finished by earlier runs of the job
+        """
+        done = set()
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, "r") as checkpoint:
+                for line in checkpoint:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Last line of a crashed run may be partially written
+                        continue
+                    if record.get("status") == "done":
+                        done.add(record["task"])
+        return done
+
+    def __destination_semaphore(self, task):
+        bucket = task.get("destination_bucket") or "default"
+        with self.__lock:
+            if bucket not in self.__destination_semaphores:
+                self.__destination_semaphores[bucket] = threading.BoundedSemaphore(
+                    self.per_destination_limit or self.max_workers)
+            return self.__destination_semaphores[bucket]
+
+    def run(self, manifest_path=None, prefix=None, destination_prefix="", tasks=None) -> dict:
+        """
+        This method runs the job till every task is either done or failed
+        :param manifest_path: csv/jsonl manifest of tasks
+        :param prefix: Source prefix to copy (destination path is destination_prefix + path relative to prefix)
+        :param destination_prefix: Destination prefix used with prefix
+        :param tasks: Iterable of task dicts (source_path, destination_path, source_bucket, destination_bucket)
+        :return: Report of the job (total, copied, skipped, failed, bytes, seconds, objects/bytes per second)
+        """
+        if manifest_path:
+            tasks = TransferJob.read_manifest(manifest_path)
+        elif prefix is not None:
+            tasks = self.tasks_from_prefix(prefix, destination_prefix)
+        elif tasks is None:
+            raise ValueError("Either manifest_path, prefix or tasks has to be provided")
+
+        start = time.monotonic()
+        report = {"total": 0, "copied": 0, "skipped": 0, "failed": [], "bytes": 0}
+        done = self.read_checkpoint()
+        job_config = self.job_config()
+        # Bounding queued tasks so that huge manifests are never loaded at once
+        in_flight = threading.BoundedSemaphore(self.max_workers * 2)
+        checkpoint = open(self.checkpoint_path, "a") if self.checkpoint_path else None
+
+        def finished(future, task, key, destination_semaphore):
+            destination_semaphore.release()
+            in_flight.release()
+            record = {"task": key}
+            try:
+                summary = future.result()
+                record.update(status="done", size=summary.get("size"), seconds=summary.get("seconds"))
+            except BaseException as error:
+                record.update(status="failed", error=repr(error))
+            with self.__lock:
+                if record["status"] == "done":
+                    report["copied"] += 1
+                    report["bytes"] += record.get("size") or 0
+                else:
+                    report["failed"].append({**task, "error": record["error"]})
+                if checkpoint:
+                    checkpoint.write(json.dumps(record) + "\n")
+                    checkpoint.flush()
+
+        pool_class = ProcessPoolExecutor if self.executor == "process" else ThreadPoolExecutor
+        try:
+            with pool_class(max_workers=self.max_workers) as executor:
+                for task in tasks:
+                    report["total"] += 1
+                    key = TransferJob.task_key(task)
+                    if key in done:
+                        report["skipped"] += 1
+                        continue
+                    destination_semaphore = self.__destination_semaphore(task)
+                    # Tasks are submitted in order, a saturated destination holds back tasks queued behind it
+                    in_flight.acquire()
+                    destination_semaphore.acquire()
+                    future = executor.submit(run_transfer_task, job_config, task)
+                    future.add_done_callback(lambda future, task=task, key=key, semaphore=destination_semaphore:
+                                             finished(future, task, key, semaphore))
+        finally:
+            if checkpoint:
+                checkpoint.close()
+
+        report["seconds"] = round(time.monotonic() - start, 3)
+        report["objects_per_second"] = round(report["copied"] / max(report["seconds"], 1e-6), 2)
+        report["bytes_per_second"] = round(report["bytes"] / max(report["seconds"], 1e-6), 2)
+        logging.info(f"Transfer job finished : {report['copied']} copied, {report['skipped']} skipped, "
+                     f"{len(report['failed'])} failed of {report['total']} in {report['seconds']} seconds "
+                     f"({report['bytes_per_second'] / 1024 ** 2:.2f} MiB/s)")
+        return report
@@ -0,0 +1,127 @@
+#!/usr/bin/python3
+# coding=utf-8
+"""
+This scripts provides streaming pipe between two file like objects with read-ahead on a separate thread
+"""
+import logging
+import queue
+import threading
+import time
+
+
+class TransferPipe(object):
+    """
+        This class streams data from a readable to a writable file object through a ring of reusable buffers
+        A reader thread fills free buffers (readinto, falling back to read) while the calling thread writes filled
+        buffers out, so download and upload overlap and throughput approaches min(download, upload)
+        Peak memory of the pipe is ring_size * buffer_size, no bytes object is allocated per chunk with readinto
+    """
+    buffer_size = 16 * 1024 ** 2
+    ring_size = 4
+    # Interval at which blocked reader checks whether writer has failed
+    poll_interval = 0.5
+
+    def __init__(self, **kwargs):
+        self.buffer_size = TransferPipe.buffer_size
+        self.ring_size = TransferPipe.ring_size
+        self.__dict__.update(kwargs)
+
+        logging.debug(f"Instance variables for TransferPipe : {self.__dict__}")
+
+        self.__free = queue.Queue()
+        self.__filled = queue.Queue()
+        self.__stop = threading.Event()
+        self.__reader_error = None
+
+    @staticmethod
+    def stream(f_read, f_write, **kwargs) -> int:
+        """
+        This method streams f_read into f_write, pipe_buffer_size and pipe_ring_size are picked from kwargs
+        :return: Number of bytes transferred
+        """
+        pipe_params = {"buffer_size": kwargs.get("pipe_buffer_size"), "ring_size": kwargs.get("pipe_ring_size")}
+        return TransferPipe(**{key: value for key, value in pipe_params.items() if value}).transfer(f_read, f_write)
+
+    def __fill(self, f_read, view) -> int:
+        """
+        This method fills the buffer completely unless end of stream is reached
+        :return: Number of bytes placed in buffer
+        """
+        filled = 0
+        readinto = getattr(f_read, "readinto", None)
+        while filled < len(view):
+            if readinto:
+                size = readinto(view[filled:])
+            else:
+                data = f_read.read(len(view) - filled)
+                size = len(data) if data else 0
+                view[filled:filled + size] = data or b""
+            if not size:
+                break
+            filled += size
+        return filled
+
+    def __get(self, source):
+        """
+        This method takes item out of source queue, returns None once pipe was stopped by writer
+        """
+        while not self.__stop.is_set():
+            try:
+                return source.get(timeout=TransferPipe.poll_interval)
+            except queue.Empty:
+                continue
+        return None
+
+    def __reader(self, f_read):
+        """
+        Read-ahead thread, fills free buffers and passes them to writer, (None, 0) marks end of stream
+        """
+        try:
+            while True:
+                view = self.__get(self.__free)
+                if view is None:
+                    return
+                size = self.__fill(f_read, view)
+                if not size:
+                    break
+                # Queues never block on put, only ring_size buffers are ever in circulation
+                self.__filled.put((view, size))
+        except BaseException as error:
+            self.__reader_error = error
+        self.__filled.put((None, 0))
+
+    def transfer(self, f_read, f_write) -> int:
+        """
+        This method streams every byte of f_read into f_write
+        :param f_read: Readable file object (readinto/read)
+        :param f_write: Writable file object, it must not keep reference to the buffer passed to write
+        :return: Number of bytes transferred
+        """
+        for _ in range(self.ring_size):
+            self.__free.put(memoryview(bytearray(self.buffer_size)))
+
+        start = time.monotonic()
+        transferred, writer_wait = 0, 0.0
+        reader = threading.Thread(target=self.__reader, args=(f_read,), name="transfer-pipe-reader", daemon=True)
+        reader.start()
+        try:
+            while True:
+                wait_start = time.monotonic()
+                view, size = self.__get(self.__filled)
+                writer_wait += time.monotonic() - wait_start
+                if view is None:
+                    break
+                f_write.write(view[:size])
+                transferred += size
+                self.__free.put(view)
+        finally:
+            self.__stop.set()
+            reader.join()
+
+        if self.__reader_error:
+            raise self.__reader_error
+
+        elapsed = time.monotonic() - start
+        logging.debug(f"Transferred {transferred} bytes in {elapsed:.2f} seconds "
+                      f"({transferred / max(elapsed, 1e-6) / 1024 ** 2:.2f} MiB/s, writer waited {writer_wait:.2f} s)")
+        return transferred